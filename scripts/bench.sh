@@ -0,0 +1,9 @@
+#!/bin/sh
+
+# benchmark of the task pipeline on synthetic data
+# arguments are passed to src/bench.py, e.g. --baseline output/bench-baseline.json
+
+# ensure we are in the root dir
+cd "$(dirname "$0")/.."
+
+uv run src/bench.py "$@"
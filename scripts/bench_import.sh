@@ -0,0 +1,13 @@
+#!/bin/sh
+
+# import time of the entry points, cumulative in ms
+# measured via python -X importtime
+
+# ensure we are in the root dir
+cd "$(dirname "$0")/.."
+
+cd src || exit 1
+for module in auth rtm_client helper tasks_overdue tasks_completed; do
+  us=$(uv run python -X importtime -c "import $module" 2>&1 | tail -1 | cut -d '|' -f 2)
+  echo "$module: $((us / 1000)) ms"
+done
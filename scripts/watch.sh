@@ -0,0 +1,9 @@
+#!/bin/sh
+
+# regenerate the reports whenever their tasks changed, runs until stopped
+# arguments are passed to src/watch.py, e.g. --interval 600
+
+# ensure we are in the root dir
+cd "$(dirname "$0")/.."
+
+uv run src/watch.py "$@"
@@ -0,0 +1,170 @@
+"""
+Materialized aggregates of completed tasks per week and list.
+
+Persisted in the task store, together with the contribution of each task.
+On update, only tasks that are new, no longer in the result or modified in the
+task store since the last update, see store.changed_tasks(), are checked.
+The last change is taken from before the tasks were loaded,
+df.attrs["changes_seq"], so changes saved meanwhile are checked next time.
+Of those, only the ones whose aggregated fields changed modify the aggregates,
+detected via a hash of the aggregated fields per task.
+All tasks are checked on the first update and if a list name changed.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import datetime as dt
+
+import pandas as pd
+
+import store
+
+AGG_FIELDS = ("prio", "overdue_prio", "estimate")
+
+
+def update_week_aggregates(scope: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Update the aggregates from the completed tasks and return them.
+
+    scope: name of the aggregate, e.g. "completed"
+    df: completed tasks of the task store indexed by task_id,
+    columns completed_week, list and AGG_FIELDS,
+    without df.attrs["changes_seq"] all tasks are checked
+    returns the same as tasks_completed.completed_week(df)
+    """
+    df = df[df["completed_week"].notna()]
+    cols = ["completed_week", "list", *AGG_FIELDS]
+    ids = set(df.index.astype("int64").tolist())
+    lists = "\n".join(sorted(map(str, df["list"].unique())))
+
+    with store.connect() as con:
+        state = con.execute(
+            "SELECT seq, lists FROM week_agg_state WHERE scope = ?", (scope,)
+        ).fetchone()
+        stored = {
+            row[0]
+            for row in con.execute(
+                "SELECT task_id FROM week_agg_tasks WHERE scope = ?", (scope,)
+            )
+        }
+        seq = state[0] if state else 0
+        modified, _ = store.changed_tasks(seq)
+        seq_loaded = df.attrs.get("changes_seq")
+        if state is None or state[1] != lists or seq_loaded is None:
+            candidates = ids
+        else:
+            candidates = (ids - stored) | (ids & modified)
+        if seq_loaded is not None:
+            seq = seq_loaded
+        removed = list(stored - ids)
+
+        df_candidates = df.loc[df.index.isin(list(candidates)), cols]
+        hashes = pd.util.hash_pandas_object(df_candidates, index=False).to_numpy()
+        new_hash = dict(
+            zip(
+                df_candidates.index.astype("int64").tolist(),
+                hashes.view("int64").tolist(),
+                strict=True,
+            )
+        )
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS ids (task_id INTEGER PRIMARY KEY)")
+        con.execute("DELETE FROM ids")
+        con.executemany("INSERT INTO ids VALUES (?)", ((k,) for k in new_hash))
+        old_hash = dict(
+            con.execute(
+                """
+                SELECT task_id, hash FROM week_agg_tasks
+                WHERE scope = ? AND task_id IN (SELECT task_id FROM ids)
+                """,
+                (scope,),
+            ).fetchall()
+        )
+        changed = [k for k, v in new_hash.items() if old_hash.get(k) != v]
+        outdated = [k for k in changed if k in old_hash] + removed
+
+        # (week, list) -> [count, sum_prio, sum_overdue_prio, sum_estimate]
+        delta: dict[tuple[str, str], list[int]] = {}
+
+        def add(week: str, list_name: str, values: tuple, sign: int) -> None:
+            d = delta.setdefault((week, list_name), [0, 0, 0, 0])
+            d[0] += sign
+            for i, v in enumerate(values, start=1):
+                d[i] += sign * (v or 0)
+
+        con.execute("DELETE FROM ids")
+        con.executemany("INSERT INTO ids VALUES (?)", ((k,) for k in outdated))
+        for week, list_name, *values in con.execute(
+            """
+            SELECT week, list, prio, overdue_prio, estimate FROM week_agg_tasks
+            WHERE scope = ? AND task_id IN (SELECT task_id FROM ids)
+            """,
+            (scope,),
+        ):
+            add(week, list_name, tuple(values), -1)
+        con.execute(
+            "DELETE FROM week_agg_tasks"
+            " WHERE scope = ? AND task_id IN (SELECT task_id FROM ids)",
+            (scope,),
+        )
+
+        df_changed = df.loc[changed, cols].astype(object)
+        df_changed = df_changed.where(df_changed.notna(), None)
+        rows = []
+        for task_id, (week, list_name, *values) in zip(
+            changed, df_changed.itertuples(index=False, name=None), strict=True
+        ):
+            week = week.isoformat()  # noqa: PLW2901
+            add(week, list_name, tuple(values), 1)
+            rows.append((scope, task_id, new_hash[task_id], week, list_name, *values))
+        con.executemany(
+            "INSERT INTO week_agg_tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+        con.executemany(
+            """
+            INSERT INTO week_agg VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (scope, week, list) DO UPDATE SET
+                count = count + excluded.count,
+                sum_prio = sum_prio + excluded.sum_prio,
+                sum_overdue_prio = sum_overdue_prio + excluded.sum_overdue_prio,
+                sum_estimate = sum_estimate + excluded.sum_estimate
+            """,
+            ((scope, *k, *v) for k, v in delta.items()),
+        )
+        con.execute("DELETE FROM week_agg WHERE scope = ? AND count = 0", (scope,))
+        con.execute(
+            "INSERT OR REPLACE INTO week_agg_state VALUES (?, ?, ?)",
+            (scope, seq, lists),
+        )
+    print(f"Week aggregates {scope}: {len(changed)} changed, {len(removed)} removed")
+    return load_week_aggregates(scope)
+
+
+def load_week_aggregates(scope: str) -> pd.DataFrame:
+    """Return the aggregates, indexed by completed_week and list."""
+    with store.connect() as con:
+        rows = con.execute(
+            """
+            SELECT week, list, count, sum_prio, sum_overdue_prio, sum_estimate
+            FROM week_agg WHERE scope = ?
+            ORDER BY week DESC, list ASC
+            """,
+            (scope,),
+        ).fetchall()
+    df = pd.DataFrame(
+        rows,
+        columns=[
+            "completed_week",
+            "list",
+            "count",
+            "sum_prio",
+            "sum_overdue_prio",
+            "sum_estimate",
+        ],
+    )
+    df["completed_week"] = pd.Series(
+        [dt.date.fromisoformat(week) for week in df["completed_week"]], dtype=object
+    )
+    df["list"] = df["list"].astype("category")
+    return df.set_index(["completed_week", "list"])
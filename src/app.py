@@ -5,11 +5,16 @@ from typing import TYPE_CHECKING
 
 import streamlit as st
 
+from data_service import get_service
+
 if TYPE_CHECKING:
     from streamlit.navigation.page import StreamlitPage
 
 st.set_page_config(page_title="RTM Report", page_icon=None, layout="wide")
 
+# load the data of all pages in the background, refreshed periodically
+get_service()
+
 
 def create_navigation_menu() -> None:
     """Create and populate navigation menu."""
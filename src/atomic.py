@@ -0,0 +1,51 @@
+"""
+Atomic file writes.
+
+Output and cache files are written to a unique temporary file in the same
+directory and renamed when complete, so readers, e.g. a web server or another
+process, see the old or the new file, never a partially written one.
+Concurrent writers of the same file, threads or processes, write to separate
+temporary files, the last rename wins.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import functools
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@contextmanager
+def atomic_path(file_path: Path) -> Iterator[Path]:
+    """
+    Yield a temporary path to write to, renamed to file_path if no error occurs.
+
+    on error the temporary file is removed and file_path is unchanged
+    """
+    file_path.parent.mkdir(exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=file_path.parent, prefix=f"{file_path.name}.", suffix=".tmp", delete=False
+    ) as fh:
+        path_tmp = Path(fh.name)
+    try:
+        # permissions of a regular new file, not the 0600 of temporary files
+        path_tmp.chmod(0o666 & ~_umask())
+        yield path_tmp
+        path_tmp.replace(file_path)
+    finally:
+        path_tmp.unlink(missing_ok=True)
+
+
+@functools.cache
+def _umask() -> int:
+    # can only be read by setting it
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
@@ -1,12 +1,16 @@
 """
 Authentication for RememberTheMilk API.
 
-Only needed once.
+Only needed once, or to grant more permissions:
+read for the reports, write for bulk.py
+uv run src/auth.py --perms write
 """
 
-from helper import (
-    URL_RTM_BASE,
+import argparse
+
+from rtm_client import (
     dict_to_url_param,
+    get_api_url,
     json_parse_response,
     perform_rest_call,
     rtm_append_key_and_sig,
@@ -20,7 +24,7 @@ def rtm_get_frob() -> str:
     # url = f'https://api.rememberthemilk.com/services/rest/?method=rtm.auth.getFrob&format=json&api_key={api_key}&api_sig={api_sig}') # noqa: E501
     param = {"method": "rtm.auth.getFrob", "format": "json"}
     param_str = dict_to_url_param(rtm_append_key_and_sig(param))
-    url = f"{URL_RTM_BASE}?{param_str}"
+    url = f"{get_api_url()}?{param_str}"
     response_text = perform_rest_call(url)
     d_json = json_parse_response(response_text)
     frob = d_json["frob"]
@@ -28,13 +32,15 @@ def rtm_get_frob() -> str:
     return frob
 
 
-def rtm_gen_auth_url(frob: str) -> str:
+def rtm_gen_auth_url(frob: str, perms: str = "read") -> str:
     """
     Create a url allowing a user to grant permission on his data to this app.
+
+    perms: read, write or delete
     """
     # https://www.rememberthemilk.com/services/auth/?api_key=abc123&perms=delete&frob=123456&api_sig=zxy987 # noqa: E501
     url_rtm_auth = "https://www.rememberthemilk.com/services/auth/"
-    param = {"perms": "read", "frob": frob}
+    param = {"perms": perms, "frob": frob}
     param_str = dict_to_url_param(rtm_append_key_and_sig(param))
     url = f"{url_rtm_auth}?{param_str}"
     return url
@@ -46,7 +52,7 @@ def rtm_auth_get_token(frob: str) -> str:
     """
     param = {"method": "rtm.auth.getToken", "format": "json", "frob": frob}
     param_str = dict_to_url_param(rtm_append_key_and_sig(param))
-    url = f"{URL_RTM_BASE}?{param_str}"
+    url = f"{get_api_url()}?{param_str}"
     response_text = perform_rest_call(url)
     d_json = json_parse_response(response_text)
     token = d_json["auth"]["token"]  # type: ignore
@@ -54,7 +60,7 @@ def rtm_auth_get_token(frob: str) -> str:
     return token
 
 
-def auth() -> None:
+def auth(perms: str = "read") -> None:
     """
     Perform the authentication.
 
@@ -63,11 +69,13 @@ def auth() -> None:
     frob = rtm_get_frob()
     print(f"frob: {frob}")
     print("now open this URL to grant this app access your data:")
-    print(rtm_gen_auth_url(frob))
+    print(rtm_gen_auth_url(frob, perms=perms))
     input("press Enter to continue")
     token = rtm_auth_get_token(frob)
     print(token)
 
 
 if __name__ == "__main__":
-    auth()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--perms", choices=("read", "write", "delete"), default="read")
+    auth(perms=parser.parse_args().perms)
@@ -0,0 +1,287 @@
+"""
+Benchmark of the task pipeline on synthetic data.
+
+Generates rtm.tasks.getList responses of a given number of tasks and times
+each stage from JSON parsing to the reports, without any API access.
+
+uv run src/bench.py --sizes 1000,10000 --output output/bench.json
+uv run src/bench.py --baseline output/bench-baseline.json
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+import store
+from config import get_date_today
+from helper import (
+    OUTPUT_DIR,
+    convert_task_columns,
+    convert_task_fields,
+    df_name_url_to_html,
+    flatten_tasks,
+    records_to_df,
+    task_urls,
+    tasks_to_df,
+)
+from html_writer import write_html
+from rtm_client import json_parse_response
+from tasks_completed import completed_week
+from tasks_overdue import group_by_list
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+SIZES_DEFAULT = (1_000, 10_000, 100_000)
+REPEAT_DEFAULT = 3
+# stage is a regression if slower than baseline by factor and by at least 1 ms
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 0.001
+
+NAMES = (
+    "Water the flowers",
+    "Backup PC",
+    "Call Dr. Müller",
+    "Pay bills & taxes",
+    "Fix <div> in website",
+    "Clean kitchen",
+    "Read book",
+)
+ESTIMATES = ("", "PT30M", "PT1H", "PT1H30M", "PT2H15M", "45 minutes", "10 minutes")
+PRIORITIES = ("N", "1", "2", "3")
+
+
+def _rtm_time(d: dt.datetime) -> str:
+    return d.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def gen_tasks(
+    n_tasks: int, n_lists: int = 20, seed: int = 0
+) -> tuple[list[dict], dict[int, str]]:
+    """
+    Generate n_tasks tasks in the nested format of rtm.tasks.getList.
+
+    ~20% of the taskseries are recurring with 2-5 tasks,
+    ~30% of the tasks have no due date, ~50% are completed within the last year
+    returns tasks per list and a lists_dict of list id -> name
+    """
+    rnd = random.Random(seed)  # noqa: S311
+    today = dt.datetime.combine(get_date_today(), dt.time(), tzinfo=dt.UTC)
+    lists_dict = {10_000_000 + i: f"List {i}" for i in range(n_lists)}
+    tasks_per_list: dict[int, list[dict]] = {list_id: [] for list_id in lists_dict}
+    list_ids = list(lists_dict)
+
+    task_id = 1_000_000_000
+    taskseries_id = 500_000_000
+    n = 0
+    while n < n_tasks:
+        taskseries_id += 1
+        created = today - dt.timedelta(days=rnd.randint(30, 1000))
+        n_instances = rnd.randint(2, 5) if rnd.random() < 0.2 else 1  # noqa: PLR2004
+        n_instances = min(n_instances, n_tasks - n)
+        tasks = []
+        for _ in range(n_instances):
+            task_id += 1
+            due = (
+                ""
+                if rnd.random() < 0.3  # noqa: PLR2004
+                else _rtm_time(today + dt.timedelta(days=rnd.randint(-400, 60)))
+            )
+            completed = (
+                _rtm_time(today - dt.timedelta(seconds=rnd.randint(0, 365 * 86400)))
+                if rnd.random() < 0.5  # noqa: PLR2004
+                else ""
+            )
+            tasks.append(
+                {
+                    "id": str(task_id),
+                    "due": due,
+                    "has_due_time": str(rnd.randint(0, 1)),
+                    "added": _rtm_time(created),
+                    "completed": completed,
+                    "deleted": "",
+                    "priority": rnd.choice(PRIORITIES),
+                    "postponed": str(rnd.choice((0, 0, 0, 1, 2, 5))),
+                    "estimate": rnd.choice(ESTIMATES),
+                }
+            )
+        n += n_instances
+        tasks_per_list[rnd.choice(list_ids)].append(
+            {
+                "id": str(taskseries_id),
+                "created": _rtm_time(created),
+                "modified": _rtm_time(created + dt.timedelta(days=1)),
+                "name": f"{rnd.choice(NAMES)} {taskseries_id}",
+                "source": "js",
+                "url": "",
+                "location_id": "",
+                "tags": {"tag": ["doc"]} if rnd.random() < 0.1 else [],  # noqa: PLR2004
+                "participants": [],
+                "notes": [],
+                "task": tasks,
+            }
+        )
+
+    rtm_tasks = [
+        {"id": str(list_id), "taskseries": taskseries}
+        for list_id, taskseries in tasks_per_list.items()
+        if taskseries
+    ]
+    return rtm_tasks, lists_dict
+
+
+def gen_response(rtm_tasks: list[dict]) -> str:
+    """Wrap tasks into the response text of rtm.tasks.getList."""
+    return json.dumps(
+        {"rsp": {"stat": "ok", "tasks": {"rev": "bench", "list": rtm_tasks}}}
+    )
+
+
+def run_pipeline(response_text: str, lists_dict: dict[int, str]) -> dict[str, float]:
+    """
+    Run all stages once.
+
+    returns stage -> seconds
+    """
+    timings: dict[str, float] = {}
+
+    def timed[T](stage: str, func: Callable[[], T]) -> T:
+        start = time.perf_counter()
+        result = func()
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    rsp = timed("json_parse_response", lambda: json_parse_response(response_text))
+    rtm_tasks = rsp["tasks"]["list"]
+
+    # row-wise path
+    flat = timed("flatten_tasks", lambda: flatten_tasks(rtm_tasks, lists_dict))
+    flat2 = timed("convert_task_fields", lambda: convert_task_fields(flat))
+    timed("tasks_to_df", lambda: tasks_to_df(flat2))
+
+    # columnar path, as used by get_tasks_as_df()
+    records = timed("to_records", lambda: store.to_records(rtm_tasks))
+    df_raw = timed("records_to_df", lambda: records_to_df(records, lists_dict))
+    df = timed("convert_task_columns", lambda: convert_task_columns(df_raw))
+
+    df_html = df.copy()
+    timed("df_name_url_to_html", lambda: df_name_url_to_html(df_html))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        timed(
+            "write_html",
+            lambda: write_html(
+                df.assign(url=task_urls(df)),
+                Path(tmp_dir) / "bench.html",
+                links={"name": "url"},
+            ),
+        )
+    df_completed = df[df["completed"].notna()]
+    timed("completed_week", lambda: completed_week(df_completed))
+    df_overdue = df[df["completed"].isna() & (df["overdue"] > 0)]
+    timed("group_by_list", lambda: group_by_list(df_overdue))
+    return timings
+
+
+def run(sizes: tuple[int, ...], repeat: int = REPEAT_DEFAULT) -> dict:
+    """
+    Benchmark all stages for each number of tasks.
+
+    the best of repeat runs is reported per stage
+    """
+    results: dict[str, dict[str, float]] = {}
+    for size in sizes:
+        rtm_tasks, lists_dict = gen_tasks(size)
+        response_text = gen_response(rtm_tasks)
+        del rtm_tasks
+        best: dict[str, float] = {}
+        for _ in range(repeat):
+            for stage, seconds in run_pipeline(response_text, lists_dict).items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+        results[str(size)] = best
+        print(f"{size:>9} tasks: {sum(best.values()):.3f} s")
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    report: dict, baseline: dict, factor: float = REGRESSION_FACTOR
+) -> list[str]:
+    """
+    Compare a report to a baseline report.
+
+    returns the regressions as lines of "size stage: baseline -> now"
+    """
+    regressions = []
+    for size, stages in report["results"].items():
+        for stage, seconds in stages.items():
+            seconds_base = baseline["results"].get(size, {}).get(stage)
+            if seconds_base is None:
+                continue
+            if (
+                seconds > seconds_base * factor
+                and seconds - seconds_base > REGRESSION_MIN_SECONDS
+            ):
+                regressions.append(
+                    f"{size} {stage}: {seconds_base:.4f} s -> {seconds:.4f} s"
+                )
+    return regressions
+
+
+def print_report(report: dict) -> None:
+    """Print the timings as table of stage x size in ms."""
+    df = pd.DataFrame(report["results"]) * 1000
+    print(df.round(1).to_string())
+
+
+def main() -> int:  # pragma: no cover
+    """Command line interface, returns exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES_DEFAULT)),
+        help=f"comma separated numbers of tasks, up to {SIZES[-1]}",
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT_DEFAULT)
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR / "bench.json")
+    parser.add_argument("--baseline", type=Path, help="report to compare with")
+    parser.add_argument("--factor", type=float, default=REGRESSION_FACTOR)
+    args = parser.parse_args()
+
+    sizes = tuple(int(s) for s in args.sizes.split(","))
+    report = run(sizes, repeat=args.repeat)
+    print_report(report)
+    args.output.parent.mkdir(exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(report, baseline, factor=args.factor)
+        for line in regressions:
+            print(f"Regression {line}")
+        if regressions:
+            return 1
+        print(f"No regressions compared to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
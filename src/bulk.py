@@ -0,0 +1,254 @@
+"""
+Bulk modification of tasks.
+
+Operations (complete, postpone, set due date, set priority) on many tasks,
+e.g. the top N overdue ones, run as one job: a timeline is created
+(rtm.timelines.create), the operations are sent one after the other at the
+rate limit of ratelimit.py, failed ones are reported without stopping the
+job, and a job can be undone via the transaction ids of its operations.
+Modifying calls are not idempotent, so they are only retried if rate limited.
+Operations failing otherwise, e.g. by a read timeout, might have been applied,
+they are reported as outcome unknown and can not be undone.
+Requires a token with perms write, see auth.py.
+
+uv run src/bulk.py postpone --top 200 --execute
+uv run src/bulk.py --undo output/bulk-<timestamp>.json
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import argparse
+import datetime as dt
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import metrics
+import store
+from helper import OUTPUT_DIR
+from rtm_client import OutcomeUnknownError, rtm_call_method
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import pandas as pd
+
+# action -> API method
+ACTIONS = {
+    "complete": "rtm.tasks.complete",
+    "postpone": "rtm.tasks.postpone",
+    "set_due_date": "rtm.tasks.setDueDate",
+    "set_priority": "rtm.tasks.setPriority",
+}
+# action -> required argument
+ACTION_ARGUMENTS = {"set_due_date": "due", "set_priority": "priority"}
+
+
+@dataclass(slots=True, frozen=True)
+class Operation:
+    """One API call on one task, arguments additional to the task ids."""
+
+    action: str
+    task_id: int
+    arguments: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Result:
+    """
+    Outcome of an operation, error is "" on success.
+
+    outcome_unknown: failed, but might have been applied
+    """
+
+    operation: Operation
+    transaction_id: str = ""
+    undoable: bool = False
+    error: str = ""
+    outcome_unknown: bool = False
+
+
+@dataclass(slots=True)
+class Job:
+    """Executed operations, undo needs the same timeline."""
+
+    timeline: str
+    results: list[Result] = field(default_factory=list)
+
+    @property
+    def failed(self) -> list[Result]:
+        """Results of the failed operations."""
+        return [r for r in self.results if r.error]
+
+    def summary(self) -> str:
+        """Return counts of done and failed operations and the errors."""
+        n_failed = len(self.failed)
+        n_done = len(self.results) - n_failed
+        lines = [f"{n_done} done, {n_failed} failed (timeline {self.timeline})"]
+        lines.extend(
+            f"  {r.operation.action} {r.operation.task_id}: {r.error}"
+            for r in self.failed
+        )
+        return "\n".join(lines)
+
+    def save(self, file_path: Path) -> None:
+        """Write as JSON, for undo by a later process."""
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, file_path: Path) -> Job:
+        """Read a job written by save()."""
+        d = json.loads(file_path.read_text())
+        results = [
+            Result(**(r | {"operation": Operation(**r["operation"])}))
+            for r in d["results"]
+        ]
+        return cls(timeline=d["timeline"], results=results)
+
+
+def plan(action: str, df: pd.DataFrame, **arguments: str) -> list[Operation]:
+    """
+    Return the operations of action on the tasks of df.
+
+    df: tasks with column task_id or indexed by task_id, e.g. get_tasks_overdue()
+    arguments: e.g. due="2024-03-01" for set_due_date, priority="1"
+    """
+    if action not in ACTIONS:
+        msg = f"Unknown action: {action}"
+        raise ValueError(msg)
+    if action in ACTION_ARGUMENTS and ACTION_ARGUMENTS[action] not in arguments:
+        msg = f"Action {action} requires argument {ACTION_ARGUMENTS[action]}"
+        raise ValueError(msg)
+    task_ids = df["task_id"] if "task_id" in df.columns else df.index
+    return [Operation(action, int(task_id), arguments) for task_id in task_ids]
+
+
+def create_timeline() -> str:
+    """Create a timeline, needed by all modifying API calls."""
+    return rtm_call_method("rtm.timelines.create", {})["timeline"]
+
+
+def run(
+    operations: list[Operation],
+    timeline: str | None = None,
+    progress: Callable[[int, int, Result], None] | None = None,
+) -> Job:
+    """
+    Execute the operations, in order, at the rate limit.
+
+    failed operations are reported in the results, the others are executed
+    progress: called after each operation with (done, total, result)
+    """
+    job = Job(timeline=timeline or create_timeline())
+    progress = progress or _print_progress
+    locations = store.task_locations([op.task_id for op in operations])
+    for i, op in enumerate(operations, start=1):
+        result = Result(op)
+        if op.task_id not in locations:
+            result.error = "task not in task store"
+        else:
+            list_id, taskseries_id = locations[op.task_id]
+            try:
+                rsp = rtm_call_method(
+                    ACTIONS[op.action],
+                    {
+                        "timeline": job.timeline,
+                        "list_id": str(list_id),
+                        "taskseries_id": str(taskseries_id),
+                        "task_id": str(op.task_id),
+                        **op.arguments,
+                    },
+                    idempotent=False,
+                )
+                result.transaction_id = rsp["transaction"]["id"]
+                result.undoable = rsp["transaction"].get("undoable") == "1"
+            except (OSError, ValueError) as e:
+                # requests exceptions are OSErrors
+                result.error = " ".join(str(e).split())
+                result.outcome_unknown = isinstance(e, OutcomeUnknownError)
+        metrics.count("bulk_failed" if result.error else "bulk_done")
+        job.results.append(result)
+        progress(i, len(operations), result)
+
+    # modified tasks: fetch the stored filters containing them on next access
+    store.expire_filters(_maybe_modified(job))
+    return job
+
+
+def undo(job: Job) -> Job:
+    """
+    Undo the successful operations of job, in reverse order.
+
+    returns the job of the undo operations
+    """
+    undo_job = Job(timeline=job.timeline)
+    for r in reversed(job.results):
+        if not (r.transaction_id and r.undoable):
+            continue
+        result = Result(r.operation)
+        try:
+            rtm_call_method(
+                "rtm.transactions.undo",
+                {"timeline": job.timeline, "transaction_id": r.transaction_id},
+                idempotent=False,
+            )
+        except (OSError, ValueError) as e:
+            result.error = " ".join(str(e).split())
+            result.outcome_unknown = isinstance(e, OutcomeUnknownError)
+        undo_job.results.append(result)
+    store.expire_filters(_maybe_modified(undo_job))
+    return undo_job
+
+
+def _maybe_modified(job: Job) -> list[int]:
+    """Return the task ids of the successful operations and of unknown outcome."""
+    return [
+        r.operation.task_id for r in job.results if not r.error or r.outcome_unknown
+    ]
+
+
+def _print_progress(done: int, total: int, result: Result) -> None:
+    status = f"failed: {result.error}" if result.error else "ok"
+    op = result.operation
+    print(f"{done}/{total} {op.action} {op.task_id} {status}")
+
+
+def main() -> None:  # pragma: no cover
+    """Command line interface, operating on the top overdue tasks."""
+    from tasks_overdue import get_tasks_overdue  # noqa: PLC0415
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("action", nargs="?", choices=ACTIONS)
+    parser.add_argument("--top", type=int, default=10, help="top N overdue tasks")
+    parser.add_argument("--due", help="for set_due_date: YYYY-MM-DD")
+    parser.add_argument("--priority", choices=("1", "2", "3", "N"))
+    parser.add_argument("--execute", action="store_true", help="else dry run")
+    parser.add_argument("--undo", type=Path, help="undo the job saved in file")
+    args = parser.parse_args()
+
+    if args.undo:
+        print(undo(Job.load(args.undo)).summary())
+        return
+    if not args.action:
+        parser.error("action or --undo required")
+
+    arguments = {k: getattr(args, k) for k in ("due", "priority") if getattr(args, k)}
+    df = get_tasks_overdue().head(args.top)
+    operations = plan(args.action, df, **arguments)
+    if not args.execute:
+        print(df[["name", "list", "due", "overdue_prio"]])
+        print(f"Dry run: {len(operations)} x {args.action}, use --execute")
+        return
+
+    job = run(operations)
+    file_path = OUTPUT_DIR / f"bulk-{dt.datetime.now(tz=dt.UTC):%Y%m%d-%H%M%S}.json"
+    job.save(file_path)
+    print(job.summary())
+    print(f"Undo via: uv run src/bulk.py --undo {file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Two-tier cache.
+
+In-process LRU of parsed results over a size-bounded disk cache.
+Entries expire after a TTL per kind of entry (lists, tasks).
+The disk tier only manages its own *.json.gz files in CACHE_DIR, the task store
+(see store.py) is not part of it.
+
+Disk format: gzip compressed compact JSON {"v": SCHEMA_VERSION, "data": value},
+files of another schema version are treated as missing.
+
+Cached values are shared, callers must not modify them.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from atomic import atomic_path
+from config import get_settings
+
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+
+# time to live in seconds per kind of entry
+TTL = {"lists": 3600, "tasks": 3 * 3600}
+# expired entries are kept for serving stale data, in hours, see max_stale()
+MAX_STALE_DEFAULT = 24
+MAX_STALE_IF_ERROR_DEFAULT = 7 * 24
+MEMORY_MAX_ITEMS = 32
+DISK_MAX_MB_DEFAULT = 100
+# increase on incompatible change of the disk format or of cached values
+SCHEMA_VERSION = 1
+
+# statistics of this process
+STATS = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "evictions": 0}
+
+# key -> (time of creation, value)
+_MEMORY: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _file_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json.gz"
+
+
+def _read(file_path: Path) -> Any | None:  # noqa: ANN401
+    """Read a file of the disk tier, None if of other schema version."""
+    with gzip.open(file_path, "rt", encoding="utf-8") as fh:
+        content = json.load(fh)
+    if content.get("v") != SCHEMA_VERSION:
+        return None
+    return content["data"]
+
+
+def max_stale(*, if_error: bool = False) -> float:
+    """
+    Return max age in seconds of expired data that may be served.
+
+    while refreshing in the background (setting max_stale_hours)
+    or if the refresh fails (setting max_stale_if_error_hours)
+    """
+    settings = get_settings()
+    if if_error:
+        hours = settings.get("max_stale_if_error_hours", MAX_STALE_IF_ERROR_DEFAULT)
+    else:
+        hours = settings.get("max_stale_hours", MAX_STALE_DEFAULT)
+    return float(hours) * 3600
+
+
+def get(kind: str, key: str, *, disk: bool = True) -> Any | None:  # noqa: ANN401
+    """
+    Return cached value or None if missing or expired.
+
+    kind: type of entry, defines the TTL
+    disk: also look in the disk tier
+    """
+    ttl = TTL[kind]
+    now = time.time()
+    with _LOCK:
+        if key in _MEMORY:
+            created, value = _MEMORY[key]
+            if now - created < ttl:
+                _MEMORY.move_to_end(key)
+                STATS["hits_memory"] += 1
+                return value
+
+    file_path = _file_path(key)
+    if disk and file_path.exists():
+        try:
+            created = file_path.stat().st_mtime
+            if now - created < ttl and (value := _read(file_path)) is not None:
+                # access time is used for LRU eviction, mtime for TTL
+                os.utime(file_path, (now, created))
+                _memory_put(key, value, created)
+                _count("hits_disk")
+                return value
+        except FileNotFoundError:
+            pass  # evicted by other process meanwhile
+
+    _count("misses")
+    return None
+
+
+def get_stale(key: str) -> tuple[Any, float] | None:
+    """
+    Return cached value and its age in seconds, ignoring the TTL.
+
+    None if not in cache
+    """
+    now = time.time()
+    with _LOCK:
+        if key in _MEMORY:
+            created, value = _MEMORY[key]
+            return value, now - created
+    file_path = _file_path(key)
+    try:
+        created = file_path.stat().st_mtime
+        value = _read(file_path)
+    except FileNotFoundError:
+        return None
+    if value is None:
+        return None
+    return value, now - created
+
+
+def put(kind: str, key: str, value: Any, *, disk: bool = True) -> None:  # noqa: ANN401
+    """
+    Store value in cache.
+
+    disk: also write to disk tier, atomic, see atomic.py
+    """
+    assert kind in TTL, kind
+    _memory_put(key, value, time.time())
+    if not disk:
+        return
+    # compresslevel 6: nearly as small as 9, but much faster
+    with (
+        atomic_path(_file_path(key)) as file_tmp,
+        gzip.open(file_tmp, "wt", encoding="utf-8", compresslevel=6) as fh,
+    ):
+        json.dump(
+            {"v": SCHEMA_VERSION, "data": value},
+            fh,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+    evict_disk()
+
+
+def _count(stat: str) -> None:
+    # STATS is shared by the threads, updated under the lock
+    with _LOCK:
+        STATS[stat] += 1
+
+
+def _memory_put(key: str, value: Any, created: float) -> None:  # noqa: ANN401
+    with _LOCK:
+        _MEMORY[key] = (created, value)
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > MEMORY_MAX_ITEMS:
+            _MEMORY.popitem(last=False)
+            STATS["evictions"] += 1
+
+
+def evict_disk(max_bytes: int | None = None) -> None:
+    """
+    Delete expired files and least recently used files above the size budget.
+
+    max_bytes: default from setting cache_max_mb
+    """
+    if max_bytes is None:
+        max_mb = get_settings().get("cache_max_mb", DISK_MAX_MB_DEFAULT)
+        max_bytes = int(float(max_mb) * 1024 * 1024)
+    max_ttl = max(TTL.values()) + max_stale(if_error=True)
+    now = time.time()
+    files = []
+    for file_path in CACHE_DIR.glob("*.json.gz"):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:  # pragma: no cover
+            continue  # deleted by other process
+        if now - stat.st_mtime > max_ttl:
+            file_path.unlink(missing_ok=True)
+            _count("evictions")
+        else:
+            files.append((stat.st_atime, stat.st_size, file_path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, file_path in sorted(files):
+        if total <= max_bytes:
+            break
+        file_path.unlink(missing_ok=True)
+        total -= size
+        _count("evictions")
+
+
+def clear() -> None:
+    """Remove all entries of both tiers."""
+    with _LOCK:
+        _MEMORY.clear()
+    for file_path in CACHE_DIR.glob("*.json.gz"):
+        file_path.unlink()
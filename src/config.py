@@ -0,0 +1,34 @@
+"""
+Settings from rememberthemilk.toml.
+
+Read on first access, so importing modules has no side effects.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import datetime as dt
+import functools
+import tomllib
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+CONFIG_FILE = Path(__file__).parent / "rememberthemilk.toml"
+
+
+@functools.cache
+def get_settings() -> dict[str, str]:
+    """Read the settings from the config file."""
+    with CONFIG_FILE.open("rb") as fh:
+        return tomllib.load(fh)["settings"]
+
+
+@functools.cache
+def get_tz() -> ZoneInfo:
+    """Return the configured timezone."""
+    return ZoneInfo(get_settings()["timezone"])
+
+
+def get_date_today() -> dt.date:
+    """Return today's date in the configured timezone."""
+    return dt.datetime.now(tz=get_tz()).date()
@@ -0,0 +1,149 @@
+"""
+Shared data of the Streamlit app, refreshed in the background.
+
+One DataService per process loads the DataFrames of all reports, see
+report_data.py, and refreshes them every REFRESH_INTERVAL seconds in a
+background thread. Pages get the current Snapshot, the same objects for all
+sessions and pages, without copying and without waiting on the RTM API.
+As the DataFrames of a snapshot are shared, they must not be modified.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import functools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import helper
+from report_data import get_reports
+from tasks_completed import completed_week_incremental
+from tasks_overdue import group_by_list
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import numpy as np
+    import pandas as pd
+
+REFRESH_INTERVAL = 15 * 60
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    DataFrames of all reports, loaded at fetched_at (epoch).
+
+    list_indexes: report -> list -> row positions, see list_index()
+    """
+
+    reports: dict[str, pd.DataFrame]
+    fetched_at: float
+    list_indexes: dict[str, dict[str, np.ndarray]] = field(default_factory=dict)
+
+    def age(self) -> float:
+        """Return the age in seconds."""
+        return time.time() - self.fetched_at
+
+
+def load_reports() -> dict[str, pd.DataFrame]:
+    """
+    Return the DataFrames of all pages.
+
+    completed, completed_week, overdue, overdue_by_list
+    """
+    reports = get_reports()
+    reports["overdue"] = reports["overdue"].sort_values(
+        by=["overdue"], ascending=[True], ignore_index=True
+    )
+    reports["completed_week"] = completed_week_incremental(reports["completed"])
+    reports["overdue_by_list"] = group_by_list(reports["overdue"])
+    return reports
+
+
+def list_index(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    """
+    Return the row positions per list, sorted by list.
+
+    the rows of a list are df.iloc[index[list]], without scanning df
+    """
+    indices = df.groupby("list", observed=True, sort=False).indices
+    return {str(k): indices[k] for k in sorted(indices, key=str)}
+
+
+class DataService:
+    """
+    Load reports in a background thread and refresh them periodically.
+
+    load: returns the reports, load_reports() by default
+    interval: seconds between the refreshes
+    snapshot: current data, None until the first load finished
+    error: error of the last refresh, the previous snapshot is kept
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], dict[str, pd.DataFrame]] = load_reports,
+        interval: float = REFRESH_INTERVAL,
+    ) -> None:
+        """Create, but do not start, the service."""
+        self.load = load
+        self.interval = interval
+        self.snapshot: Snapshot | None = None
+        self.error = ""
+        self.refreshes = 0
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self) -> DataService:
+        """Load and refresh in a background thread."""
+        threading.Thread(target=self._run, name="data service", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop refreshing after the running refresh."""
+        self._stop.set()
+
+    def wait(self, timeout: float | None = None) -> Snapshot | None:
+        """Wait for the first snapshot, for scripts and tests."""
+        self._ready.wait(timeout)
+        return self.snapshot
+
+    def refresh(self) -> None:
+        """Load the reports and replace the snapshot, keep it on errors."""
+        start = time.time()
+        try:
+            reports = self.load()
+        except Exception as e:  # noqa: BLE001
+            self.error = f"refresh failed: {e}"
+            print(f"Data service {self.error}")
+            return
+        # replacing the reference is atomic, readers get the old or the new one
+        self.snapshot = Snapshot(
+            reports=reports,
+            fetched_at=start,
+            list_indexes={
+                name: list_index(df)
+                for name, df in reports.items()
+                if "list" in df.columns
+            },
+        )
+        self.error = ""
+        self.refreshes += 1
+        self._ready.set()
+        print(f"Data service refreshed in {time.time() - start:.1f}s")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+
+@functools.cache
+def get_service() -> DataService:
+    """Return the service of this process, started on first call."""
+    # long running: expired data is served while refreshed in the background
+    helper.STALE_WHILE_REVALIDATE = True
+    return DataService().start()
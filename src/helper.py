@@ -10,97 +10,79 @@ RTM helper functions.
 # list of available API methods can be fount at https://www.rememberthemilk.com/services/api/methods.rtm
 
 import datetime as dt
-import hashlib
-import json
 import re
+import threading
 import time
-import tomllib
 from pathlib import Path
-from typing import cast
-from zoneinfo import ZoneInfo
+from typing import TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
-import requests
 
-CACHE_DIR = Path(__file__).parent.parent / "cache"
-OUTPUT_DIR = Path(__file__).parent.parent / "output"
-CACHE_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+import cache
+import metrics
+import rtm_filter
+import singleflight
+import store
+from config import get_date_today, get_tz
+from html_writer import escape_html, write_html
+from rtm_client import gen_md5_string, rtm_call_method
 
-# delete cache files older 1h
-for file_path in CACHE_DIR.glob("*.json"):  # pragma: no cover
-    if time.time() - file_path.stat().st_mtime > 3600:  # noqa: PLR2004
-        file_path.unlink()
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+OUTPUT_DIR = Path(__file__).parent.parent / "output"
 
-with (Path(__file__).parent / "rememberthemilk.toml").open("rb") as f:
-    cfg = tomllib.load(f)["settings"]
-    cfg = cast("dict[str, str]", cfg)
-
-API_KEY = cfg["api_key"]
-SHARED_SECRET = cfg["shared_secret"]
-TOKEN = cfg["token"]
-TZ = ZoneInfo(cfg["timezone"])
-DATE_TODAY = dt.datetime.now(tz=TZ).date()
+# full re-fetch of tasks at least once per day, in between use delta sync
+SYNC_FULL_MAX_AGE = 24 * 3600
 
-URL_RTM_BASE = "https://api.rememberthemilk.com/services/rest/"
+# serve expired data immediately and refresh it in the background, see
+# serve_stale(), enabled by the long running processes data_service.py and
+# watch.py, not by the scripts: they exit before a background refresh is done
+STALE_WHILE_REVALIDATE = False
+# key of served stale data ("lists" or filter key) -> reason
+STALE: dict[str, str] = {}
+_REFRESHING: set[str] = set()
+_REFRESHING_LOCK = threading.Lock()
 
 PRIORITY_MAP = {"N": 1, "3": 1, "2": 2, "1": 4}
 
+# columns of flat tasks, see flatten_tasks()
+TASK_COLUMNS = (
+    "list_id",
+    "task_id",
+    "list",
+    "name",
+    "due",
+    "completed",
+    "prio",
+    "estimate",
+    "postponed",
+    "deleted",
+)
+INT_COLUMNS = ("list_id", "task_id", "postponed")
+
+# compact dtypes of converted tasks, see compact_task_columns()
+# ~ 20 MB per 100k tasks instead of 50 MB, see README.md
+CATEGORY_COLUMNS = ("list", "name", "deleted", "completed_time")
+COMPACT_INT_DTYPES = {
+    "list_id": "uint32",
+    "task_id": "uint32",
+    "prio": "int8",
+    "postponed": "int16",
+}
+
+URL_TASK = "https://www.rememberthemilk.com/app/#list/{list_id}/{task_id}"
+
 #
 # helper functions 1: converters
 #
 
 
 def delete_cache() -> None:  # noqa: D103
-    for file_path in CACHE_DIR.glob("*.json"):  # pragma: no cover
-        file_path.unlink()
-
-
-def dict_to_url_param(d: dict[str, str]) -> str:
-    """
-    Convert a dictionary of parameter to url parameter string.
-
-    value pairs to an url conform list of key1=value1&key2=value2...
-    """
-    return "&".join("=".join(tup) for tup in d.items())
-
-
-def json_parse_response(response_text: str) -> dict:
-    """
-    Convert response_text as JSON.
-
-    Ensures that the response status is ok and drops that
-    """
-    try:
-        d_json: dict = json.loads(response_text)
-    except json.JSONDecodeError:  # pragma: no cover
-        msg = f"Invalid JSON:\n{response_text}"
-        raise ValueError(msg) from None
-    if d_json["rsp"]["stat"] != "ok":  # pragma: no cover
-        msg = f"Status not ok:\n{d_json}"
-        raise ValueError(msg) from None
-    del d_json["rsp"]["stat"]
-    return d_json["rsp"]
-
-
-def json_read(file_path: Path) -> list[dict[str, str]]:
-    """
-    Read JSON data from file.
-    """
-    with file_path.open(encoding="utf-8") as fh:
-        json_data = json.load(fh)
-    return json_data
-
-
-def json_write(
-    file_path: Path, json_data: list[dict[str, str]]
-) -> None:  # pragma: no cover
-    """
-    Write JSON data to file.
-    """
-    with file_path.open("w", encoding="utf-8", newline="\n") as fh:
-        json.dump(json_data, fh, ensure_ascii=False, sort_keys=False, indent=2)
+    cache.clear()  # pragma: no cover
+    store.delete_db()  # pragma: no cover
 
 
 # def substr_between(s: str, s1: str, s2: str) -> str:
@@ -118,182 +100,487 @@ def json_write(
 #     return out
 
 
-def gen_md5_string(s: str) -> str:
+# helper functions 4: lists
+
+
+def get_lists_dict() -> dict[int, str]:
+    """
+    Return a dict of id -> name.
+    """
+    # print("\nRTM Lists")
+    rtm_lists = get_lists()
+    lists_dict: dict[int, str] = {}
+    for el in rtm_lists:
+        # {'id': '25825681', 'name': 'Name of my List', 'deleted': '0', 'locked': '0', 'archived': '0', 'position': '0', 'smart': '0', 'sort_order': '0'}  # noqa: E501
+        lists_dict[int(el["id"])] = el["name"]
+    # for my_tasks_per_list in rtm_lists:
+    #     print(
+    #         my_tasks_per_list["id"],
+    #         my_tasks_per_list["smart"],
+    #         my_tasks_per_list["name"],
+    #     )
+    return lists_dict
+
+
+def get_lists() -> list[dict[str, str]]:
     """
-    Generate MD5 hash.
+    Fetch lists from RTM or cache if recent.
+
+    if expired, stale lists might be served, see serve_stale()
+    and fetch_or_stale()
     """
-    m = hashlib.new("md5", usedforsecurity=False)
-    m.update(s.encode("ascii"))
-    return m.hexdigest()
+    lists = cache.get("lists", "lists")
+    if lists is not None:
+        STALE.pop("lists", None)
+        return lists
 
+    def fetch() -> list[dict[str, str]]:  # pragma: no cover
+        lists = get_rmt_lists()
+        cache.put("lists", "lists", lists)
+        return lists
+
+    def refresh() -> list[dict[str, str]]:  # pragma: no cover
+        # concurrent callers share one fetch
+        lists = singleflight.do("lists", fetch)
+        STALE.pop("lists", None)
+        return lists
+
+    stale = cache.get_stale("lists")
+    age = stale[1] if stale else None
+    if serve_stale(key="lists", age=age, refresh=refresh):
+        return stale[0]  # type: ignore
+    return fetch_or_stale(
+        key="lists",
+        age=age,
+        refresh=refresh,
+        load_stale=lambda: stale[0],  # type: ignore
+    )
 
-def check_cache_file_available_and_recent(
-    file_path: Path,
-    max_age: int = 3500,
-) -> bool:
-    """Check if cache file exists and is recent."""
-    cache_good = False
-    if file_path.exists() and (time.time() - file_path.stat().st_mtime < max_age):
-        cache_good = True
-    return cache_good
 
+def serve_stale(key: str, age: float | None, refresh: Callable[[], object]) -> bool:
+    """
+    Check if expired data may be served, while refreshing it in the background.
 
-def perform_rest_call(url: str) -> str:  # pragma: no cover
+    if STALE_WHILE_REVALIDATE and the data is not older than
+    cache.max_stale(), starts refresh in a background thread (if not running)
+    refresh shares its fetch with foreground callers via singleflight.py
+    """
+    if not (STALE_WHILE_REVALIDATE and age is not None and age < cache.max_stale()):
+        return False
+    STALE[key] = f"data from {age / 60:.0f} min ago, refreshing"
+
+    with _REFRESHING_LOCK:
+        if key in _REFRESHING:
+            return True
+        _REFRESHING.add(key)
+
+    def run() -> None:
+        try:
+            refresh()
+        except Exception as e:  # noqa: BLE001
+            print(f"Background refresh of {key} failed: {e}")
+        finally:
+            with _REFRESHING_LOCK:
+                _REFRESHING.discard(key)
+
+    threading.Thread(target=run, name=f"refresh {key}", daemon=True).start()
+    return True
+
+
+def fetch_or_stale[T](
+    key: str, age: float | None, refresh: Callable[[], T], load_stale: Callable[[], T]
+) -> T:
     """
-    Perform a simple REST call to an url.
+    Fetch fresh data, if that fails return stale data.
 
-    if a cache file is more recent than 1 sec, wait for 1 sec
-    Assert status = 200
-    Return the response text.
+    stale data is only used if not older than cache.max_stale(if_error=True)
     """
-    # rate limit: 1 request per second
-    for file_path in CACHE_DIR.glob("*.json"):
-        if int(time.time()) == int(file_path.stat().st_mtime):
-            print("sleeping for 1s to prevent rate limit")
-            time.sleep(1)
-            break
+    try:
+        return refresh()
+    except (OSError, ValueError) as e:
+        # requests exceptions are OSErrors
+        if age is None or age > cache.max_stale(if_error=True):
+            raise
+        print(f"Using stale data of {key}, as refresh failed: {e}")
+        STALE[key] = f"data from {age / 60:.0f} min ago, API error: {e}"
+        return load_stale()
 
-    resp = requests.get(url, timeout=3)
-    if resp.status_code != 200:  # noqa: PLR2004
-        msg = f"Bad response. status code:{resp.status_code}, text:\n{resp.text}"
-        raise ValueError(msg) from None
-    return resp.text
 
+def get_rmt_lists() -> list[dict[str, str]]:
+    """Fetch lists from RTM."""
+    json_data = rtm_call_method(method="rtm.lists.getList", arguments={})
+    lists = json_data["lists"]["list"]
+    lists = sorted(lists, key=lambda x: (x["smart"], x["name"]), reverse=False)
+    return lists
 
-#
-# helper functions 3: rtm specific
-#
+
+# helper functions 5: tasks
+
+# converted DataFrame per filter, for re-processing only the changed taskseries
+# filter -> (lists_dict, date_today, fingerprint, df)
+_DF_MEMO: dict[str, tuple[dict[int, str], dt.date, dict[int, tuple], pd.DataFrame]] = {}
 
 
-def gen_api_sig(param: dict[str, str]) -> str:
+def get_tasks_as_df(my_filter: str, lists_dict: dict[int, str]) -> pd.DataFrame:
     """
-    Generate the api_sig.
+    Fetch filtered tasks from RTM or cache if recent.
 
-    according to https://www.rememberthemilk.com/services/api/authentication.rtm
-    yxz=foo feg=bar abc=baz
-      -> (1. sorting) abc=baz feg=bar yxz=foo
-      -> (2. joining) abcbazfegbaryxzfoo -> MD5
+    if stale data was served, df.attrs["stale"] contains the reason
     """
-    s = "".join("".join(tup) for tup in sorted(param.items()))
-    api_sig = gen_md5_string(SHARED_SECRET + s)
-    return api_sig
+    records = get_task_records(my_filter)
+    df = task_records_to_df(my_filter=my_filter, records=records, lists_dict=lists_dict)
+    df.attrs["stale"] = get_stale_reason(filter_key(my_filter))
+    return df
 
 
-def rtm_append_key_and_sig(d: dict[str, str]) -> dict[str, str]:
-    """
-    Add api_key (known) and api_sig (generated) to dict d.
-    """
-    d["api_key"] = API_KEY
-    d["api_sig"] = gen_api_sig(d)
-    return d
+def get_stale_reason(key: str) -> str:
+    """Return why stale data of lists or filter key was served, or ""."""
+    return "; ".join(STALE[k] for k in ("lists", key) if k in STALE)
 
 
-def rtm_append_key_and_token_and_sig(d: dict[str, str]) -> dict[str, str]:
+@metrics.timed("task_records_to_df")
+def task_records_to_df(
+    my_filter: str, records: list[store.Task], lists_dict: dict[int, str]
+) -> pd.DataFrame:
     """
-    Add api_key (known) auth_token (parameter) and api_sig (generated) to dict d.
+    Convert the fetched tasks of a filter to DataFrame.
+
+    Only taskseries that changed since the previous call for this filter
+    are converted again, the rows of the unchanged ones are reused.
+    """
+    my_filter = normalize_filter(my_filter)
+    fingerprint = tasks_fingerprint(records)
+
+    date_today = get_date_today()
+    memo = _DF_MEMO.get(my_filter)
+    # overdue of not completed tasks depends on today
+    if memo is None or memo[0] != lists_dict or memo[1] != date_today:
+        df = convert_task_columns(records_to_df(records, lists_dict=lists_dict))
+    else:
+        _, _, fingerprint_old, df_old = memo
+        changed = {k for k, v in fingerprint.items() if fingerprint_old.get(k) != v}
+        # task ids of modified and removed taskseries
+        task_ids_old = {
+            task_id
+            for k, v in fingerprint_old.items()
+            if k in changed or k not in fingerprint
+            for task_id in v[2]
+        }
+        df = df_old[~df_old["task_id"].isin(task_ids_old)]
+        df_new = records_to_df(
+            [t for t in records if t.taskseries_id in changed], lists_dict=lists_dict
+        )
+        if len(df_new):
+            df_new = convert_task_columns(df_new)
+            df = pd.concat([df, df_new]) if len(df) else df_new
+        df = compact_task_columns(df.reset_index(drop=True))
+
+    _DF_MEMO[my_filter] = (lists_dict.copy(), date_today, fingerprint, df)
+    return df.copy()
+
+
+def normalize_filter(my_filter: str) -> str:
+    """Replace whitespaces by space."""
+    return re.sub(r"\s+", " ", my_filter, flags=re.DOTALL)
+
+
+def canonical_filter(my_filter: str) -> str:
     """
-    d["api_key"] = API_KEY
-    d["auth_token"] = TOKEN
-    d["api_sig"] = gen_api_sig(d)
-    return d
+    Return the canonical spelling of a filter, see rtm_filter.canonical().
+
+    filters not supported by rtm_filter.py are only normalized
+    """
+    try:
+        return rtm_filter.canonical(rtm_filter.parse(my_filter))
+    except ValueError:
+        return normalize_filter(my_filter)
 
 
-def rtm_call_method(method: str, arguments: dict[str, str]) -> dict:  # pragma: no cover
+def filter_key(my_filter: str, list_id: str | None = None) -> str:
     """
-    Call any rtm API method.
+    Return the key of a filter result: the canonical filter.
 
-    request in json format
-    asserts that the response is ok
+    for results restricted to a list, the list_id is appended
     """
-    param = {"method": method, "format": "json"}
-    param.update(arguments)
-    param_str = dict_to_url_param(rtm_append_key_and_token_and_sig(param))
-    url = f"{URL_RTM_BASE}?{param_str}"
-    response_text = perform_rest_call(url)
-    d_json = json_parse_response(response_text)
-    return d_json
+    my_filter = canonical_filter(my_filter)
+    if list_id:
+        my_filter += f" | list_id={list_id}"
+    return my_filter
 
 
-# helper functions 4: lists
+def get_tasks(my_filter: str) -> list[dict]:
+    """
+    Fetch filtered tasks from RTM or task store if recent.
 
+    in the nested format of rtm.tasks.getList, see get_task_records()
+    """
+    return store.records_to_nested(get_task_records(my_filter))
 
-def get_lists_dict() -> dict[int, str]:
+
+@metrics.timed("get_tasks")
+def get_task_records(
+    my_filter: str, max_age: float | None = None, list_id: str | None = None
+) -> list[store.Task]:
     """
-    Return a dict of id -> name.
+    Fetch filtered tasks from RTM or task store if recent.
+
+    max_age: seconds the stored tasks are recent, default cache.TTL["tasks"]
+    list_id: optionally restrict to one list, stored as separate result
+    if expired, stale tasks might be served, see serve_stale()
+    and fetch_or_stale()
     """
-    # print("\nRTM Lists")
-    rtm_lists = get_lists()
-    lists_dict: dict[int, str] = {}
-    for el in rtm_lists:
-        # {'id': '25825681', 'name': 'Name of my List', 'deleted': '0', 'locked': '0', 'archived': '0', 'position': '0', 'smart': '0', 'sort_order': '0'}  # noqa: E501
-        lists_dict[int(el["id"])] = el["name"]
-    # for my_tasks_per_list in rtm_lists:
-    #     print(
-    #         my_tasks_per_list["id"],
-    #         my_tasks_per_list["smart"],
-    #         my_tasks_per_list["name"],
-    #     )
-    return lists_dict
+    if max_age is None:
+        max_age = cache.TTL["tasks"]
+    my_filter = normalize_filter(my_filter)
+    key = filter_key(my_filter, list_id)
+    h = gen_md5_string(key)
+    state = store.filter_state(h)
+    age = time.time() - float(state["fetched_at"]) if state else None
+    # expired: tasks modified via the API, see bulk.py
+    expired = bool(state and state["expired"])
+    if age is not None and age < max_age and not expired:
+        print(f"Using task store for filter: {key}")
+        STALE.pop(key, None)
+        return load_task_records(h)
+    # results per list are not answered from other filters
+    records = None if list_id else get_local_records(my_filter, max_age)
+    if records is not None:
+        STALE.pop(key, None)
+        return records
+
+    def refresh() -> list[store.Task]:
+        # concurrent callers of the same filter share one fetch
+        records = singleflight.do(
+            f"tasks {key}",
+            lambda: store.to_records(fetch_tasks(my_filter, list_id=list_id)),
+        )
+        STALE.pop(key, None)
+        return records
+
+    if serve_stale(key=key, age=age, refresh=refresh):
+        return load_task_records(h)
+    return fetch_or_stale(
+        key=key, age=age, refresh=refresh, load_stale=lambda: load_task_records(h)
+    )
 
 
-def get_lists() -> list[dict[str, str]]:
-    """Fetch lists from RTM or cache if recent."""
-    cache_file = CACHE_DIR / "lists.json"
-    if check_cache_file_available_and_recent(file_path=cache_file, max_age=3600):
-        lists = json_read(cache_file)
-    else:  # pragma: no cover
-        lists = get_rmt_lists()
-        json_write(cache_file, lists)
-    return lists
+def get_local_records(
+    my_filter: str, max_age: float | None = None
+) -> list[store.Task] | None:
+    """
+    Answer a filter locally, from the recent result of a filter covering it.
 
+    e.g. overdue tasks from the result of "status:incomplete"
+    max_age: see get_task_records()
+    results of filters with relative dates like dueBefore:Today are only used
+    on the day they were fetched, see delta_match()
+    returns None if no such result is stored or the filter is not supported
+    """
+    try:
+        expr = rtm_filter.parse(my_filter)
+    except ValueError:
+        return None
+    if max_age is None:
+        max_age = cache.TTL["tasks"]
+    now = time.time()
+    for h, key, fetched_at in store.list_filters():
+        if now - fetched_at >= max_age or " | list_id=" in key:
+            continue
+        try:
+            superset = rtm_filter.parse(key)
+            if superset == expr or not rtm_filter.covers(superset, expr):
+                continue
+            date_fetched = dt.datetime.fromtimestamp(fetched_at, tz=get_tz()).date()
+            if rtm_filter.is_relative(superset) and date_fetched != get_date_today():
+                continue
+            match = rtm_filter.compile_filter(expr, get_lists_dict)
+        except ValueError:
+            continue
+        print(f"Using task store of filter {key} for filter: {my_filter}")
+        metrics.count("filter_local")
+        return [t for t in load_task_records(h) if match(t)]
+    return None
+
+
+def load_task_records(filter_hash: str) -> list[store.Task]:
+    """
+    Read the tasks of a filter from memory cache or task store.
 
-def get_rmt_lists() -> list[dict[str, str]]:  # pragma: no cover
-    """Fetch lists from RTM."""
-    json_data = rtm_call_method(method="rtm.lists.getList", arguments={})
-    lists = json_data["lists"]["list"]
-    lists = sorted(lists, key=lambda x: (x["smart"], x["name"]), reverse=False)
-    return lists
+    the memory cache is not used if a task of the filter was modified since,
+    e.g. by the fetch of another filter containing it
+    """
+    state = store.filter_state(filter_hash)
+    assert state is not None
+    # records of this fetch in memory cache: (last change, task ids, records)
+    cache_key = f"tasks-{filter_hash}-{state['fetched_at']}"
+    cached = cache.get("tasks", cache_key, disk=False)
+    if cached is not None:
+        seq, task_ids, records = cached
+        changed, seq = store.changed_tasks(seq)
+        if changed.isdisjoint(task_ids):
+            cache.put("tasks", cache_key, (seq, task_ids, records), disk=False)
+            return records
+    seq = store.last_change()
+    records = store.load_task_records(filter_hash)
+    task_ids = frozenset(t.task_id for t in records)
+    cache.put("tasks", cache_key, (seq, task_ids, records), disk=False)
+    return records
+
+
+def fetch_tasks(
+    my_filter: str, list_id: str | None = None
+) -> list[dict]:  # pragma: no cover
+    """
+    Fetch filtered tasks from RTM and save them in the task store.
 
+    If possible, see delta_match(), only the tasks modified since the last
+    fetch are requested (delta sync), merged and filtered locally.
+    """
+    key = filter_key(my_filter, list_id)
+    h = gen_md5_string(key)
+    state = store.filter_state(h)
+    # local time of request minus safety margin for clock drift,
+    # as delta merges are idempotent, a small overlap does not harm
+    time_request = dt.datetime.now(tz=dt.UTC) - dt.timedelta(minutes=5)
+    match = delta_match(my_filter, state)
+    if match is None:
+        tasks = get_rtm_tasks(my_filter, list_id=list_id)
+    else:
+        print(f"Delta sync since {state['last_sync']}")  # type: ignore
+        # without filter: modified tasks no longer matching it are returned too
+        delta = get_rtm_tasks(
+            "",
+            list_id=list_id,
+            last_sync=str(state["last_sync"]),  # type: ignore
+        )
+        tasks = merge_tasks(rtm_tasks=store.load_tasks(h), rtm_delta=delta)
+        tasks = store.records_to_nested(
+            [t for t in store.to_records(tasks) if match(t)]
+        )
+    store.save_tasks(
+        h,
+        key,
+        tasks,
+        last_sync=time_request.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        full_sync=match is None,
+    )
+    return tasks
 
-# helper functions 5: tasks
 
+def delta_match(
+    my_filter: str, state: dict[str, float | str] | None
+) -> Callable[[store.Task], bool] | None:
+    """
+    Return the local evaluation of my_filter if a delta sync is possible.
 
-def get_tasks_as_df(my_filter: str, lists_dict: dict[int, str]) -> pd.DataFrame:
-    """Fetch filtered tasks from RTM or cache if recent."""
-    tasks = get_tasks(my_filter)
-    tasks_list_flat = flatten_tasks(rtm_tasks=tasks, lists_dict=lists_dict)
-    tasks_list_flat2 = convert_task_fields(tasks_list_flat)
-    df = tasks_to_df(tasks_list_flat2)
-    return df
+    None, i.e. full sync, if the filter is not supported by rtm_filter.py,
+    the last full sync is older than SYNC_FULL_MAX_AGE or, for relative dates
+    like dueBefore:Today, from another day
+    """
+    if not (
+        state
+        and state["last_sync"]
+        and time.time() - float(state["full_sync"]) < SYNC_FULL_MAX_AGE
+    ):
+        return None
+    try:
+        expr = rtm_filter.parse(my_filter)
+        match = rtm_filter.compile_filter(expr, get_lists_dict)
+    except ValueError:
+        return None
+    date_full_sync = dt.datetime.fromtimestamp(
+        float(state["full_sync"]), tz=get_tz()
+    ).date()
+    if rtm_filter.is_relative(expr) and date_full_sync != get_date_today():
+        return None
+    return match
 
 
-def get_tasks(my_filter: str) -> list[dict]:
-    """Fetch filtered tasks from RTM or cache if recent."""
-    # replace whitespaces by space
-    my_filter = re.sub(r"\s+", " ", my_filter, flags=re.DOTALL)
-    h = gen_md5_string(my_filter)
-    cache_file = CACHE_DIR / f"tasks-{h}.json"
-    if check_cache_file_available_and_recent(file_path=cache_file, max_age=3 * 3600):
-        print(f"Using cache file: {cache_file}")
-        tasks = json_read(cache_file)
-    else:  # pragma: no cover
-        tasks = get_rtm_tasks(my_filter)
-        json_write(cache_file, tasks)
+def get_rtm_tasks(
+    my_filter: str, list_id: str | None = None, last_sync: str | None = None
+) -> list[dict]:
+    """
+    Fetch filtered tasks from RTM.
+
+    my_filter: "" for all tasks
+    list_id: if set only tasks of this list are returned
+    last_sync: ISO 8601 time, if set only tasks modified since are returned
+    """
+    arguments = {}
+    if my_filter:
+        arguments["filter"] = my_filter
+    if list_id:
+        arguments["list_id"] = list_id
+    if last_sync:
+        arguments["last_sync"] = last_sync
+    json_data = rtm_call_method(method="rtm.tasks.getList", arguments=arguments)
+    tasks = json_data["tasks"].get("list", [])
     return tasks
 
 
-def get_rtm_tasks(my_filter: str) -> list[dict]:  # pragma: no cover
-    # pragma: no cover
-    """Fetch filtered tasks from RTM."""
-    arguments = {
-        "filter": my_filter,
-        # "list_id": "45663479",  # filter by list ID
+def merge_tasks(rtm_tasks: list[dict], rtm_delta: list[dict]) -> list[dict]:
+    """
+    Merge a delta sync response into the cached tasks.
+
+    taskseries of the delta replace the cached ones of same id,
+    deleted tasks are removed, as well as taskseries without remaining tasks.
+    note: the filter is not evaluated here, see fetch_tasks()
+    """
+    # list_id -> taskseries_id -> taskseries
+    lists: dict[str, dict[str, dict]] = {
+        tasks_per_list["id"]: {
+            ts["id"]: ts for ts in store.as_list(tasks_per_list.get("taskseries"))
+        }
+        for tasks_per_list in rtm_tasks
     }
-    json_data = rtm_call_method(method="rtm.tasks.getList", arguments=arguments)
-    tasks = json_data["tasks"]["list"]
-    return tasks
+    for tasks_per_list in rtm_delta:
+        series = lists.setdefault(tasks_per_list["id"], {})
+        for taskseries in store.as_list(tasks_per_list.get("taskseries")):
+            # taskseries might have been moved from another list
+            for other in lists.values():
+                other.pop(taskseries["id"], None)
+            taskseries["task"] = [
+                task
+                for task in store.as_list(taskseries["task"])
+                if not task["deleted"]
+            ]
+            if taskseries["task"]:
+                series[taskseries["id"]] = taskseries
+
+        for deleted in store.as_list(tasks_per_list.get("deleted")):
+            for taskseries in store.as_list(deleted.get("taskseries")):
+                if taskseries["id"] not in series:
+                    continue
+                task_ids = {
+                    task["id"] for task in store.as_list(taskseries.get("task"))
+                }
+                ts = series[taskseries["id"]]
+                ts["task"] = [task for task in ts["task"] if task["id"] not in task_ids]
+                if not ts["task"]:
+                    del series[taskseries["id"]]
+
+    return [
+        {"id": list_id, "taskseries": list(series.values())}
+        for list_id, series in lists.items()
+        if series
+    ]
 
 
+def tasks_fingerprint(records: list[store.Task]) -> dict[int, tuple]:
+    """
+    Return taskseries id -> (list_id, modified, task ids).
+
+    used to detect changed taskseries
+    """
+    task_ids: dict[int, list[int]] = {}
+    series: dict[int, tuple[int, str]] = {}
+    for t in records:
+        task_ids.setdefault(t.taskseries_id, []).append(t.task_id)
+        series[t.taskseries_id] = (t.list_id, t.modified)
+    return {k: (*series[k], tuple(v)) for k, v in task_ids.items()}
+
+
+@metrics.timed("flatten_tasks")
 def flatten_tasks(rtm_tasks: list[dict], lists_dict: dict[int, str]) -> list[dict]:
     """
     Flatten tasks.
@@ -324,11 +611,64 @@ def flatten_tasks(rtm_tasks: list[dict], lists_dict: dict[int, str]) -> list[dic
     return list_flat
 
 
+def flat_tasks_to_df(list_flat: list[dict]) -> pd.DataFrame:
+    """Convert flat tasks to DataFrame of unconverted string columns."""
+    return pd.DataFrame.from_records(list_flat, columns=TASK_COLUMNS)
+
+
+@metrics.timed("records_to_df")
+def records_to_df(
+    records: list[store.Task], lists_dict: dict[int, str]
+) -> pd.DataFrame:
+    """
+    Convert task records to a DataFrame of the columns TASK_COLUMNS.
+
+    walks the records once and fills preallocated column buffers
+    IDs and postponed are converted to int
+    """
+    n = len(records)
+    cols: dict[str, list] = {col: [None] * n for col in TASK_COLUMNS}
+    (
+        col_list_id,
+        col_task_id,
+        col_list,
+        col_name,
+        col_due,
+        col_completed,
+        col_prio,
+        col_estimate,
+        col_postponed,
+        col_deleted,
+    ) = (cols[col] for col in TASK_COLUMNS)
+    for i, t in enumerate(records):
+        col_list_id[i] = t.list_id
+        col_task_id[i] = t.task_id
+        col_list[i] = lists_dict[t.list_id]
+        col_name[i] = t.name
+        col_due[i] = t.due
+        col_completed[i] = t.completed
+        col_prio[i] = t.priority
+        col_estimate[i] = t.estimate
+        col_postponed[i] = int(t.postponed)
+        col_deleted[i] = t.deleted
+
+    return pd.DataFrame(
+        {
+            col: pd.Series(values, dtype="int64" if col in INT_COLUMNS else "str")
+            for col, values in cols.items()
+        }
+    )
+
+
+@metrics.timed("convert_task_fields")
 def convert_task_fields(
     list_flat: list[dict],
 ) -> list[dict[str, str | int | dt.date]]:
     """
-    Convert some fields to int or date."""
+    Convert some fields to int or date.
+
+    row-wise, see convert_task_columns() for the faster vectorized version
+    """
     list_flat2: list[dict[str, str | int | dt.date]] = []
     # {'list': 'PC', 'name': 'Name of my task', 'due': '2023-10-30T23:00:00Z', 'completed': '2023-12-31T09:53:50Z', 'priority': '2', 'estimate': 'PT30M', 'postponed': '0', 'deleted': ''}  # noqa: E501
     for task in list_flat:
@@ -353,7 +693,7 @@ def convert_task_fields(
         if len(task["completed"]) > 1:
             my_dt = dt.datetime.fromisoformat(
                 task["completed"].replace("Z", " +00:00")
-            ).astimezone(tz=TZ)
+            ).astimezone(tz=get_tz())
             task["completed_time"] = my_dt.strftime("%H:%M")
         else:
             task["completed_time"] = ""
@@ -364,7 +704,7 @@ def convert_task_fields(
             if len(task[field]) > 1:
                 my_dt = dt.datetime.fromisoformat(task[field].replace("Z", " +00:00"))
                 # convert to local time and than date only
-                task[field] = my_dt.astimezone(tz=TZ).date()
+                task[field] = my_dt.astimezone(tz=get_tz()).date()
             else:
                 task[field] = None
 
@@ -405,13 +745,14 @@ def task_add_fields(
     """
     Add some fields.
 
-    Add overdue, overdue_prio, completed_week, url
+    Add overdue, overdue_prio, completed_week
     """
     # add overdue
+    date_today = get_date_today()
     if task["due"] and task["completed"] and task["due"] <= task["completed"]:
         task["overdue"] = (task["completed"] - task["due"]).days
-    elif task["due"] and not task["completed"] and task["due"] < DATE_TODAY:
-        task["overdue"] = (DATE_TODAY - task["due"]).days
+    elif task["due"] and not task["completed"] and task["due"] < date_today:
+        task["overdue"] = (date_today - task["due"]).days
     else:
         task["overdue"] = None
 
@@ -429,14 +770,10 @@ def task_add_fields(
     else:
         task["completed_week"] = None
 
-    # add url
-    task["url"] = (
-        f"https://www.rememberthemilk.com/app/#list/{task['list_id']}/{task['task_id']}"  # type: ignore
-    )
-
     return task
 
 
+@metrics.timed("tasks_to_df")
 def tasks_to_df(list_flat2: list[dict]) -> pd.DataFrame:
     """Convert tasks from list of dicts to Pandas DataFrame."""
     df = pd.DataFrame.from_records(list_flat2)
@@ -444,39 +781,166 @@ def tasks_to_df(list_flat2: list[dict]) -> pd.DataFrame:
     df["overdue_prio"] = df["overdue_prio"].astype("Int64")
     df["estimate"] = df["estimate"].astype("Int64")
 
+    return compact_task_columns(df)
+
+
+@metrics.timed("convert_task_columns")
+def convert_task_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert DataFrame of flat tasks, column-wise.
+
+    vectorized version of convert_task_fields() + tasks_to_df(),
+    returns the same DataFrame
+    """
+    # IDs and postponed count to int
+    for col in INT_COLUMNS:
+        df[col] = df[col].astype("int64")
+
+    # estimate to minutes: "PT1H30M" or "90 minutes"
+    est = (
+        df["estimate"]
+        .str.extract(
+            r"^(?:PT(?=\d+[HM])(?:(?P<h>\d+)H)?(?:(?P<m>\d+)M)?|(?P<min>\d+) minutes)$"
+        )
+        .astype("Int64")
+    )
+    unknown = est.isna().all(axis=1) & (df["estimate"] != "")
+    if unknown.any():  # pragma: no cover
+        msg = "Unknown estimate: " + df["estimate"][unknown].iloc[0]
+        raise ValueError(msg) from None
+    minutes = est["h"].fillna(0) * 60 + est["m"].fillna(0) + est["min"].fillna(0)
+    df["estimate"] = minutes.where(df["estimate"] != "")
+
+    # priority to int
+    # N(=no)->1, 3->1, 2->2, 1 -> 4
+    prio = df["prio"].map(PRIORITY_MAP)
+    if prio.isna().any():  # pragma: no cover
+        msg = "Unknown priority:" + df["prio"][prio.isna()].iloc[0]
+        raise ValueError(msg) from None
+    df["prio"] = prio.astype("int64")
+
+    # due and completed to local time, than date only
+    # "due": "2023-10-30T23:00:00Z"
+    dates: dict[str, pd.Series] = {}
+    for field in ("due", "completed"):
+        ts = pd.to_datetime(
+            df[field].where(df[field].str.len() > 1),
+            utc=True,
+            format="ISO8601",
+        ).dt.tz_convert(get_tz())
+        if field == "completed":
+            df["completed_time"] = ts.dt.strftime("%H:%M").fillna("")
+        # naive local midnight
+        dates[field] = ts.dt.tz_localize(None).dt.normalize()
+        df[field] = _dt_to_date(dates[field])
+    due, completed = dates["due"], dates["completed"]
+
+    # add overdue
+    today = pd.Timestamp(get_date_today())
+    overdue = (completed - due).dt.days.where(due <= completed)
+    overdue = overdue.where(
+        overdue.notna() | completed.notna() | (due >= today), (today - due).dt.days
+    )
+    df["overdue"] = overdue.astype("Int64")
+
+    # overdue prio (None if overdue is 0)
+    df["overdue_prio"] = (df["prio"] * df["overdue"]).where(df["overdue"] > 0)
+
+    # add completed week: Monday of ISO week
+    df["completed_week"] = _dt_to_date(
+        completed - pd.to_timedelta(completed.dt.weekday, unit="D")
+    )
+
+    return compact_task_columns(df)
+
+
+def _dt_to_date(s: pd.Series) -> pd.Series:
+    """Convert datetime Series to Series of date objects, None for NaT."""
+    return s.dt.date.astype(object).where(s.notna(), None)
+
+
+def compact_task_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert columns of converted tasks to compact dtypes.
+
+    repeated strings to categorical, IDs, prio and postponed to small ints
+    also after pd.concat(), which falls back to str for different categories
+    """
+    for col in CATEGORY_COLUMNS:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+        else:
+            df[col] = df[col].astype("category")
+    for col, dtype in COMPACT_INT_DTYPES.items():
+        info = np.iinfo(dtype)
+        if len(df) == 0 or info.min <= df[col].min() <= df[col].max() <= info.max:
+            df[col] = df[col].astype(dtype)
     return df
 
 
+def task_url(list_id: int, task_id: int) -> str:
+    """Return the URL of a task in the RTM web app."""
+    return URL_TASK.format(list_id=list_id, task_id=task_id)
+
+
+def task_urls(df: pd.DataFrame) -> pd.Series:
+    """
+    Return the URLs of the tasks of df.
+
+    computed on demand, the url is not stored in the converted DataFrame
+    """
+    return pd.Series(
+        [
+            task_url(list_id, task_id)
+            for list_id, task_id in zip(df["list_id"], df["task_id"], strict=True)
+        ],
+        index=df.index,
+        dtype="str",
+    )
+
+
 def df_name_url_to_html(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Convert name and url to html.
+    Convert name to html link to the task.
 
-    name is html encoded first
+    name is html encoded first, in one pass over the rows
     """
-    # html encoding of column "name"
-    df["name"] = df["name"].str.replace("&", "&amp;")
-    df["name"] = df["name"].str.replace(">", "&gt;")
-    df["name"] = df["name"].str.replace("<", "&lt;")
-    df["name"] = df["name"].str.encode("ascii", "xmlcharrefreplace").str.decode("utf-8")
-    # add url link to name
-    df["name"] = '<a href="' + df["url"] + '" target="_blank">' + df["name"] + "</a>"
+    df["name"] = [
+        f'<a href="{task_url(list_id, task_id)}" target="_blank">'
+        f"{escape_html(name)}</a>"
+        for name, list_id, task_id in zip(
+            df["name"], df["list_id"], df["task_id"], strict=True
+        )
+    ]
     return df
 
 
-def df_to_html(
-    df: pd.DataFrame, filename: str, *, index: bool = False
-) -> None:  # pragma: no cover
-    """Export DF to html."""
-    print(f"Exporting to {filename}")
+@metrics.timed("df_to_html")
+def df_to_html(  # noqa: PLR0913
+    df: pd.DataFrame,
+    filename: str,
+    *,
+    index: bool = False,
+    escape: bool = False,
+    links: dict[str, str] | None = None,
+    compress: bool = False,
+    page_size: int | None = None,
+) -> None:
+    """
+    Export DF to html, streamed to file, see html_writer.write_html().
 
-    html = df.to_html(
+    escape: html encode the cells, not needed after df_name_url_to_html()
+    links: column -> column of the URL, e.g. {"name": "url"}
+    """
+    print(f"Exporting to {filename}")
+    paths = write_html(
+        df,
+        OUTPUT_DIR / filename,
         index=index,
-        render_links=False,
-        escape=False,
-        justify="center",
+        escape=escape,
+        links=links,
+        compress=compress,
+        page_size=page_size,
     )
-
-    html = html.replace("<NA>", "")
-    html = "<!DOCTYPE html>\n" + html
-
-    (OUTPUT_DIR / filename).write_text(html)
+    metrics.count("html_rows", len(df))
+    metrics.count("html_bytes", sum(path.stat().st_size for path in paths))
@@ -0,0 +1,152 @@
+"""
+History of completed tasks, partitioned by month.
+
+Each month is fetched via its own narrow filter
+(completedAfter:<last day of previous month> AND completedBefore:<first day
+of next month>) and stored in the task store like any other filter.
+A month is closed once it ended more than CLOSE_AFTER_DAYS days ago: after one
+fetch after that date its partition is never fetched again.
+So only the open months are refreshed, and a query over any date range,
+including years back, reads only the months it covers.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import asyncio
+import datetime as dt
+
+import pandas as pd
+
+import store
+from config import get_tz
+from helper import (
+    compact_task_columns,
+    filter_key,
+    get_stale_reason,
+    get_task_records,
+    load_task_records,
+    task_records_to_df,
+)
+from rtm_async import get_lists_dict_async
+from rtm_client import gen_md5_string
+
+# tasks completed in a month are rarely modified after this many days
+CLOSE_AFTER_DAYS = 7
+
+
+def month_starts(start: dt.date, end: dt.date) -> list[dt.date]:
+    """Return the first days of the months from start to end."""
+    month = start.replace(day=1)
+    months = []
+    while month <= end:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def next_month(month: dt.date) -> dt.date:
+    """Return the first day of the month after month."""
+    return (month.replace(day=1) + dt.timedelta(days=32)).replace(day=1)
+
+
+def partition_filter(month: dt.date, base_filter: str) -> str:
+    """
+    Return the filter of the tasks completed in month.
+
+    base_filter: additional condition, e.g. "NOT list:Archive", or ""
+    """
+    after = month - dt.timedelta(days=1)
+    my_filter = (
+        f"completedAfter:{after.strftime('%d/%m/%Y')}"
+        f" AND completedBefore:{next_month(month).strftime('%d/%m/%Y')}"
+    )
+    if base_filter:
+        my_filter += f" AND {base_filter}"
+    return my_filter
+
+
+def is_closed(month: dt.date, fetched_at: float) -> bool:
+    """Check if the partition of month, fetched at fetched_at (epoch), is final."""
+    date_fetched = dt.datetime.fromtimestamp(fetched_at, tz=get_tz()).date()
+    return date_fetched >= next_month(month) + dt.timedelta(days=CLOSE_AFTER_DAYS)
+
+
+def get_partition_records(
+    month: dt.date, base_filter: str, max_age: float | None = None
+) -> list[store.Task]:
+    """
+    Return the tasks completed in month, from store if closed, else fetched.
+
+    max_age: see get_task_records()
+    """
+    my_filter = partition_filter(month, base_filter)
+    h = gen_md5_string(filter_key(my_filter))
+    state = store.filter_state(h)
+    if state and is_closed(month, float(state["fetched_at"])):
+        return load_task_records(h)
+    return get_task_records(my_filter, max_age)
+
+
+async def get_completed_df_async(
+    start: dt.date,
+    end: dt.date,
+    base_filter: str = "",
+    lists_dict: dict[int, str] | None = None,
+    max_age: float | None = None,
+) -> pd.DataFrame:
+    """
+    Return tasks completed after start until end (inclusive) as DataFrame.
+
+    start is exclusive, like completedAfter:start
+    max_age: see get_task_records()
+    the open partitions are fetched concurrently
+    if stale data was served, df.attrs["stale"] contains the reason
+    df.attrs["changes_seq"]: last change of the task store before loading,
+    see aggregates.py
+    """
+    seq = await asyncio.to_thread(store.last_change)
+    months = month_starts(start + dt.timedelta(days=1), end)
+    lists_dict, *partitions = await asyncio.gather(
+        get_lists_dict_async() if lists_dict is None else _value(lists_dict),
+        *(
+            asyncio.to_thread(get_partition_records, month, base_filter, max_age)
+            for month in months
+        ),
+    )
+    # converted DataFrames are memorized per partition, see task_records_to_df()
+    dfs = [
+        task_records_to_df(partition_filter(month, base_filter), records, lists_dict)
+        for month, records in zip(months, partitions, strict=True)
+    ]
+    df = pd.concat(dfs, ignore_index=True)
+    in_range = [d is not None and start < d <= end for d in df["completed"]]
+    df = compact_task_columns(df[in_range].reset_index(drop=True))
+    reasons = {
+        get_stale_reason(filter_key(partition_filter(month, base_filter)))
+        for month in months
+    }
+    df.attrs["stale"] = "; ".join(sorted(reasons - {""}))
+    df.attrs["changes_seq"] = seq
+    return df
+
+
+def get_completed_df(
+    start: dt.date,
+    end: dt.date,
+    base_filter: str = "",
+    lists_dict: dict[int, str] | None = None,
+    max_age: float | None = None,
+) -> pd.DataFrame:
+    """
+    Return tasks completed after start until end (inclusive) as DataFrame.
+
+    synchronous wrapper of get_completed_df_async()
+    """
+    return asyncio.run(
+        get_completed_df_async(start, end, base_filter, lists_dict, max_age)
+    )
+
+
+async def _value[T](value: T) -> T:
+    return value
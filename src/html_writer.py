@@ -0,0 +1,169 @@
+"""
+Streaming HTML table writer.
+
+Renders a DataFrame chunk by chunk, escaping each cell while the row is built,
+and writes the chunks straight to the file (optionally gzip compressed).
+Memory besides the DataFrame itself does not grow with the number of rows.
+Large tables can be split into pages of page_size rows, linked to each other.
+Files are written atomically, see atomic.py.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import gzip
+import html
+import math
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING
+
+import pandas as pd
+
+from atomic import atomic_path
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+CHUNK_ROWS = 1000
+
+
+def escape_html(s: str) -> str:
+    """Escape &, <, > and encode non-ASCII characters as character references."""
+    s = html.escape(s, quote=False)
+    if s.isascii():
+        return s
+    return s.encode("ascii", "xmlcharrefreplace").decode("ascii")
+
+
+def format_cell(value: object) -> str:
+    """Format a cell value, missing values as empty string."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return ""
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    return str(value)
+
+
+def render_rows(
+    df: pd.DataFrame,
+    *,
+    index: bool = False,
+    escape: bool = True,
+    links: dict[str, str] | None = None,
+) -> Iterator[str]:
+    """
+    Yield the <tr> rows of the table body, one string per row.
+
+    escape: HTML escape the cells, disable if they already contain HTML
+    links: column -> column of the URL, cells are rendered as link
+    """
+    links = links or {}
+    columns = list(df.columns)
+    link_pos = {
+        columns.index(col): columns.index(col_url) for col, col_url in links.items()
+    }
+    esc = escape_html if escape else str
+    n_index = df.index.nlevels if index else 0
+
+    for row in df.itertuples(index=index, name=None):
+        if index:
+            idx = row[0] if n_index > 1 else (row[0],)
+            th = "".join(f"<th>{esc(format_cell(v))}</th>" for v in idx)
+            values = row[1:]
+        else:
+            th = ""
+            values = row
+        cells = []
+        for i, value in enumerate(values):
+            text = esc(format_cell(value))
+            if i in link_pos and text:
+                url = html.escape(format_cell(values[link_pos[i]]))
+                text = f'<a href="{url}" target="_blank">{text}</a>'
+            cells.append(f"<td>{text}</td>")
+        yield f"<tr>{th}{''.join(cells)}</tr>\n"
+
+
+def render_header(df: pd.DataFrame, *, index: bool = False) -> str:
+    """Return the <thead> of the table."""
+    if index:
+        names = [format_cell(name) for name in df.index.names]
+        th_index = "".join(f"<th>{escape_html(name)}</th>" for name in names)
+    else:
+        th_index = ""
+    th = "".join(f"<th>{escape_html(str(col))}</th>" for col in df.columns)
+    return f'<thead>\n<tr style="text-align: center;">{th_index}{th}</tr>\n</thead>\n'
+
+
+def write_html(  # noqa: PLR0913
+    df: pd.DataFrame,
+    file_path: Path,
+    *,
+    index: bool = False,
+    escape: bool = True,
+    links: dict[str, str] | None = None,
+    compress: bool = False,
+    page_size: int | None = None,
+) -> list[Path]:
+    """
+    Write df as HTML table, streamed in chunks of CHUNK_ROWS rows.
+
+    compress: write gzip compressed, suffix .gz is appended
+    page_size: split into pages of this many rows: file, file-2, file-3, ...
+    returns the written files
+    """
+    n_pages = max(1, math.ceil(len(df) / page_size)) if page_size else 1
+    rows_per_page = page_size or len(df)
+    paths = [page_path(file_path, page, compress=compress) for page in range(n_pages)]
+    header = render_header(df, index=index)
+
+    for page, path in enumerate(paths):
+        df_page = df.iloc[page * rows_per_page : (page + 1) * rows_per_page]
+        nav = _render_nav([p.name for p in paths], page=page) if n_pages > 1 else ""
+        with _open(path, compress=compress) as fh:
+            fh.write("<!DOCTYPE html>\n")
+            fh.write(nav)
+            fh.write('<table border="1" class="dataframe">\n')
+            fh.write(header)
+            fh.write("<tbody>\n")
+            for start in range(0, len(df_page), CHUNK_ROWS):
+                chunk = df_page.iloc[start : start + CHUNK_ROWS]
+                fh.write(
+                    "".join(render_rows(chunk, index=index, escape=escape, links=links))
+                )
+            fh.write("</tbody>\n</table>\n")
+            fh.write(nav)
+    return paths
+
+
+def page_path(file_path: Path, page: int, *, compress: bool = False) -> Path:
+    """Return the path of page number page (starting at 0)."""
+    if page:
+        file_path = file_path.with_name(
+            f"{file_path.stem}-{page + 1}{file_path.suffix}"
+        )
+    if compress:
+        file_path = file_path.with_name(f"{file_path.name}.gz")
+    return file_path
+
+
+def _render_nav(names: list[str], page: int) -> str:
+    links = [
+        f"<b>{i + 1}</b>" if i == page else f'<a href="{name}">{i + 1}</a>'
+        for i, name in enumerate(names)
+    ]
+    return f"<p>Page {' '.join(links)}</p>\n"
+
+
+@contextmanager
+def _open(path: Path, *, compress: bool) -> Iterator[IO[str]]:
+    """Open for writing, atomic, see atomic.py."""
+    with (
+        atomic_path(path) as path_tmp,
+        (
+            gzip.open(path_tmp, "wt", encoding="utf-8", newline="\n")
+            if compress
+            else path_tmp.open("w", encoding="utf-8", newline="\n")
+        ) as fh,
+    ):
+        yield fh
@@ -0,0 +1,150 @@
+"""
+Per-stage timings and counters of this process.
+
+Stages are instrumented via the @timed decorator, other counters via count().
+report() combines them with the statistics of the cache and the rate limiter,
+to_json() and to_prometheus() export the report.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import functools
+import json
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from atomic import atomic_path
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+PROMETHEUS_PREFIX = "rtm_"
+
+# stage -> {"calls", "errors", "seconds", "seconds_max", "rows"}
+STAGES: dict[str, dict[str, float]] = {}
+# name -> value, e.g. http_bytes
+COUNTERS: dict[str, float] = {}
+
+_LOCK = threading.Lock()
+
+
+def record(
+    stage: str, seconds: float, rows: int | None = None, *, error: bool = False
+) -> None:
+    """Add one call of a stage, error: the call raised an exception."""
+    with _LOCK:
+        s = STAGES.setdefault(
+            stage,
+            {"calls": 0, "errors": 0, "seconds": 0.0, "seconds_max": 0.0, "rows": 0},
+        )
+        s["calls"] += 1
+        s["errors"] += error
+        s["seconds"] += seconds
+        s["seconds_max"] = max(s["seconds_max"], seconds)
+        if rows is not None:
+            s["rows"] += rows
+
+
+def count(name: str, value: float = 1) -> None:
+    """Increase a counter."""
+    with _LOCK:
+        COUNTERS[name] = COUNTERS.get(name, 0) + value
+
+
+def timed[**P, R](
+    stage: str, *, rows: bool = True
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Decorate a function to record its wall time as stage.
+
+    calls raising an exception are recorded too, counted as errors
+    rows: count len() of the results
+    """
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            start = time.perf_counter()
+            n = None
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                n = len(result) if rows and hasattr(result, "__len__") else None
+                error = False
+            finally:
+                record(stage, time.perf_counter() - start, rows=n, error=error)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def write(file_path: Path) -> None:
+    """Write report to file, Prometheus format if suffix is .prom else JSON."""
+    text = to_prometheus() if file_path.suffix == ".prom" else to_json()
+    # atomic, for scrapers reading the file meanwhile
+    with atomic_path(file_path) as file_tmp:
+        file_tmp.write_text(text)
+
+
+def reset() -> None:
+    """Reset the timings and counters of this module."""
+    with _LOCK:
+        STAGES.clear()
+        COUNTERS.clear()
+
+
+def report() -> dict[str, Any]:
+    """Return stages, counters and the statistics of cache and rate limiter."""
+    import cache  # noqa: PLC0415
+    import ratelimit  # noqa: PLC0415
+
+    with _LOCK:
+        return {
+            "stages": {k: v.copy() for k, v in STAGES.items()},
+            "counters": COUNTERS.copy(),
+            "cache": cache.STATS.copy(),
+            "ratelimit": ratelimit.STATS.copy(),
+        }
+
+
+def to_json() -> str:
+    """Export report() as JSON."""
+    return json.dumps(report(), indent=2)
+
+
+def to_prometheus() -> str:
+    """Export report() in the Prometheus text format."""
+    r = report()
+    p = PROMETHEUS_PREFIX
+    lines = []
+
+    def add(name: str, kind: str, help_text: str, samples: dict[str, float]) -> None:
+        lines.append(f"# HELP {p}{name} {help_text}")
+        lines.append(f"# TYPE {p}{name} {kind}")
+        lines.extend(f"{p}{name}{labels} {value}" for labels, value in samples.items())
+
+    stage_fields = (
+        ("calls", "counter", "Number of calls per stage"),
+        ("errors", "counter", "Number of calls raising an exception per stage"),
+        ("seconds", "counter", "Wall time in seconds per stage"),
+        ("seconds_max", "gauge", "Maximum wall time in seconds of one call"),
+        ("rows", "counter", "Rows returned per stage"),
+    )
+    for field, kind, help_text in stage_fields:
+        name = f"stage_{field}_total" if kind == "counter" else f"stage_{field}"
+        samples = {f'{{stage="{k}"}}': v[field] for k, v in r["stages"].items()}
+        add(name, kind, help_text, samples)
+    for group in ("counters", "cache", "ratelimit"):
+        for k, v in r[group].items():
+            name = k if group == "counters" else f"{group}_{k}"
+            if k.endswith("_max"):
+                add(name, "gauge", k, {"": v})
+            else:
+                name = name if name.endswith("_total") else f"{name}_total"
+                add(name, "counter", k, {"": v})
+    return "\n".join(lines) + "\n"
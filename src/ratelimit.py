@@ -0,0 +1,98 @@
+"""
+Rate limiter for the RTM API.
+
+Token bucket of 1 request per second with a small burst allowance.
+The bucket state is kept in a file, protected by a file lock,
+so the limit is shared across threads and processes.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Windows: only shared across threads
+    fcntl = None  # type: ignore
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+STATE_FILE = Path(__file__).parent.parent / "cache" / "ratelimit.state"
+
+# RTM: average of 1 request per second
+RATE = 1.0
+BURST = 2.0
+
+# statistics of this process
+STATS = {"requests": 0, "waited": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+_THREAD_LOCK = threading.Lock()
+
+
+def take_token(
+    tokens: float, last: float, now: float, rate: float = RATE, burst: float = BURST
+) -> tuple[float, float]:
+    """
+    Take one token from the bucket.
+
+    tokens: tokens left at time last, refilled by rate per second up to burst
+    Returns the new number of tokens (at time now) and the seconds to wait.
+    A negative number of tokens means the token is reserved, the caller has
+    to wait for it.
+    """
+    tokens = min(burst, tokens + (now - last) * rate) - 1
+    wait = max(0.0, -tokens / rate)
+    return tokens, wait
+
+
+@contextmanager
+def _locked_state() -> Iterator[IO[str]]:
+    """Open the state file, exclusively locked."""
+    STATE_FILE.parent.mkdir(exist_ok=True)
+    with _THREAD_LOCK, STATE_FILE.open("a+", encoding="ascii") as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield fh
+        finally:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def acquire() -> float:
+    """
+    Wait until the next request may be sent.
+
+    Returns the seconds waited.
+    """
+    with _locked_state() as fh:
+        now = time.time()
+        fh.seek(0)
+        try:
+            tokens, last = map(float, fh.read().split())
+        except ValueError:
+            tokens, last = BURST, now
+        tokens, wait = take_token(
+            tokens=tokens, last=last, now=now, rate=RATE, burst=BURST
+        )
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{tokens} {now}")
+        # STATS is shared by the threads, updated under the lock
+        STATS["requests"] += 1
+        if wait > 0:
+            STATS["waited"] += 1
+            STATS["wait_total"] += wait
+            STATS["wait_max"] = max(STATS["wait_max"], wait)
+
+    # sleep outside the lock, the token is already reserved
+    if wait > 0:
+        time.sleep(wait)
+    return wait
@@ -0,0 +1,59 @@
+"""
+Data of all reports, fetched in one go.
+
+On a cold cache, the lists and the tasks of all report filters are fetched
+concurrently, see rtm_async.py and history.py. Each report requests the lists
+next to its tasks and converts once both arrived. The concurrent lists calls
+share one request, see helper.get_lists().
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from config import get_date_today
+from history import get_completed_df_async
+from rtm_async import get_tasks_as_dfs_async
+from tasks_completed import (
+    FILTER_COMPLETED_BASE,
+    get_date_start,
+    select_completed,
+)
+from tasks_overdue import FILTER_OVERDUE, select_overdue
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+async def get_reports_async(max_age: float | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Return the DataFrames of all reports: completed, overdue.
+
+    max_age: seconds stored tasks are used without asking RTM,
+    see get_task_records()
+    """
+    # the lists are not awaited first: fetched next to the tasks of each report
+    df_completed, dfs = await asyncio.gather(
+        get_completed_df_async(
+            start=get_date_start(),
+            end=get_date_today(),
+            base_filter=FILTER_COMPLETED_BASE,
+            max_age=max_age,
+        ),
+        get_tasks_as_dfs_async({"overdue": FILTER_OVERDUE}, max_age=max_age),
+    )
+    return {
+        "completed": select_completed(df_completed),
+        "overdue": select_overdue(dfs["overdue"]),
+    }
+
+
+def get_reports(max_age: float | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Return the DataFrames of all reports: completed, overdue.
+
+    synchronous wrapper of get_reports_async()
+    """
+    return asyncio.run(get_reports_async(max_age))
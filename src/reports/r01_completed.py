@@ -1,25 +1,25 @@
 """Completed Tasks."""
 
-from typing import TYPE_CHECKING
-
 import altair as alt
 import streamlit as st
 
-from tasks_completed import completed_week, get_tasks_completed
-
-if TYPE_CHECKING:
-    import pandas as pd
+from data_service import get_service
 
 st.title("Completed")
 
-
-@st.cache_data(ttl="1h")
-def get_df() -> pd.DataFrame:
-    """Cache API call."""
-    return get_tasks_completed()
-
-
-df = get_df()
+service = get_service()
+snapshot = service.snapshot
+if snapshot is None:
+    st.info("Loading data, please reload in a moment.")
+    st.stop()
+st.caption(f"Data from {snapshot.age() / 60:.0f} min ago")
+if service.error:
+    st.warning(service.error)
+
+# shared DataFrames, do not modify
+df = snapshot.reports["completed"]
+if df.attrs.get("stale"):
+    st.warning(f"Showing stale data: {df.attrs['stale']}")
 st.dataframe(
     df,
     hide_index=True,
@@ -27,8 +27,7 @@ st.dataframe(
 )
 
 st.header("per Week")
-df = completed_week(df)
-df = df.reset_index()
+df = snapshot.reports["completed_week"].reset_index()
 
 sel_param = st.selectbox(
     label="Parameter",
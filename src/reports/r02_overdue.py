@@ -1,39 +1,39 @@
-"""Completed Tasks."""
-
-from typing import TYPE_CHECKING
+"""Overdue Tasks."""
 
 import altair as alt
 import streamlit as st
 
-from tasks_overdue import get_tasks_overdue, group_by_list
-
-if TYPE_CHECKING:
-    import pandas as pd
+from data_service import get_service
 
 st.title("Overdue")
 
-
-@st.cache_data(ttl="1h")
-def get_df() -> pd.DataFrame:
-    """Cache API call."""
-    return get_tasks_overdue().sort_values(by=["overdue"], ascending=[True])
-
-
-df = get_df()
-lists = sorted(set(df["list"].to_list()))
+service = get_service()
+snapshot = service.snapshot
+if snapshot is None:
+    st.info("Loading data, please reload in a moment.")
+    st.stop()
+st.caption(f"Data from {snapshot.age() / 60:.0f} min ago")
+if service.error:
+    st.warning(service.error)
+
+# shared DataFrames, do not modify
+df = snapshot.reports["overdue"]
+if df.attrs.get("stale"):
+    st.warning(f"Showing stale data: {df.attrs['stale']}")
+# list -> row positions, built once per snapshot
+index = snapshot.list_indexes["overdue"]
 
 col1, _ = st.columns((1, 5))
-sel_list = col1.selectbox(label="List", index=None, options=lists)
+sel_list = col1.selectbox(label="List", index=None, options=list(index))
 
 st.dataframe(
-    df.query(f"list == '{sel_list}'") if sel_list else df,
+    df.iloc[index[sel_list]] if sel_list else df,
     hide_index=True,
     column_config={"url": st.column_config.LinkColumn("url", display_text="url")},
 )
 
 st.header("by List")
-df = group_by_list(df)
-df = df.reset_index()
+df = snapshot.reports["overdue_by_list"].reset_index()
 
 
 col1, _ = st.columns((1, 5))
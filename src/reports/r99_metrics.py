@@ -0,0 +1,34 @@
+"""Metrics of this process."""
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+
+st.title("Metrics")
+
+report = metrics.report()
+
+st.header("Stages")
+df = pd.DataFrame.from_dict(report["stages"], orient="index")
+if len(df):
+    df["seconds_avg"] = df["seconds"] / df["calls"]
+    df = df.sort_values(by="seconds", ascending=False)
+st.dataframe(df)
+
+st.header("Counters")
+counters = {
+    **report["counters"],
+    **{f"cache_{k}": v for k, v in report["cache"].items()},
+    **{f"ratelimit_{k}": v for k, v in report["ratelimit"].items()},
+}
+st.dataframe(pd.Series(counters, name="value"))
+
+col1, col2, col3, _ = st.columns((1, 1, 1, 3))
+col1.download_button("JSON", metrics.to_json(), "metrics.json", "application/json")
+col2.download_button(
+    "Prometheus", metrics.to_prometheus(), "metrics.prom", "text/plain"
+)
+if col3.button("Reset"):
+    metrics.reset()
+    st.rerun()
@@ -0,0 +1,134 @@
+"""
+Asyncio API client.
+
+Runs the API calls of several filters and the lists call concurrently,
+or of one filter split into one call per list (sharded), see setting
+fetch_per_list.
+All requests go through the shared token bucket of ratelimit.py, which
+reserves the next free slot per request, so they are sent back-to-back
+at the rate limit without idle gaps.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from config import get_settings
+from helper import (
+    compact_task_columns,
+    filter_key,
+    get_lists,
+    get_lists_dict,
+    get_task_records,
+    task_records_to_df,
+)
+
+if TYPE_CHECKING:
+    from store import Task
+
+
+async def get_lists_dict_async() -> dict[int, str]:
+    """Return a dict of list id -> name, see get_lists_dict()."""
+    return await asyncio.to_thread(get_lists_dict)
+
+
+async def get_task_records_async(
+    my_filter: str, max_age: float | None = None, list_id: str | None = None
+) -> list[Task]:
+    """Fetch filtered tasks from RTM or cache if recent, see get_task_records()."""
+    return await asyncio.to_thread(get_task_records, my_filter, max_age, list_id)
+
+
+async def get_tasks_as_dfs_async(
+    filters: dict[str, str],
+    lists_dict: dict[int, str] | None = None,
+    max_age: float | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Fetch the lists and the tasks of several filters concurrently.
+
+    filters: name -> filter
+    lists_dict: already fetched lists, else fetched too
+    max_age: see get_task_records()
+    returns name -> DataFrame
+    with setting fetch_per_list, each filter is fetched per list, see
+    get_tasks_as_df_sharded_async()
+    """
+    if get_settings().get("fetch_per_list", False):
+        dfs = await asyncio.gather(
+            *(
+                get_tasks_as_df_sharded_async(my_filter, max_age)
+                for my_filter in filters.values()
+            )
+        )
+        return dict(zip(filters, dfs, strict=True))
+    fetches = [
+        get_task_records_async(my_filter, max_age) for my_filter in filters.values()
+    ]
+    if lists_dict is None:
+        lists_dict, *tasks = await asyncio.gather(get_lists_dict_async(), *fetches)
+    else:
+        tasks = await asyncio.gather(*fetches)
+    return {
+        name: task_records_to_df(
+            my_filter=my_filter, records=records, lists_dict=lists_dict
+        )
+        for (name, my_filter), records in zip(filters.items(), tasks, strict=True)
+    }
+
+
+def get_tasks_as_dfs(filters: dict[str, str]) -> dict[str, pd.DataFrame]:
+    """
+    Fetch the lists and the tasks of several filters concurrently.
+
+    synchronous wrapper of get_tasks_as_dfs_async()
+    """
+    return asyncio.run(get_tasks_as_dfs_async(filters))
+
+
+async def get_tasks_as_df_sharded_async(
+    my_filter: str, max_age: float | None = None
+) -> pd.DataFrame:
+    """
+    Fetch filtered tasks per list, concurrently.
+
+    The filter is split into one request per (non-smart) list, each list's
+    result is stored separately and converted as soon as it arrives.
+    A change in one list hence does not invalidate the data of the others.
+    Costs one request per list, so only worth it for large filters.
+    max_age: see get_task_records()
+    """
+    lists = await asyncio.to_thread(get_lists)
+    lists_dict = {int(el["id"]): el["name"] for el in lists}
+    list_ids = [el["id"] for el in lists if el["smart"] == "0" and el["deleted"] == "0"]
+
+    async def fetch(list_id: str) -> tuple[str, list[Task]]:
+        return list_id, await get_task_records_async(my_filter, max_age, list_id)
+
+    dfs: list[pd.DataFrame] = []
+    for next_done in asyncio.as_completed([fetch(list_id) for list_id in list_ids]):
+        list_id, records = await next_done
+        df = task_records_to_df(
+            my_filter=filter_key(my_filter, list_id),
+            records=records,
+            lists_dict=lists_dict,
+        )
+        if len(df):
+            dfs.append(df)
+
+    if not dfs:
+        return task_records_to_df(my_filter=my_filter, records=[], lists_dict={})
+    return compact_task_columns(pd.concat(dfs, ignore_index=True))
+
+
+def get_tasks_as_df_sharded(my_filter: str) -> pd.DataFrame:
+    """
+    Fetch filtered tasks per list, concurrently.
+
+    synchronous wrapper of get_tasks_as_df_sharded_async()
+    """
+    return asyncio.run(get_tasks_as_df_sharded_async(my_filter))
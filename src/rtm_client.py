@@ -0,0 +1,229 @@
+"""
+RTM API client.
+
+Signing and sending of API requests, without pandas.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+# API authentication documentation can be found at https://www.rememberthemilk.com/services/api/authentication.rtm
+# list of available API methods can be fount at https://www.rememberthemilk.com/services/api/methods.rtm
+
+import functools
+import hashlib
+import json
+import os
+import random
+import time
+from typing import TYPE_CHECKING
+
+import metrics
+import ratelimit
+from config import get_settings
+
+if TYPE_CHECKING:
+    import requests
+
+URL_RTM_BASE = "https://api.rememberthemilk.com/services/rest/"
+
+# base delay of exponential backoff, not below the rate limit of 1 request/s
+HTTP_BACKOFF = 1.0
+# RTM rate limit exceeded, the request was not applied
+HTTP_STATUS_RATE_LIMITED = 503
+HTTP_RETRY_STATUS = {429, 500, 502, HTTP_STATUS_RATE_LIMITED, 504}
+# kept alive connections: one per worker thread of asyncio.to_thread(),
+# the default max_workers of its ThreadPoolExecutor
+HTTP_POOL_SIZE = min(32, (os.process_cpu_count() or 1) + 4)
+
+
+class OutcomeUnknownError(ValueError):
+    """A modifying request failed, it might have been applied or not."""
+
+
+def dict_to_url_param(d: dict[str, str]) -> str:
+    """
+    Convert a dictionary of parameter to url parameter string.
+
+    value pairs to an url conform list of key1=value1&key2=value2...
+    """
+    return "&".join("=".join(tup) for tup in d.items())
+
+
+def json_parse_response(response_text: str) -> dict:
+    """
+    Convert response_text as JSON.
+
+    Ensures that the response status is ok and drops that
+    """
+    try:
+        d_json: dict = json.loads(response_text)
+    except json.JSONDecodeError:  # pragma: no cover
+        msg = f"Invalid JSON:\n{response_text}"
+        raise ValueError(msg) from None
+    if d_json["rsp"]["stat"] != "ok":  # pragma: no cover
+        msg = f"Status not ok:\n{d_json}"
+        raise ValueError(msg) from None
+    del d_json["rsp"]["stat"]
+    return d_json["rsp"]
+
+
+def gen_md5_string(s: str) -> str:
+    """
+    Generate MD5 hash.
+    """
+    m = hashlib.new("md5", usedforsecurity=False)
+    m.update(s.encode("ascii"))
+    return m.hexdigest()
+
+
+def get_api_url() -> str:
+    """Return the REST endpoint, setting api_url e.g. for rtm_server.py."""
+    return get_settings().get("api_url", URL_RTM_BASE)
+
+
+@functools.cache
+def get_session() -> requests.Session:
+    """
+    Return the shared HTTP session.
+
+    keeps the connection alive, avoiding a TCP+TLS handshake per API call
+    """
+    import requests  # noqa: PLC0415
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    Return seconds to wait before retry number attempt (starting at 0).
+
+    exponential backoff with jitter, at least the Retry-After header
+    """
+    delay = HTTP_BACKOFF * 2**attempt * (1 + random.random())  # noqa: S311
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    return delay
+
+
+@metrics.timed("perform_rest_call", rows=False)
+def perform_rest_call(url: str, *, idempotent: bool = True) -> str:
+    """
+    Perform a simple REST call to an url.
+
+    waits for the rate limiter before each request, see ratelimit.STATS
+    the time of the requests themselves is recorded as stage http_request
+    uses the shared session, retries on timeouts, connection errors and 5xx
+    idempotent: False for modifying calls, these are only retried on status 503
+    (rate limited, so not applied), other failures raise OutcomeUnknownError
+    Assert status = 200
+    Return the response text.
+    """
+    import requests  # noqa: PLC0415
+
+    settings = get_settings()
+    # (connect, read) timeout in seconds
+    timeout = (
+        float(settings.get("timeout_connect", 3.05)),
+        float(settings.get("timeout_read", 10)),
+    )
+    retries = int(settings.get("retries", 3))
+
+    error = ""
+    retry_after: str | None = None
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = backoff_delay(attempt - 1, retry_after)
+            print(f"Retrying in {delay:.1f}s after: {error}")
+            metrics.count("http_retries")
+            time.sleep(delay)
+
+        wait = ratelimit.acquire()
+        if wait > 0:
+            print(f"Rate limit: waited {wait:.2f}s")
+
+        start = time.perf_counter()
+        try:
+            resp = get_session().get(url, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = f"{type(e).__name__}: {e}"
+            if not idempotent:
+                msg = f"Outcome unknown. {error}"
+                raise OutcomeUnknownError(msg) from None
+            retry_after = None
+            continue
+        finally:
+            metrics.record("http_request", time.perf_counter() - start)
+        metrics.count("http_bytes", len(resp.content))
+        if resp.status_code == 200:  # noqa: PLR2004
+            return resp.text
+        error = f"status code:{resp.status_code}, text:\n{resp.text}"
+        if not idempotent and resp.status_code != HTTP_STATUS_RATE_LIMITED:
+            msg = f"Outcome unknown. {error}"
+            raise OutcomeUnknownError(msg) from None
+        if resp.status_code not in HTTP_RETRY_STATUS:
+            break
+        retry_after = resp.headers.get("Retry-After")
+
+    msg = f"Bad response. {error}"
+    raise ValueError(msg) from None
+
+
+def gen_api_sig(param: dict[str, str], shared_secret: str | None = None) -> str:
+    """
+    Generate the api_sig.
+
+    shared_secret: default from settings
+
+    according to https://www.rememberthemilk.com/services/api/authentication.rtm
+    yxz=foo feg=bar abc=baz
+      -> (1. sorting) abc=baz feg=bar yxz=foo
+      -> (2. joining) abcbazfegbaryxzfoo -> MD5
+    """
+    s = "".join("".join(tup) for tup in sorted(param.items()))
+    if shared_secret is None:
+        shared_secret = get_settings()["shared_secret"]
+    api_sig = gen_md5_string(shared_secret + s)
+    return api_sig
+
+
+def rtm_append_key_and_sig(d: dict[str, str]) -> dict[str, str]:
+    """
+    Add api_key (known) and api_sig (generated) to dict d.
+    """
+    d["api_key"] = get_settings()["api_key"]
+    d["api_sig"] = gen_api_sig(d)
+    return d
+
+
+def rtm_append_key_and_token_and_sig(d: dict[str, str]) -> dict[str, str]:
+    """
+    Add api_key (known) auth_token (parameter) and api_sig (generated) to dict d.
+    """
+    d["api_key"] = get_settings()["api_key"]
+    d["auth_token"] = get_settings()["token"]
+    d["api_sig"] = gen_api_sig(d)
+    return d
+
+
+def rtm_call_method(
+    method: str, arguments: dict[str, str], *, idempotent: bool = True
+) -> dict:
+    """
+    Call any rtm API method.
+
+    request in json format
+    idempotent: False for modifying calls, see perform_rest_call()
+    asserts that the response is ok
+    """
+    param = {"method": method, "format": "json"}
+    param.update(arguments)
+    param_str = dict_to_url_param(rtm_append_key_and_token_and_sig(param))
+    url = f"{get_api_url()}?{param_str}"
+    response_text = perform_rest_call(url, idempotent=idempotent)
+    d_json = json_parse_response(response_text)
+    return d_json
@@ -0,0 +1,328 @@
+"""
+Parser and evaluator of a subset of the RTM search language.
+
+Supported: list:, status:, priority:, tag:, due:, dueBefore:, dueAfter:,
+completed:, completedBefore:, completedAfter:, combined by AND, OR, NOT and
+parentheses, see https://www.rememberthemilk.com/help/?ctx=basics.search.advanced
+Dates: today, tomorrow, yesterday, dd/mm/yyyy or yyyy-mm-dd.
+
+canonical() returns one spelling per filter, e.g. as cache key: operands of
+AND and OR are sorted and deduplicated, operator and key spelling unified.
+compile_filter() evaluates a filter locally on task records, covers()
+checks if the result of a filter contains all tasks of another one.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import datetime as dt
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from config import get_date_today, get_tz
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from store import Task
+
+# lower case -> spelling of RTM
+KEYS = {
+    k.lower(): k
+    for k in (
+        "list",
+        "status",
+        "priority",
+        "tag",
+        "due",
+        "dueBefore",
+        "dueAfter",
+        "completed",
+        "completedBefore",
+        "completedAfter",
+    )
+}
+# keys with date values
+DATE_KEYS = {k for k in KEYS.values() if k.startswith(("due", "completed"))}
+OPERATORS = ("AND", "OR", "NOT")
+RELATIVE_DATES = {"today": 0, "tomorrow": 1, "yesterday": -1}
+
+RE_TOKEN = re.compile(
+    r"""\s*(?:
+    (?P<paren>[()])
+    | (?P<key>\w+):(?P<value>"[^"]*"|'[^']*'|[^\s()]+)
+    | (?P<word>[^\s()]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+@dataclass(slots=True, frozen=True)
+class Term:
+    """Condition key:value."""
+
+    key: str
+    value: str
+
+
+@dataclass(slots=True, frozen=True)
+class Not:
+    """Negated expression."""
+
+    expr: Expr
+
+
+@dataclass(slots=True, frozen=True)
+class And:
+    """All expressions match, no expressions: matches all."""
+
+    exprs: tuple[Expr, ...]
+
+
+@dataclass(slots=True, frozen=True)
+class Or:
+    """Any of the expressions matches."""
+
+    exprs: tuple[Expr, ...]
+
+
+type Expr = Term | Not | And | Or
+
+
+def parse(my_filter: str) -> Expr:
+    """
+    Parse a filter into its canonical expression.
+
+    raises ValueError for unsupported syntax, e.g. unknown keys or free text
+    """
+    tokens = tokenize(my_filter)
+    expr, pos = _parse_or(tokens, 0)
+    if pos != len(tokens):
+        msg = f"Unexpected {tokens[pos]!r} in filter: {my_filter}"
+        raise ValueError(msg)
+    return expr
+
+
+def tokenize(my_filter: str) -> list[str | Term]:
+    """Split into parentheses, operators (upper case) and terms."""
+    tokens: list[str | Term] = []
+    pos = 0
+    my_filter = my_filter.strip()
+    while pos < len(my_filter):
+        m = RE_TOKEN.match(my_filter, pos)
+        assert m is not None
+        pos = m.end()
+        if m["paren"]:
+            tokens.append(m["paren"])
+        elif m["key"]:
+            key = KEYS.get(m["key"].lower())
+            if key is None:
+                msg = f"Unsupported filter key: {m['key']}"
+                raise ValueError(msg)
+            tokens.append(_term(key, m["value"].strip("\"'")))
+        elif m["word"].upper() in OPERATORS:
+            tokens.append(m["word"].upper())
+        else:
+            msg = f"Unsupported filter text: {m['word']}"
+            raise ValueError(msg)
+    return tokens
+
+
+def canonical(expr: Expr) -> str:
+    """Return the filter text of an expression."""
+    match expr:
+        case Term(key, value):
+            if re.search(r"[\s()\"']", value):
+                value = f'"{value}"'
+            return f"{key}:{value}"
+        case Not(e):
+            return f"NOT {_canonical_operand(e)}"
+        case And(exprs):
+            return " AND ".join(_canonical_operand(e) for e in exprs)
+        case Or(exprs):
+            return " OR ".join(_canonical_operand(e) for e in exprs)
+
+
+def covers(superset: Expr, expr: Expr) -> bool:
+    """
+    Check if all tasks matching expr also match superset.
+
+    true if the conditions (AND) of superset are a subset of those of expr
+    """
+    return _conditions(superset) <= _conditions(expr)
+
+
+def compile_filter(
+    expr: Expr, get_lists_dict: Callable[[], dict[int, str]]
+) -> Callable[[Task], bool]:
+    """
+    Return a function checking if a task matches expr.
+
+    get_lists_dict: returns list id -> name, only called for list: conditions
+    raises ValueError for values that can not be evaluated locally
+    """
+    match expr:
+        case Term(key, value):
+            return _compile_term(key, value, get_lists_dict)
+        case Not(e):
+            f = compile_filter(e, get_lists_dict)
+            return lambda t: not f(t)
+        case And(exprs):
+            fs = [compile_filter(e, get_lists_dict) for e in exprs]
+            return lambda t: all(f(t) for f in fs)
+        case Or(exprs):
+            fs = [compile_filter(e, get_lists_dict) for e in exprs]
+            return lambda t: any(f(t) for f in fs)
+
+
+def is_relative(expr: Expr) -> bool:
+    """Check if expr contains relative dates: its result changes at midnight."""
+    match expr:
+        case Term(key, value):
+            return key in DATE_KEYS and value in RELATIVE_DATES
+        case Not(e):
+            return is_relative(e)
+        case And(exprs) | Or(exprs):
+            return any(is_relative(e) for e in exprs)
+
+
+def parse_date(value: str) -> dt.date:
+    """Parse today, tomorrow, yesterday, dd/mm/yyyy or yyyy-mm-dd."""
+    today = get_date_today()
+    if value.lower() in RELATIVE_DATES:
+        return today + dt.timedelta(days=RELATIVE_DATES[value.lower()])
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return dt.datetime.strptime(value, fmt).replace(tzinfo=get_tz()).date()
+        except ValueError:
+            pass
+    msg = f"Unsupported date: {value}"
+    raise ValueError(msg)
+
+
+def _term(key: str, value: str) -> Term:
+    """Create a term, values unified if their case does not matter."""
+    if key in {"status", "priority"} or value.lower() in RELATIVE_DATES:
+        value = value.lower()
+    return Term(key, value)
+
+
+def _parse_or(tokens: list[str | Term], pos: int) -> tuple[Expr, int]:
+    exprs = []
+    expr, pos = _parse_and(tokens, pos)
+    exprs.append(expr)
+    while pos < len(tokens) and tokens[pos] == "OR":
+        expr, pos = _parse_and(tokens, pos + 1)
+        exprs.append(expr)
+    return _combine(Or, exprs), pos
+
+
+def _parse_and(tokens: list[str | Term], pos: int) -> tuple[Expr, int]:
+    exprs = []
+    # an empty filter matches all tasks
+    while pos < len(tokens) and tokens[pos] not in {"OR", ")"}:
+        if tokens[pos] == "AND":
+            pos += 1
+        expr, pos = _parse_not(tokens, pos)
+        exprs.append(expr)
+    if not exprs and pos < len(tokens):
+        msg = f"Unexpected {tokens[pos]!r}"
+        raise ValueError(msg)
+    return _combine(And, exprs), pos
+
+
+def _parse_not(tokens: list[str | Term], pos: int) -> tuple[Expr, int]:
+    if pos == len(tokens):
+        msg = "Unexpected end of filter"
+        raise ValueError(msg)
+    item = tokens[pos]
+    if item == "NOT":
+        expr, pos = _parse_not(tokens, pos + 1)
+        return _negate(expr), pos
+    if item == "(":
+        expr, pos = _parse_or(tokens, pos + 1)
+        if pos == len(tokens) or tokens[pos] != ")":
+            msg = "Missing )"
+            raise ValueError(msg)
+        return expr, pos + 1
+    if isinstance(item, Term):
+        return item, pos + 1
+    msg = f"Unexpected {item!r}"
+    raise ValueError(msg)
+
+
+def _negate(expr: Expr) -> Expr:
+    """Negate, NOT status:completed is status:incomplete and vice versa."""
+    if isinstance(expr, Not):
+        return expr.expr
+    if isinstance(expr, Term) and expr.key == "status":
+        status = {"completed": "incomplete", "incomplete": "completed"}
+        if expr.value in status:
+            return Term("status", status[expr.value])
+    return Not(expr)
+
+
+def _combine(cls: type[And | Or], exprs: list[Expr]) -> Expr:
+    """Flatten nested operators of the same kind, deduplicate and sort."""
+    flat: set[Expr] = set()
+    for e in exprs:
+        flat.update(e.exprs if isinstance(e, cls) else (e,))
+    if len(flat) == 1:
+        return flat.pop()
+    return cls(tuple(sorted(flat, key=canonical)))
+
+
+def _canonical_operand(expr: Expr) -> str:
+    s = canonical(expr)
+    return f"({s})" if isinstance(expr, (And, Or)) and expr.exprs else s
+
+
+def _conditions(expr: Expr) -> set[Expr]:
+    return set(expr.exprs) if isinstance(expr, And) else {expr}
+
+
+def _compile_term(
+    key: str, value: str, get_lists_dict: Callable[[], dict[int, str]]
+) -> Callable[[Task], bool]:
+    if key == "list":
+        name = value.lower()
+        list_ids = {k for k, v in get_lists_dict().items() if v.lower() == name}
+        return lambda t: t.list_id in list_ids
+    if key == "status":
+        if value not in {"completed", "incomplete"}:
+            msg = f"Unsupported status: {value}"
+            raise ValueError(msg)
+        completed = value == "completed"
+        return lambda t: bool(t.completed) == completed
+    if key == "priority":
+        priority = {"1": "1", "2": "2", "3": "3", "none": "N"}.get(value)
+        if priority is None:
+            msg = f"Unsupported priority: {value}"
+            raise ValueError(msg)
+        return lambda t: t.priority == priority
+    if key == "tag":
+        tag = value.lower()
+        return lambda t: tag in t.tags.lower().split(",")
+    return _compile_date_term(key, value)
+
+
+def _compile_date_term(key: str, value: str) -> Callable[[Task], bool]:
+    """Compare the local date of due or completed."""
+    field = "due" if key.startswith("due") else "completed"
+    date = parse_date(value)
+    compare: Callable[[dt.date], bool]
+    if key.endswith("Before"):
+        compare = date.__gt__
+    elif key.endswith("After"):
+        compare = date.__lt__
+    else:
+        compare = date.__eq__
+
+    def match(t: Task) -> bool:
+        s = getattr(t, field)
+        if not s:
+            return False
+        return compare(dt.datetime.fromisoformat(s).astimezone(get_tz()).date())
+
+    return match
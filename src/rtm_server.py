@@ -0,0 +1,405 @@
+"""
+Local stand-in for the RTM REST API.
+
+For tests, load tests and benchmarks of the client without network access.
+Checks api_key, api_sig and auth_token like RTM and supports the methods
+rtm.auth.getFrob, rtm.auth.getToken, rtm.auth.checkToken, rtm.lists.getList
+and rtm.tasks.getList (arguments list_id and last_sync, the filter itself is
+not evaluated: all tasks are returned), and for modifications
+rtm.timelines.create, rtm.tasks.complete, rtm.tasks.postpone,
+rtm.tasks.setDueDate, rtm.tasks.setPriority and rtm.transactions.undo.
+Requests above the rate limit are answered with status 503, like RTM does.
+Optionally adds latency and injects errors.
+
+Record and replay: in record mode, requests are forwarded to the real API and
+the responses saved, in replay mode saved responses are served, matched by
+method and arguments.
+
+uv run src/rtm_server.py --tasks tests/test_data/tasks-<hash>.json
+and set api_url = "http://127.0.0.1:8765/" in rememberthemilk.toml
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import argparse
+import datetime as dt
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+from config import get_settings
+from ratelimit import take_token
+from rtm_client import URL_RTM_BASE, gen_api_sig, gen_md5_string
+
+PORT_DEFAULT = 8765
+# arguments not part of the recording key
+ARGS_AUTH = ("api_key", "api_sig", "auth_token", "format")
+
+# RTM error codes
+ERRORS = {
+    "96": "Invalid signature",
+    "97": "Missing signature",
+    "98": "Login failed / Invalid auth token",
+    "100": "Invalid API Key",
+    "101": "Invalid frob - did you authenticate?",
+    "112": "Method not found",
+    "300": "Timeline invalid or not provided",
+    "340": "list_id/taskseries_id/task_id invalid or not provided",
+    "360": "Transaction invalid or not provided",
+}
+WRITE_METHODS = (
+    "rtm.tasks.complete",
+    "rtm.tasks.postpone",
+    "rtm.tasks.setDueDate",
+    "rtm.tasks.setPriority",
+)
+
+
+class RTMServer(ThreadingHTTPServer):
+    """
+    HTTP server answering like the RTM REST API.
+
+    lists, tasks: data as returned by rtm.lists.getList and rtm.tasks.getList
+    rate, burst: rate limit, see ratelimit.take_token()
+    latency: seconds to wait before answering
+    error_rate: fraction of requests answered by status 500
+    errors: status codes to answer the next requests with, e.g. [503, 500]
+    record_dir: forward requests to upstream and save the responses
+    replay_dir: serve saved responses
+    """
+
+    daemon_threads = True
+
+    def __init__(  # noqa: D107, PLR0913
+        self,
+        host: str = "127.0.0.1",
+        port: int = PORT_DEFAULT,
+        *,
+        lists: list[dict] | None = None,
+        tasks: list[dict] | None = None,
+        rate: float = 1.0,
+        burst: float = 2.0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        record_dir: Path | None = None,
+        replay_dir: Path | None = None,
+        upstream: str = URL_RTM_BASE,
+    ) -> None:
+        super().__init__((host, port), _Handler)
+        settings = get_settings()
+        self.api_key = settings["api_key"]
+        self.shared_secret = settings["shared_secret"]
+        self.token = settings["token"]
+        self.lists = lists or []
+        self.tasks = tasks or []
+        self.rate = rate
+        self.burst = burst
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors: deque[int] = deque()
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
+        self.upstream = upstream
+        self.frobs: set[str] = set()
+        self.timelines: set[str] = set()
+        # transaction id -> (taskseries, task before the modification)
+        self.transactions: dict[str, tuple[dict, dict]] = {}
+        self.stats = {
+            "requests": 0,
+            "rate_limited": 0,
+            "errors_injected": 0,
+            "replayed": 0,
+            "recorded": 0,
+        }
+        self._lock = threading.Lock()
+        self._bucket = (burst, time.time())
+
+    @property
+    def url(self) -> str:
+        """Base URL of the REST endpoint."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> RTMServer:
+        """Serve in a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_api(self, query: str) -> tuple[int, str]:
+        """Answer a request, returns status code and body."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if not self._take_token():
+                self.stats["rate_limited"] += 1
+                return 503, "Rate limit exceeded"
+            status = self.errors.popleft() if self.errors else None
+            if status is None and random.random() < self.error_rate:  # noqa: S311
+                status = 500
+            if status is not None:
+                self.stats["errors_injected"] += 1
+                return status, f"Injected error {status}"
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.record_dir:
+            return self._record(query)
+        param = dict(parse_qsl(query, keep_blank_values=True))
+        if error := self._check_auth(param):
+            return 200, _rsp_fail(error)
+        if self.replay_dir:
+            file_path = self.replay_dir / recording_name(param)
+            if file_path.exists():
+                with self._lock:
+                    self.stats["replayed"] += 1
+                return 200, file_path.read_text(encoding="utf-8")
+        return 200, self._call_method(param)
+
+    def _take_token(self) -> bool:
+        tokens, last = self._bucket
+        now = time.time()
+        tokens, wait = take_token(
+            tokens=tokens, last=last, now=now, rate=self.rate, burst=self.burst
+        )
+        if wait > 0:
+            # rejected requests do not use up a token
+            self._bucket = (tokens + 1, now)
+            return False
+        self._bucket = (tokens, now)
+        return True
+
+    def _check_auth(self, param: dict[str, str]) -> str:
+        """Return RTM error code or ""."""
+        if param.get("api_key") != self.api_key:
+            return "100"
+        api_sig = param.pop("api_sig", None)
+        if not api_sig:
+            return "97"
+        if api_sig != gen_api_sig(param, shared_secret=self.shared_secret):
+            return "96"
+        method = param.get("method", "")
+        if not method.startswith("rtm.auth.") and param.get("auth_token") != (
+            self.token
+        ):
+            return "98"
+        return ""
+
+    def _call_method(self, param: dict[str, str]) -> str:  # noqa: PLR0911
+        method = param.get("method", "")
+        if method == "rtm.auth.getFrob":
+            frob = gen_md5_string(f"{time.time()}{random.random()}")  # noqa: S311
+            self.frobs.add(frob)
+            return _rsp_ok({"frob": frob})
+        if method in {"rtm.auth.getToken", "rtm.auth.checkToken"}:
+            if method == "rtm.auth.getToken" and param.get("frob") not in self.frobs:
+                return _rsp_fail("101")
+            if method == "rtm.auth.checkToken" and param.get("auth_token") != (
+                self.token
+            ):
+                return _rsp_fail("98")
+            user = {"id": "1", "username": "standin", "fullname": "Stand In"}
+            return _rsp_ok(
+                {"auth": {"token": self.token, "perms": "read", "user": user}}
+            )
+        if method == "rtm.lists.getList":
+            return _rsp_ok({"lists": {"list": self.lists}})
+        if method == "rtm.tasks.getList":
+            return _rsp_ok({"tasks": self._get_tasks(param)})
+        if method in {"rtm.timelines.create", "rtm.transactions.undo", *WRITE_METHODS}:
+            return self._call_write_method(method, param)
+        return _rsp_fail("112")
+
+    def _call_write_method(self, method: str, param: dict[str, str]) -> str:
+        if method == "rtm.timelines.create":
+            timeline = str(len(self.timelines) + 1)
+            self.timelines.add(timeline)
+            return _rsp_ok({"timeline": timeline})
+        if param.get("timeline") not in self.timelines:
+            return _rsp_fail("300")
+        with self._lock:
+            if method == "rtm.transactions.undo":
+                return self._undo(param)
+            return self._modify_task(method, param)
+
+    def _modify_task(self, method: str, param: dict[str, str]) -> str:
+        found = self._find_task(param)
+        if found is None:
+            return _rsp_fail("340")
+        list_id, taskseries, task = found
+        transaction_id = str(len(self.transactions) + 1)
+        self.transactions[transaction_id] = (taskseries, task.copy())
+
+        now = dt.datetime.now(tz=dt.UTC)
+        if method == "rtm.tasks.complete":
+            task["completed"] = f"{now:%Y-%m-%dT%H:%M:%SZ}"
+        elif method == "rtm.tasks.postpone":
+            due = (
+                dt.datetime.fromisoformat(task["due"])
+                if task["due"]
+                else now.replace(hour=0, minute=0, second=0)
+            )
+            task["due"] = f"{due + dt.timedelta(days=1):%Y-%m-%dT%H:%M:%SZ}"
+            task["postponed"] = str(int(task["postponed"]) + 1)
+        elif method == "rtm.tasks.setDueDate":
+            task["due"] = param.get("due", "")
+        else:
+            task["priority"] = param.get("priority", "N")
+        taskseries["modified"] = f"{now:%Y-%m-%dT%H:%M:%SZ}"
+        return _rsp_ok(
+            {
+                "transaction": {"id": transaction_id, "undoable": "1"},
+                "list": {"id": list_id, "taskseries": [taskseries]},
+            }
+        )
+
+    def _undo(self, param: dict[str, str]) -> str:
+        transaction = self.transactions.pop(param.get("transaction_id", ""), None)
+        if transaction is None:
+            return _rsp_fail("360")
+        taskseries, task_before = transaction
+        for task in taskseries["task"]:
+            if task["id"] == task_before["id"]:
+                task.update(task_before)
+        taskseries["modified"] = f"{dt.datetime.now(tz=dt.UTC):%Y-%m-%dT%H:%M:%SZ}"
+        return _rsp_ok({})
+
+    def _find_task(self, param: dict[str, str]) -> tuple[str, dict, dict] | None:
+        for tasks_per_list in self.tasks:
+            if tasks_per_list["id"] != param.get("list_id"):
+                continue
+            for taskseries in tasks_per_list.get("taskseries", []):
+                if taskseries["id"] != param.get("taskseries_id"):
+                    continue
+                for task in taskseries["task"]:
+                    if task["id"] == param.get("task_id"):
+                        return tasks_per_list["id"], taskseries, task
+        return None
+
+    def _get_tasks(self, param: dict[str, str]) -> dict[str, Any]:
+        list_id = param.get("list_id")
+        last_sync = param.get("last_sync", "")
+        tasks = []
+        for tasks_per_list in self.tasks:
+            if list_id and tasks_per_list["id"] != list_id:
+                continue
+            taskseries = [
+                ts
+                for ts in tasks_per_list.get("taskseries", [])
+                if ts["modified"] >= last_sync
+            ]
+            if taskseries:
+                tasks.append({"id": tasks_per_list["id"], "taskseries": taskseries})
+        result: dict[str, Any] = {"rev": "standin"}
+        if tasks:
+            result["list"] = tasks
+        return result
+
+    def _record(self, query: str) -> tuple[int, str]:  # pragma: no cover
+        """Forward request to upstream, save the response if ok."""
+        try:
+            with urllib.request.urlopen(  # noqa: S310
+                f"{self.upstream}?{query}", timeout=30
+            ) as resp:
+                status, body = resp.status, resp.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8")
+        param = dict(parse_qsl(query, keep_blank_values=True))
+        if json.loads(body)["rsp"]["stat"] == "ok":
+            assert self.record_dir is not None
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+            (self.record_dir / recording_name(param)).write_text(body, encoding="utf-8")
+            with self._lock:
+                self.stats["recorded"] += 1
+        return status, body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: RTMServer
+
+    def do_GET(self) -> None:
+        status, body = self.server.handle_api(urlsplit(self.path).query)
+        data = body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except ConnectionError:
+            # client gave up, e.g. read timeout shorter than latency
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+        pass
+
+
+def recording_name(param: dict[str, str]) -> str:
+    """File name of a recorded response, from method and arguments."""
+    args = {k: v for k, v in param.items() if k not in ARGS_AUTH}
+    key = json.dumps(sorted(args.items()))
+    return f"{param.get('method', '')}-{gen_md5_string(key)}.json"
+
+
+def _rsp_ok(d: dict[str, Any]) -> str:
+    return json.dumps({"rsp": {"stat": "ok", **d}})
+
+
+def _rsp_fail(code: str) -> str:
+    return json.dumps(
+        {"rsp": {"stat": "fail", "err": {"code": code, "msg": ERRORS[code]}}}
+    )
+
+
+def main() -> None:  # pragma: no cover
+    """Command line interface."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT_DEFAULT)
+    parser.add_argument("--lists", type=Path, help="JSON of rtm.lists.getList")
+    parser.add_argument("--tasks", type=Path, help="JSON of rtm.tasks.getList")
+    parser.add_argument("--generate", type=int, help="number of synthetic tasks")
+    parser.add_argument("--rate", type=float, default=1.0, help="requests/s")
+    parser.add_argument("--burst", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--record", type=Path, help="dir to save responses to")
+    parser.add_argument("--replay", type=Path, help="dir of saved responses")
+    args = parser.parse_args()
+
+    lists = json.loads(args.lists.read_text()) if args.lists else []
+    tasks = json.loads(args.tasks.read_text()) if args.tasks else []
+    if args.generate:
+        from bench import gen_tasks  # noqa: PLC0415
+
+        tasks, lists_dict = gen_tasks(args.generate)
+        lists = [
+            {"id": str(list_id), "name": name, "deleted": "0", "smart": "0"}
+            for list_id, name in lists_dict.items()
+        ]
+
+    server = RTMServer(
+        args.host,
+        args.port,
+        lists=lists,
+        tasks=tasks,
+        rate=args.rate,
+        burst=args.burst,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        record_dir=args.record,
+        replay_dir=args.replay,
+    )
+    print(f"Serving at {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Single-flight: coalesce concurrent calls of the same fetch.
+
+The first caller of a key runs the function, callers of the same key
+arriving meanwhile wait for it and share its result (or exception),
+so an expired filter is fetched from RTM only once, even if several threads
+or Streamlit sessions request it at the same time.
+Coalesced calls are counted in metrics.py.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class _Call:
+    """A running call, waited for by the coalesced callers."""
+
+    __slots__ = ("done", "error", "result")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+# key -> running call
+_CALLS: dict[str, _Call] = {}
+_LOCK = threading.Lock()
+
+
+def do[T](key: str, func: Callable[[], T]) -> T:
+    """
+    Run func, unless a call of key is running: then wait for its result.
+
+    the result is shared, not copied
+    """
+    with _LOCK:
+        call = _CALLS.get(key)
+        leader = call is None
+        if call is None:
+            call = _CALLS[key] = _Call()
+
+    if not leader:
+        start = time.perf_counter()
+        call.done.wait()
+        metrics.count("singleflight_coalesced")
+        metrics.record("singleflight_wait", time.perf_counter() - start)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = func()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _LOCK:
+            del _CALLS[key]
+        call.done.set()
+    return call.result
@@ -0,0 +1,423 @@
+"""
+Local task store.
+
+SQLite database holding one row per task, shared by all filters.
+Which tasks belong to which filter is stored in a separate table.
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+DB_PATH = Path(__file__).parent.parent / "cache" / "tasks.sqlite"
+# databases whose schema was created by this process, see connect()
+_INITIALIZED: set[Path] = set()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY,
+    taskseries_id INTEGER NOT NULL,
+    list_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    created TEXT NOT NULL,
+    modified TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    due TEXT NOT NULL,
+    has_due_time TEXT NOT NULL,
+    added TEXT NOT NULL,
+    completed TEXT NOT NULL,
+    deleted TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    postponed TEXT NOT NULL,
+    estimate TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_list_id ON tasks (list_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (due);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed);
+
+-- task_ids of inserted or modified tasks, in order of the change,
+-- see changed_tasks(), seq is never reused
+CREATE TABLE IF NOT EXISTS task_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL UNIQUE
+);
+CREATE TRIGGER IF NOT EXISTS task_inserted AFTER INSERT ON tasks BEGIN
+    DELETE FROM task_changes WHERE task_id = NEW.task_id;
+    INSERT INTO task_changes (task_id) VALUES (NEW.task_id);
+END;
+CREATE TRIGGER IF NOT EXISTS task_updated AFTER UPDATE ON tasks BEGIN
+    DELETE FROM task_changes WHERE task_id = NEW.task_id;
+    INSERT INTO task_changes (task_id) VALUES (NEW.task_id);
+END;
+CREATE TRIGGER IF NOT EXISTS task_deleted AFTER DELETE ON tasks BEGIN
+    DELETE FROM task_changes WHERE task_id = OLD.task_id;
+END;
+
+CREATE TABLE IF NOT EXISTS filters (
+    filter_hash TEXT PRIMARY KEY,
+    filter TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    full_sync REAL NOT NULL,
+    last_sync TEXT NOT NULL
+);
+
+-- filters with tasks modified via the API, fetched again on next access
+CREATE TABLE IF NOT EXISTS expired_filters (
+    filter_hash TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS filter_tasks (
+    filter_hash TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (filter_hash, task_id)
+) WITHOUT ROWID;
+
+-- materialized aggregates per week and list, see aggregates.py
+CREATE TABLE IF NOT EXISTS week_agg_tasks (
+    scope TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    week TEXT NOT NULL,
+    list TEXT NOT NULL,
+    prio INTEGER,
+    overdue_prio INTEGER,
+    estimate INTEGER,
+    PRIMARY KEY (scope, task_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS week_agg (
+    scope TEXT NOT NULL,
+    week TEXT NOT NULL,
+    list TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum_prio INTEGER NOT NULL,
+    sum_overdue_prio INTEGER NOT NULL,
+    sum_estimate INTEGER NOT NULL,
+    PRIMARY KEY (scope, week, list)
+) WITHOUT ROWID;
+
+-- last task change and list names included in the aggregates
+CREATE TABLE IF NOT EXISTS week_agg_state (
+    scope TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    lists TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# unchanged tasks are not updated, so only changes are logged in task_changes
+UPSERT_TASK = """
+INSERT INTO tasks VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT (task_id) DO UPDATE SET
+    (taskseries_id, list_id, name, created, modified, tags, due, has_due_time,
+    added, completed, deleted, priority, postponed, estimate)
+    = (excluded.taskseries_id, excluded.list_id, excluded.name, excluded.created,
+    excluded.modified, excluded.tags, excluded.due, excluded.has_due_time,
+    excluded.added, excluded.completed, excluded.deleted, excluded.priority,
+    excluded.postponed, excluded.estimate)
+WHERE (tasks.taskseries_id, tasks.list_id, tasks.name, tasks.created,
+    tasks.modified, tasks.tags, tasks.due, tasks.has_due_time, tasks.added,
+    tasks.completed, tasks.deleted, tasks.priority, tasks.postponed,
+    tasks.estimate)
+    IS NOT (excluded.taskseries_id, excluded.list_id, excluded.name,
+    excluded.created, excluded.modified, excluded.tags, excluded.due,
+    excluded.has_due_time, excluded.added, excluded.completed, excluded.deleted,
+    excluded.priority, excluded.postponed, excluded.estimate)
+"""
+
+TASK_SERIES_FIELDS = ("name", "created", "modified")
+TASK_FIELDS = (
+    "due",
+    "has_due_time",
+    "added",
+    "completed",
+    "deleted",
+    "priority",
+    "postponed",
+    "estimate",
+)
+
+
+@dataclass(slots=True, frozen=True)
+class Task:
+    """
+    One task, a row of table tasks.
+
+    slotted, much smaller than the nested dicts of the API for large accounts
+    """
+
+    task_id: int
+    taskseries_id: int
+    list_id: int
+    name: str
+    created: str
+    modified: str
+    tags: str
+    due: str
+    has_due_time: str
+    added: str
+    completed: str
+    deleted: str
+    priority: str
+    postponed: str
+    estimate: str
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    Open the database, create the schema on first connect of the process.
+
+    commits on success, rolls back on exception
+    """
+    DB_PATH.parent.mkdir(exist_ok=True)
+    with closing(sqlite3.connect(DB_PATH, timeout=10)) as con:
+        if DB_PATH not in _INITIALIZED:
+            # both persist in the database file
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            _INITIALIZED.add(DB_PATH)
+        with con:
+            yield con
+
+
+def delete_db() -> None:
+    """Delete the database, it is created again on next connect."""
+    for suffix in ("", "-wal", "-shm"):
+        DB_PATH.with_name(DB_PATH.name + suffix).unlink(missing_ok=True)
+    _INITIALIZED.discard(DB_PATH)
+
+
+def as_list[T](x: T | list[T] | None) -> list[T]:
+    """RTM returns single elements as element instead of list of elements."""
+    if not x:
+        return []
+    if isinstance(x, list):
+        return x
+    return [x]
+
+
+def task_rows(rtm_tasks: list[dict]) -> Iterator[tuple]:
+    """
+    Convert tasks per list (as returned by rtm.tasks.getList) to table rows.
+    """
+    for tasks_per_list in rtm_tasks:
+        for taskseries in as_list(tasks_per_list.get("taskseries")):
+            # {"tag": "home"} for one tag, {"tag": ["home", "pc"]} for more
+            tags = taskseries.get("tags")
+            tags = ",".join(as_list(tags["tag"])) if tags else ""
+            for task in as_list(taskseries["task"]):
+                yield (
+                    int(task["id"]),
+                    int(taskseries["id"]),
+                    int(tasks_per_list["id"]),
+                    *(taskseries.get(field, "") for field in TASK_SERIES_FIELDS),
+                    tags,
+                    *(task.get(field, "") for field in TASK_FIELDS),
+                )
+
+
+def to_records(rtm_tasks: list[dict]) -> list[Task]:
+    """Convert tasks per list (as returned by rtm.tasks.getList) to records."""
+    return [Task(*row) for row in task_rows(rtm_tasks)]
+
+
+def save_tasks(
+    filter_hash: str,
+    my_filter: str,
+    rtm_tasks: list[dict],
+    last_sync: str,
+    *,
+    full_sync: bool,
+) -> None:
+    """
+    Upsert the tasks and set them as the result of the filter.
+
+    tasks that no filter references any more are removed.
+    """
+    rows = list(task_rows(rtm_tasks))
+    now = time.time()
+    with connect() as con:
+        con.executemany(UPSERT_TASK, rows)
+        con.execute("DELETE FROM filter_tasks WHERE filter_hash = ?", (filter_hash,))
+        con.execute("DELETE FROM expired_filters WHERE filter_hash = ?", (filter_hash,))
+        # pos: keep the order of the API result
+        con.executemany(
+            "INSERT INTO filter_tasks VALUES (?, ?, ?)",
+            ((filter_hash, row[0], pos) for pos, row in enumerate(rows)),
+        )
+        con.execute(
+            """
+            INSERT INTO filters VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (filter_hash) DO UPDATE SET
+                fetched_at = excluded.fetched_at,
+                full_sync = CASE WHEN ? THEN excluded.full_sync ELSE full_sync END,
+                last_sync = excluded.last_sync
+            """,
+            (filter_hash, my_filter, now, now, last_sync, full_sync),
+        )
+        con.execute(
+            "DELETE FROM tasks WHERE task_id NOT IN (SELECT task_id FROM filter_tasks)"
+        )
+
+
+def delete_filter(filter_hash: str) -> None:
+    """Remove a filter and its no longer referenced tasks."""
+    with connect() as con:
+        con.execute("DELETE FROM filter_tasks WHERE filter_hash = ?", (filter_hash,))
+        con.execute("DELETE FROM filters WHERE filter_hash = ?", (filter_hash,))
+        con.execute("DELETE FROM expired_filters WHERE filter_hash = ?", (filter_hash,))
+        con.execute(
+            "DELETE FROM tasks WHERE task_id NOT IN (SELECT task_id FROM filter_tasks)"
+        )
+
+
+def filter_state(filter_hash: str) -> dict[str, float | str] | None:
+    """
+    Return fetched_at, full_sync (both epoch), last_sync (ISO) and expired (bool).
+
+    expired: tasks of the filter were modified, see expire_filters()
+    """
+    with connect() as con:
+        row = con.execute(
+            """
+            SELECT fetched_at, full_sync, last_sync,
+                filter_hash IN (SELECT filter_hash FROM expired_filters)
+            FROM filters WHERE filter_hash = ?
+            """,
+            (filter_hash,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "fetched_at": row[0],
+        "full_sync": row[1],
+        "last_sync": row[2],
+        "expired": bool(row[3]),
+    }
+
+
+def list_filters() -> list[tuple[str, str, float]]:
+    """Return filter_hash, filter and fetched_at (epoch) of the not expired filters."""
+    with connect() as con:
+        return con.execute(
+            """
+            SELECT filter_hash, filter, fetched_at FROM filters
+            WHERE filter_hash NOT IN (SELECT filter_hash FROM expired_filters)
+            """
+        ).fetchall()
+
+
+def expire_filters(task_ids: list[int]) -> None:
+    """
+    Mark the filters containing any of the tasks as expired.
+
+    e.g. after modifying tasks via the API
+    fetched_at is kept, so closed partitions of history.py stay closed
+    """
+    with connect() as con:
+        con.executemany(
+            """
+            INSERT OR IGNORE INTO expired_filters
+            SELECT DISTINCT filter_hash FROM filter_tasks WHERE task_id = ?
+            """,
+            ((i,) for i in task_ids),
+        )
+
+
+def last_change() -> int:
+    """Return the last change, see changed_tasks(), read before loading tasks."""
+    with connect() as con:
+        return con.execute("SELECT coalesce(max(seq), 0) FROM task_changes").fetchone()[
+            0
+        ]
+
+
+def changed_tasks(since: int) -> tuple[set[int], int]:
+    """
+    Return the task_ids inserted or modified after change since and the last change.
+
+    since: 0 or the last change returned by a previous call
+    removed tasks are not included
+    """
+    with connect() as con:
+        rows = con.execute(
+            "SELECT task_id, seq FROM task_changes WHERE seq > ?", (since,)
+        ).fetchall()
+    return {task_id for task_id, _ in rows}, max(
+        (seq for _, seq in rows), default=since
+    )
+
+
+def task_locations(task_ids: list[int]) -> dict[int, tuple[int, int]]:
+    """Return task_id -> (list_id, taskseries_id) of the stored tasks."""
+    with connect() as con:
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS ids (task_id INTEGER PRIMARY KEY)")
+        con.execute("DELETE FROM ids")
+        con.executemany(
+            "INSERT OR IGNORE INTO ids VALUES (?)", ((i,) for i in task_ids)
+        )
+        rows = con.execute(
+            """
+            SELECT t.task_id, t.list_id, t.taskseries_id FROM tasks t
+            JOIN ids USING (task_id)
+            """
+        ).fetchall()
+    return {
+        task_id: (list_id, taskseries_id) for task_id, list_id, taskseries_id in rows
+    }
+
+
+def load_task_records(filter_hash: str) -> list[Task]:
+    """Read the tasks of a filter, in the order of the API result."""
+    with connect() as con:
+        rows = con.execute(
+            """
+            SELECT t.* FROM filter_tasks f
+            JOIN tasks t ON t.task_id = f.task_id
+            WHERE f.filter_hash = ?
+            ORDER BY f.pos
+            """,
+            (filter_hash,),
+        ).fetchall()
+    return [Task(*row) for row in rows]
+
+
+def load_tasks(filter_hash: str) -> list[dict]:
+    """
+    Read the tasks of a filter.
+
+    in the nested format of rtm.tasks.getList: list -> taskseries -> task
+    """
+    return records_to_nested(load_task_records(filter_hash))
+
+
+def records_to_nested(records: list[Task]) -> list[dict]:
+    """Convert records to the nested format of rtm.tasks.getList."""
+    lists: dict[int, dict[int, dict]] = {}
+    for t in records:
+        series = lists.setdefault(t.list_id, {})
+        if t.taskseries_id not in series:
+            series[t.taskseries_id] = {
+                "id": str(t.taskseries_id),
+                **{field: getattr(t, field) for field in TASK_SERIES_FIELDS},
+                "tags": {"tag": t.tags.split(",")} if t.tags else [],
+                "task": [],
+            }
+        task = {"id": str(t.task_id)}
+        task.update({field: getattr(t, field) for field in TASK_FIELDS})
+        series[t.taskseries_id]["task"].append(task)
+
+    return [
+        {"id": str(list_id), "taskseries": list(series.values())}
+        for list_id, series in lists.items()
+    ]
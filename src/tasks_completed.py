@@ -6,37 +6,52 @@
 import datetime as dt
 from typing import TYPE_CHECKING
 
+import metrics
+from aggregates import update_week_aggregates
+from atomic import atomic_path
+from config import get_date_today
 from helper import (
-    DATE_TODAY,
     OUTPUT_DIR,
-    df_name_url_to_html,
     df_to_html,
-    get_lists_dict,
-    get_tasks_as_df,
+    task_urls,
 )
+from history import get_completed_df
 
 if TYPE_CHECKING:
     import pandas as pd
 
-DATE_START = DATE_TODAY - dt.timedelta(days=365)
-FILTER_COMPLETED = f"""
-CompletedAfter:{DATE_START.strftime("%d/%m/%Y")}
-AND NOT list:Taschengeld"""
+# completed in the last DAYS days, fetched per month, see history.py
+DAYS = 365
+FILTER_COMPLETED_BASE = "NOT list:Taschengeld"
 FILE_EXPORT = OUTPUT_DIR / "tasks_completed.csv"
 
 
-def get_tasks_completed() -> pd.DataFrame:  # noqa: D103
-    lists_dict = get_lists_dict()
+def get_date_start() -> dt.date:
+    """Return the first day of the report, evaluated per call for long runs."""
+    return get_date_today() - dt.timedelta(days=DAYS)
+
 
-    df = get_tasks_as_df(
-        my_filter=FILTER_COMPLETED,
-        lists_dict=lists_dict,
+def get_tasks_completed() -> pd.DataFrame:  # noqa: D103
+    df = get_completed_df(
+        start=get_date_start(),
+        end=get_date_today(),
+        base_filter=FILTER_COMPLETED_BASE,
     )
+    return select_completed(df)
+
+
+def select_completed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sort and select columns of the completed tasks report.
+
+    indexed by task_id, with url
+    """
+    df = df.assign(url=task_urls(df))
     df = df.sort_values(
         by=["completed", "completed_time", "prio", "name"],
         ascending=[False, False, False, True],
     )
-    df = df.reset_index()
+    df = df.set_index("task_id")
 
     cols = [
         "name",
@@ -71,24 +86,40 @@ def completed_week(df: pd.DataFrame) -> pd.DataFrame:  # noqa: D103
     return df
 
 
-if __name__ == "__main__":
-    df = get_tasks_completed()
-    df["name"] = df["name"].str.replace("\t", " ")
-    df.sort_values(["completed", "completed_time", "name"]).to_csv(
-        FILE_EXPORT, index=False, sep="\t", lineterminator="\n"
-    )
+def completed_week_incremental(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return completed_week(df), maintained incrementally in the task store.
 
-    print("# RTM tasks completed this year")
+    only new, changed and removed tasks update the aggregates,
+    see aggregates.py
+    df: as returned by select_completed()
+    """
+    return update_week_aggregates("completed", df)
 
-    df = df_name_url_to_html(df)
 
-    df_to_html(
-        df,
-        "out-completed.html",
-    )
+def write_completed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Write the CSV export and the HTML reports of the completed tasks.
+
+    df: as returned by select_completed()
+    returns completed_week_incremental(df)
+    """
+    df = df.assign(name=df["name"].str.replace("\t", " "))
+    with atomic_path(FILE_EXPORT) as path_tmp:
+        df.sort_values(["completed", "completed_time", "name"]).to_csv(
+            path_tmp, index=False, sep="\t", lineterminator="\n"
+        )
+
+    df_to_html(df, "out-completed.html", escape=True, links={"name": "url"})
     # df.to_excel(output_dir/"out-done-year.xlsx", index=False)
 
-    df2 = completed_week(df)
-    print(df2)
+    df2 = completed_week_incremental(df)
+    df_to_html(df2, "out-completed-week.html", index=True, escape=True)
+    return df2
 
-    df_to_html(df2, "out-completed-week.html", index=True)
+
+if __name__ == "__main__":
+    print("# RTM tasks completed this year")
+    df2 = write_completed(get_tasks_completed())
+    print(df2)
+    metrics.write(OUTPUT_DIR / "metrics-completed.json")
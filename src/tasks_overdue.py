@@ -5,11 +5,13 @@
 
 from typing import TYPE_CHECKING
 
+import metrics
 from helper import (
-    df_name_url_to_html,
+    OUTPUT_DIR,
     df_to_html,
     get_lists_dict,
     get_tasks_as_df,
+    task_urls,
 )
 
 if TYPE_CHECKING:
@@ -29,8 +31,18 @@ def get_tasks_overdue() -> DataFrame:  # noqa: D103
         my_filter=FILTER_OVERDUE,
         lists_dict=lists_dict,
     )
+    return select_overdue(df)
+
+
+def select_overdue(df: DataFrame) -> DataFrame:
+    """
+    Sort and select columns of the overdue tasks report, with url.
+
+    indexed by task_id
+    """
+    df = df.assign(url=task_urls(df))
     df = df.sort_values(by=["overdue_prio"], ascending=False)
-    df = df.reset_index()
+    df = df.set_index("task_id")
 
     cols = ["name", "list", "due", "overdue", "prio", "overdue_prio", "estimate", "url"]
     df = df[cols]
@@ -52,14 +64,20 @@ def group_by_list(df: DataFrame) -> DataFrame:  # noqa: D103
     return df
 
 
+def write_overdue(df: DataFrame) -> None:
+    """
+    Write the HTML report of the overdue tasks.
+
+    df: as returned by select_overdue()
+    """
+    df_to_html(df, "out-overdue.html", escape=True, links={"name": "url"})
+
+
 if __name__ == "__main__":
     print("# RTM tasks overdue")
     df = get_tasks_overdue()
 
     print(df)
 
-    df = df_name_url_to_html(df)
-    df_to_html(
-        df,
-        "out-overdue.html",
-    )
+    write_overdue(df)
+    metrics.write(OUTPUT_DIR / "metrics-overdue.json")
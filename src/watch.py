@@ -0,0 +1,143 @@
+"""
+Watch RTM and regenerate the reports only when their tasks changed.
+
+Long running process, keeping the task store, the memory cache and the
+converted DataFrames warm: every interval seconds the reports are loaded,
+see report_data.py, and a content hash of each report is compared to the one
+of its last written output. Only reports whose tasks changed are written again,
+atomically, see atomic.py.
+After the start all reports are written once.
+
+uv run src/watch.py --interval 300
+"""
+
+# by Dr. Torben Menke https://entorb.net
+# https://github.com/entorb/rememberthemilk
+
+import argparse
+import hashlib
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+import cache
+import helper
+import metrics
+from config import get_settings
+from helper import OUTPUT_DIR
+from report_data import get_reports
+from tasks_completed import write_completed
+from tasks_overdue import write_overdue
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# seconds between polls, setting watch_interval
+INTERVAL_DEFAULT = 300
+
+# report -> files written by WRITERS
+OUTPUTS = {
+    "completed": (
+        "tasks_completed.csv",
+        "out-completed.html",
+        "out-completed-week.html",
+    ),
+    "overdue": ("out-overdue.html",),
+}
+WRITERS: dict[str, Callable[[pd.DataFrame], object]] = {
+    "completed": write_completed,
+    "overdue": write_overdue,
+}
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """Return a hash of the columns, index and values of df, in row order."""
+    m = hashlib.new("md5", usedforsecurity=False)
+    m.update(repr((list(df.columns), list(df.index.names))).encode())
+    m.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return m.hexdigest()
+
+
+def poll(
+    hashes: dict[str, str],
+    load: Callable[[], dict[str, pd.DataFrame]] = get_reports,
+) -> list[str]:
+    """
+    Load the reports and write the changed ones.
+
+    hashes: report -> hash of its written output, updated for written reports
+    a report is written as well if one of its files is missing
+    returns the written reports
+    """
+    written = []
+    for name, df in load().items():
+        h = frame_hash(df)
+        if h == hashes.get(name) and all(
+            (OUTPUT_DIR / file).exists() for file in OUTPUTS[name]
+        ):
+            metrics.count("watch_unchanged")
+            continue
+        WRITERS[name](df)
+        hashes[name] = h
+        written.append(name)
+        metrics.count("watch_written")
+    return written
+
+
+def watch(interval: float, stop: threading.Event) -> None:
+    """
+    Poll every interval seconds until stop is set.
+
+    errors are printed, the previous output is kept and the next poll retries
+    """
+    # stored results expire before the next poll, so each poll asks RTM
+    max_age = min(cache.TTL["tasks"], interval / 2)
+    # long running: a poll writes the data of the previous poll's background
+    # refresh instead of waiting for RTM, see helper.serve_stale()
+    helper.STALE_WHILE_REVALIDATE = True
+    hashes: dict[str, str] = {}
+    while not stop.is_set():
+        start = time.time()
+        try:
+            written = poll(hashes, load=lambda: get_reports(max_age))
+        except Exception as e:  # noqa: BLE001
+            print(f"Watch poll failed: {e}")
+        else:
+            print(
+                f"Watch poll in {time.time() - start:.1f}s, "
+                f"written: {', '.join(written) or 'none'}"
+            )
+            metrics.write(OUTPUT_DIR / "metrics-watch.json")
+        stop.wait(max(0.0, interval - (time.time() - start)))
+
+
+def main() -> None:  # pragma: no cover
+    """Command line interface, stopped by Ctrl+C or SIGTERM."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=float(get_settings().get("watch_interval", INTERVAL_DEFAULT)),
+        help="seconds between polls",
+    )
+    parser.add_argument("--once", action="store_true", help="poll once and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        print(f"Written: {', '.join(poll({})) or 'none'}")
+        metrics.write(OUTPUT_DIR / "metrics-watch.json")
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        watch(args.interval, stop)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
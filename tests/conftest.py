@@ -0,0 +1,39 @@
+"""
+Fixtures shared by the tests.
+"""
+
+import copy
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import ratelimit
+import rtm_client
+from config import get_settings
+from rtm_server import RTMServer
+
+LISTS = json.loads(Path("tests/test_data/lists.json").read_text())
+TASKS = json.loads(next(Path("tests/test_data").glob("tasks-*.json")).read_text())
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    srv = RTMServer(
+        port=0, lists=LISTS, tasks=copy.deepcopy(TASKS), rate=1000, burst=1000
+    )
+    srv.start()
+    monkeypatch.setitem(get_settings(), "api_url", srv.url)
+    monkeypatch.setitem(get_settings(), "retries", 2)
+    # client side rate limit and backoff: no waiting in tests
+    monkeypatch.setattr(ratelimit, "STATE_FILE", tmp_path / "ratelimit.state")
+    monkeypatch.setattr(ratelimit, "RATE", 1000)
+    monkeypatch.setattr(ratelimit, "BURST", 1000)
+    monkeypatch.setattr(rtm_client, "HTTP_BACKOFF", 0.01)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
@@ -0,0 +1,115 @@
+"""
+Test materialized aggregates per week and list.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import store
+from aggregates import update_week_aggregates
+from bench import gen_tasks
+from helper import convert_task_columns, records_to_df
+from tasks_completed import completed_week, select_completed
+
+
+@pytest.fixture(autouse=True)
+def _tmp_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+
+
+def _completed_df(rtm_tasks: list[dict], lists_dict: dict[int, str]) -> pd.DataFrame:
+    """Save the tasks in the store and return the completed ones."""
+    store.save_tasks("unit-test", "", rtm_tasks, "", full_sync=True)
+    return _load_completed_df(lists_dict)
+
+
+def _load_completed_df(lists_dict: dict[int, str]) -> pd.DataFrame:
+    seq = store.last_change()
+    records = store.load_task_records("unit-test")
+    df = convert_task_columns(records_to_df(records, lists_dict))
+    df = select_completed(df[df["completed"].notna()])
+    df.attrs["changes_seq"] = seq
+    return df
+
+
+def _assert_equal(df: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(
+        update_week_aggregates("unit-test", df),
+        completed_week(df),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_update_week_aggregates() -> None:
+    rtm_tasks, lists_dict = gen_tasks(2000)
+    df = _completed_df(rtm_tasks, lists_dict)
+    _assert_equal(df)
+    # unchanged
+    _assert_equal(_completed_df(rtm_tasks, lists_dict))
+
+    # modified, moved, uncompleted and removed tasks
+    completed = [
+        (tasks_per_list, taskseries)
+        for tasks_per_list in rtm_tasks
+        for taskseries in tasks_per_list["taskseries"]
+        if taskseries["task"][0]["completed"]
+    ]
+    completed[0][1]["task"][0]["priority"] = "1"
+    completed[1][1]["task"][0]["estimate"] = ""
+    completed[2][1]["task"][0]["completed"] = ""
+    completed[3][0]["taskseries"].remove(completed[3][1])
+    other_list = next(t for t in rtm_tasks if t is not completed[4][0])
+    completed[4][0]["taskseries"].remove(completed[4][1])
+    other_list["taskseries"].append(completed[4][1])
+    _assert_equal(_completed_df(rtm_tasks, lists_dict))
+
+    # renamed list
+    lists_dict[next(iter(lists_dict))] = "Renamed"
+    _assert_equal(_completed_df(rtm_tasks, lists_dict))
+
+    _assert_equal(df.iloc[0:0])
+
+
+def test_update_week_aggregates_saved_meanwhile() -> None:
+    rtm_tasks, lists_dict = gen_tasks(500)
+    _assert_equal(_completed_df(rtm_tasks, lists_dict))
+    df_stale = _load_completed_df(lists_dict)
+    # saved by another process after the tasks were loaded
+    task = next(
+        task
+        for tasks_per_list in rtm_tasks
+        for taskseries in tasks_per_list["taskseries"]
+        for task in taskseries["task"]
+        if task["completed"] and task["estimate"]
+    )
+    task["estimate"] = ""
+    store.save_tasks("unit-test", "", rtm_tasks, "", full_sync=True)
+    _assert_equal(df_stale)
+    _assert_equal(_load_completed_df(lists_dict))
+
+
+def test_changed_tasks() -> None:
+    rtm_tasks, _ = gen_tasks(10)
+    changed, seq = store.changed_tasks(0)
+    assert changed == set()
+    assert seq == 0
+    store.save_tasks("unit-test", "", rtm_tasks, "", full_sync=True)
+    changed, seq = store.changed_tasks(0)
+    assert len(changed) == 10
+    # saving the same tasks again changes nothing
+    store.save_tasks("unit-test", "", rtm_tasks, "", full_sync=True)
+    assert store.changed_tasks(seq) == (set(), seq)
+
+    task = next(t for t in rtm_tasks if t["taskseries"])["taskseries"][0]["task"][0]
+    task["priority"] = "1" if task["priority"] != "1" else "2"
+    store.save_tasks("unit-test", "", rtm_tasks, "", full_sync=True)
+    changed, seq2 = store.changed_tasks(seq)
+    assert changed == {int(task["id"])}
+    assert seq2 > seq
@@ -0,0 +1,54 @@
+"""
+Test atomic file writes.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+from atomic import atomic_path
+
+
+def test_atomic_path(tmp_path: Path) -> None:
+    path = tmp_path / "out" / "a.txt"
+    with atomic_path(path) as path_tmp:
+        path_tmp.write_text("new")
+        assert not path.exists()
+    assert path.read_text() == "new"
+    assert path.stat().st_mode & 0o777 != 0o600
+
+    def write_failing() -> None:
+        with atomic_path(path) as path_tmp:
+            path_tmp.write_text("partial")
+            msg = "failed"
+            raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="failed"):
+        write_failing()
+    # previous file kept, no temporary file left
+    assert path.read_text() == "new"
+    assert [p.name for p in path.parent.iterdir()] == ["a.txt"]
+
+
+def test_atomic_path_concurrent(tmp_path: Path) -> None:
+    path = tmp_path / "a.txt"
+    barrier = threading.Barrier(8)
+
+    def write(i: int) -> None:
+        with atomic_path(path) as path_tmp, path_tmp.open("w") as fh:
+            barrier.wait()
+            fh.write(str(i) * 100_000)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # one complete file of one writer
+    assert path.read_text() in {str(i) * 100_000 for i in range(8)}
+    assert [p.name for p in tmp_path.iterdir()] == ["a.txt"]
@@ -0,0 +1,47 @@
+"""
+Test benchmark of the task pipeline.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+from bench import compare, gen_response, gen_tasks, run, run_pipeline
+from helper import flatten_tasks
+
+
+def test_gen_tasks() -> None:
+    rtm_tasks, lists_dict = gen_tasks(500, n_lists=5)
+    flat = flatten_tasks(rtm_tasks, lists_dict)
+    assert len(flat) == 500
+    assert len({row["task_id"] for row in flat}) == 500
+    assert {row["list_id"] for row in flat} <= {str(i) for i in lists_dict}
+    # recurring taskseries
+    assert any(len(ts["task"]) > 1 for el in rtm_tasks for ts in el["taskseries"])
+    assert gen_tasks(500, n_lists=5)[0] == rtm_tasks
+
+
+def test_run_pipeline() -> None:
+    rtm_tasks, lists_dict = gen_tasks(300)
+    timings = run_pipeline(gen_response(rtm_tasks), lists_dict)
+    assert set(timings) >= {
+        "json_parse_response",
+        "flatten_tasks",
+        "convert_task_fields",
+        "tasks_to_df",
+        "df_name_url_to_html",
+        "completed_week",
+        "group_by_list",
+    }
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_compare() -> None:
+    report = run((100,), repeat=1)
+    assert compare(report, report) == []
+    slow = {
+        "results": {"100": {k: v * 3 + 1 for k, v in report["results"]["100"].items()}}
+    }
+    assert compare(slow, report) != []
+    assert compare(report, slow) == []
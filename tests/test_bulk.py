@@ -0,0 +1,129 @@
+"""
+Test bulk modification of tasks against the local RTM stand-in.
+"""
+
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import metrics
+import store
+from bulk import Job, Operation, create_timeline, plan, run, undo
+from config import get_settings
+from helper import gen_md5_string
+
+TASKS = json.loads(next(Path("tests/test_data").glob("tasks-*.json")).read_text())
+
+
+@pytest.fixture(autouse=True)
+def _tmp_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    h = gen_md5_string("list:unit-tests")
+    store.save_tasks(h, "list:unit-tests", TASKS, "", full_sync=True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _tasks(server) -> dict[str, dict]:
+    return {
+        task["id"]: task
+        for tasks_per_list in server.tasks
+        for ts in tasks_per_list["taskseries"]
+        for task in ts["task"]
+    }
+
+
+def test_plan() -> None:
+    df = pd.DataFrame({"name": ["a", "b"]}, index=pd.Index([1, 2], name="task_id"))
+    assert plan("set_priority", df, priority="1") == [
+        Operation("set_priority", 1, {"priority": "1"}),
+        Operation("set_priority", 2, {"priority": "1"}),
+    ]
+    with pytest.raises(ValueError, match="requires argument due"):
+        plan("set_due_date", df)
+    with pytest.raises(ValueError, match="Unknown action"):
+        plan("delete", df)
+
+
+def test_run_and_undo(server, tmp_path: Path) -> None:
+    tasks_before = copy.deepcopy(_tasks(server))
+    # filter not containing the modified tasks
+    other = [t for t in store.to_records(TASKS) if t.task_id == 1029525734]
+    h_other = gen_md5_string("status:completed")
+    store.save_tasks(
+        h_other,
+        "status:completed",
+        store.records_to_nested(other),
+        "",
+        full_sync=True,
+    )
+    df = pd.DataFrame({"task_id": [1029525662, 1029525753, 1]})
+    progress = []
+    job = run(plan("postpone", df), progress=lambda *args: progress.append(args[:2]))
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert [r.error for r in job.failed] == ["task not in task store"]
+    assert metrics.COUNTERS["bulk_done"] == 2
+    assert metrics.COUNTERS["bulk_failed"] == 1
+    tasks = _tasks(server)
+    assert tasks["1029525662"]["postponed"] == "1"
+    assert tasks["1029525662"]["due"] == "2024-02-28T23:00:00Z"
+    assert tasks["1029525753"]["postponed"] == "1"
+    assert "2 done, 1 failed" in job.summary()
+    # tasks were modified: stored filters containing them are expired
+    state = store.filter_state(gen_md5_string("list:unit-tests"))
+    assert state is not None
+    assert state["expired"]
+    assert state["fetched_at"] > 0
+    state = store.filter_state(h_other)
+    assert state is not None
+    assert not state["expired"]
+
+    # undo by a later process
+    job.save(tmp_path / "job.json")
+    undo_job = undo(Job.load(tmp_path / "job.json"))
+    assert len(undo_job.results) == 2
+    assert not undo_job.failed
+    assert _tasks(server) == tasks_before
+
+
+def test_run_error(server) -> None:
+    df = pd.DataFrame({"task_id": [1029525662]})
+    # modifying calls are not retried on other errors than 503
+    server.errors.append(500)
+    job = run(plan("complete", df), timeline="1")
+    assert job.failed[0].error.startswith("Outcome unknown. status code:500")
+    assert job.failed[0].outcome_unknown
+    job = run(plan("complete", df), timeline="unknown")
+    assert "Timeline invalid or not provided" in job.failed[0].error
+    assert not job.failed[0].outcome_unknown
+    # rate limited: not applied, retried
+    server.errors.extend([503, 503])
+    job = run(plan("postpone", df), timeline=create_timeline())
+    assert not job.failed
+    assert _tasks(server)["1029525662"]["postponed"] == "1"
+
+
+def test_run_read_timeout(server, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(get_settings(), "timeout_read", 0.2)
+    timeline = create_timeline()
+    server.latency = 0.5
+    df = pd.DataFrame({"task_id": [1029525662]})
+    job = run(plan("postpone", df), timeline=timeline)
+    assert job.failed[0].outcome_unknown
+    assert job.failed[0].error.startswith("Outcome unknown. ReadTimeout")
+    assert "1 failed" in job.summary()
+    # applied once by the server, after the client gave up
+    time.sleep(0.5)
+    assert _tasks(server)["1029525662"]["postponed"] == "1"
+    state = store.filter_state(gen_md5_string("list:unit-tests"))
+    assert state is not None
+    assert state["expired"]
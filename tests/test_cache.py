@@ -0,0 +1,94 @@
+"""
+Test two-tier cache.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import cache
+
+
+@pytest.fixture(autouse=True)
+def _tmp_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_MEMORY", type(cache._MEMORY)())  # noqa: SLF001
+    monkeypatch.setattr(cache, "STATS", dict.fromkeys(cache.STATS, 0))
+
+
+def test_get_put() -> None:
+    assert cache.get("lists", "key1") is None
+    cache.put("lists", "key1", [{"a": "b"}])
+    assert cache.get("lists", "key1") == [{"a": "b"}]
+    assert cache.STATS["hits_memory"] == 1
+    assert sorted(p.name for p in cache.CACHE_DIR.iterdir()) == ["key1.json.gz"]
+
+    # disk tier
+    cache._MEMORY.clear()  # noqa: SLF001
+    assert cache.get("lists", "key1") == [{"a": "b"}]
+    assert cache.STATS["hits_disk"] == 1
+    assert cache.STATS["misses"] == 1
+
+
+def test_get_file_evicted_meanwhile(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache.put("lists", "key1", [1])
+    cache._MEMORY.clear()  # noqa: SLF001
+    read = cache._read  # noqa: SLF001
+
+    def read_evicted(file_path: Path) -> object:
+        # evict_disk() of another process between stat() and read
+        file_path.unlink()
+        return read(file_path)
+
+    monkeypatch.setattr(cache, "_read", read_evicted)
+    assert cache.get("lists", "key1") is None
+    assert cache.STATS["misses"] == 1
+
+
+def test_memory_only() -> None:
+    cache.put("tasks", "key1", [1], disk=False)
+    assert cache.get("tasks", "key1") == [1]
+    assert not list(cache.CACHE_DIR.iterdir())
+
+
+def test_expired(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache.put("lists", "key1", [1])
+    monkeypatch.setitem(cache.TTL, "lists", 0)
+    assert cache.get("lists", "key1") is None
+
+
+def test_schema_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache.put("lists", "key1", [1])
+    cache._MEMORY.clear()  # noqa: SLF001
+    monkeypatch.setattr(cache, "SCHEMA_VERSION", cache.SCHEMA_VERSION + 1)
+    assert cache.get("lists", "key1") is None
+    assert cache.get_stale("key1") is None
+
+
+def test_memory_lru(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache, "MEMORY_MAX_ITEMS", 2)
+    for key in ("key1", "key2"):
+        cache.put("tasks", key, [key], disk=False)
+    cache.get("tasks", "key1")
+    cache.put("tasks", "key3", ["key3"], disk=False)
+    # key2 was least recently used
+    assert list(cache._MEMORY) == ["key1", "key3"]  # noqa: SLF001
+    assert cache.STATS["evictions"] == 1
+
+
+def test_evict_disk() -> None:
+    for key in ("key1", "key2", "key3"):
+        cache.put("lists", key, ["x" * 100])
+    size = (cache.CACHE_DIR / "key1.json.gz").stat().st_size
+    # read from disk tier
+    cache._MEMORY.clear()  # noqa: SLF001
+    cache.get("lists", "key1")
+    cache.evict_disk(max_bytes=2 * size)
+    assert sorted(p.name for p in cache.CACHE_DIR.iterdir()) == [
+        "key1.json.gz",
+        "key3.json.gz",
+    ]
@@ -0,0 +1,77 @@
+"""
+Test the background refreshed data service.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+from data_service import DataService
+
+
+def test_refresh() -> None:
+    calls = []
+
+    def load() -> dict[str, pd.DataFrame]:
+        calls.append(1)
+        if len(calls) == 2:
+            msg = "API down"
+            raise OSError(msg)
+        return {"a": pd.DataFrame({"x": [len(calls)]})}
+
+    service = DataService(load=load)
+    assert service.snapshot is None
+    service.refresh()
+    snapshot = service.snapshot
+    assert snapshot is not None
+    assert snapshot.reports["a"]["x"].iloc[0] == 1
+
+    # failed refresh keeps the snapshot
+    service.refresh()
+    assert service.snapshot is snapshot
+    assert service.error == "refresh failed: API down"
+
+    service.refresh()
+    assert service.snapshot is not snapshot
+    assert service.error == ""
+    assert service.refreshes == 2
+
+
+def test_background() -> None:
+    loaded = threading.Event()
+    release = threading.Event()
+
+    def load() -> dict[str, pd.DataFrame]:
+        loaded.set()
+        release.wait(5)
+        return {"a": pd.DataFrame()}
+
+    service = DataService(load=load, interval=60).start()
+    assert loaded.wait(5)
+    # readers do not wait for the running load
+    assert service.snapshot is None
+    release.set()
+    snapshot = service.wait(5)
+    assert snapshot is not None
+    # shared, not copied
+    assert service.wait(5) is snapshot
+    service.stop()
+
+
+def test_list_index() -> None:
+    df = pd.DataFrame(
+        {"list": pd.Categorical(["b", "it's", "b", "a"]), "x": [1, 2, 3, 4]}
+    )
+    service = DataService(load=lambda: {"tasks": df, "other": pd.DataFrame()})
+    service.refresh()
+    assert service.snapshot is not None
+    index = service.snapshot.list_indexes["tasks"]
+    assert list(index) == ["a", "b", "it's"]
+    assert df.iloc[index["b"]]["x"].to_list() == [1, 3]
+    assert df.iloc[index["it's"]]["x"].to_list() == [2]
+    assert "other" not in service.snapshot.list_indexes
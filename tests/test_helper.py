@@ -2,12 +2,16 @@
 Test helper functions.
 """
 
+import copy
+import dataclasses
 import datetime as dt
 import json
-import shutil
 import sys
+import threading
+import time
 from pathlib import Path
 
+import pandas as pd
 import pytest
 
 # Add src directory to the Python path, so we can run this file directly
@@ -16,10 +20,16 @@ sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
 LIST_UNIT_TEST = "list:unit-tests"
 
 
+import cache  # noqa: E402
+import helper  # noqa: E402
+import store  # noqa: E402
+from config import get_settings  # noqa: E402
 from helper import (  # noqa: E402
+    compact_task_columns,
+    convert_task_columns,
     convert_task_fields,
     df_name_url_to_html,
-    dict_to_url_param,
+    flat_tasks_to_df,
     flatten_tasks,
     # gen_api_sig,
     gen_md5_string,
@@ -27,81 +37,42 @@ from helper import (  # noqa: E402
     get_lists_dict,
     get_tasks,
     get_tasks_as_df,
-    json_parse_response,
+    merge_tasks,
+    records_to_df,
     task_est_to_minutes,
+    task_url,
+    task_urls,
+    tasks_fingerprint,
     tasks_to_df,
 )
 
-CACHE_DIR = Path(__file__).parent.parent / "cache"
-
 
 @pytest.fixture(autouse=True)
-def _setup_tests():
+def _setup_tests(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    use_tmp_cache(tmp_path, monkeypatch)
     cache_prepare_lists()
     cache_prepare_tasks()
 
-    yield
 
-    cache_cleanup_test_data()
+def use_tmp_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Point the cache and the store to tmp_path, starting empty."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_MEMORY", type(cache._MEMORY)())  # noqa: SLF001
+    monkeypatch.setattr(cache, "STATS", dict.fromkeys(cache.STATS, 0))
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
 
 
 def cache_prepare_lists() -> None:
     cache_source = Path("tests/test_data/lists.json")
-    cache_target = CACHE_DIR / "lists.json"
-    shutil.copyfile(cache_source, cache_target)
+    cache.put("lists", "lists", json.loads(cache_source.read_text()))
 
 
 def cache_prepare_tasks() -> None:
     my_filter = LIST_UNIT_TEST
     h = gen_md5_string(my_filter)
     cache_source = Path(f"tests/test_data/tasks-{h}.json")
-    cache_target = CACHE_DIR / f"tasks-{h}.json"
-    shutil.copyfile(cache_source, cache_target)
-
-
-def cache_cleanup_test_data() -> None:
-    (CACHE_DIR / "lists.json").unlink(missing_ok=True)
-
-    my_filter = LIST_UNIT_TEST
-    h = gen_md5_string(my_filter)
-    cache_target = CACHE_DIR / f"tasks-{h}.json"
-    cache_target.unlink(missing_ok=True)
-
-
-@pytest.mark.parametrize(
-    ("test_input", "expected"),
-    [
-        ({}, ""),  # empty
-        ({"key": "value"}, "key=value"),  # single
-        ({"key1": "value1", "key2": "value2"}, "key1=value1&key2=value2"),  # multiple
-    ],
-)
-def test_dict_to_url_param(test_input: dict[str, str], expected: str) -> None:
-    assert dict_to_url_param(test_input) == expected
-
-
-def test_gen_md5_string() -> None:
-    my_filter = """
-dueBefore:Today
-AND NOT status:completed
-AND NOT list:Taschengeld
-"""
-    assert gen_md5_string(my_filter) == "85d7cb53077789572349a3aabf8eb369"
-
-
-# def test_gen_api_sig() -> None:
-#     # problem: SHARED_SECRET is from config file and will hence fail in GitHub Actions
-#     d = {"key1": "value1", "key2": "value2"}
-#     assert gen_api_sig(d) == "ef309aa2591f0cff9491b3b0e6df8019"
-#     d = {"key2": "value2", "key1": "value1"}
-#     assert gen_api_sig(d) == "ef309aa2591f0cff9491b3b0e6df8019"
-
-
-def test_json_parse_response() -> None:
-    # Test with single key-value pair
-    assert json_parse_response(
-        '{"rsp": {"stat": "ok", "key1": "value1", "key2": "value2"}}'
-    ) == {"key1": "value1", "key2": "value2"}
+    tasks = json.loads(cache_source.read_text())
+    store.save_tasks(h, my_filter, tasks, last_sync="", full_sync=True)
 
 
 def test_get_lists() -> None:
@@ -186,7 +157,7 @@ def test_convert_task_fields() -> None:
     assert tasks_list_flat2[3]["due"] == dt.date(2024, 2, 28)
     assert tasks_list_flat2[3]["completed"] == dt.date(2024, 2, 24)
     assert (
-        tasks_list_flat2[3]["url"]
+        task_url(tasks_list_flat2[3]["list_id"], tasks_list_flat2[3]["task_id"])
         == "https://www.rememberthemilk.com/app/#list/50346883/1029525734"
     )
 
@@ -217,3 +188,236 @@ def test_df_name_url_to_html() -> None:
         df["name"].loc[3]
         == '<a href="https://www.rememberthemilk.com/app/#list/50346883/1029525734" target="_blank">unit-test 1.1 completed</a>'  # noqa: E501
     )
+
+
+def test_merge_tasks() -> None:
+    tasks = get_tasks(LIST_UNIT_TEST)
+    ts_modified = copy.deepcopy(tasks[0]["taskseries"][1])
+    ts_modified["name"] = "unit-test 1 renamed"
+    ts_deleted = tasks[0]["taskseries"][0]
+    delta = [
+        {
+            "id": "50346883",
+            "current": "2024-02-25T00:00:00Z",
+            "taskseries": [ts_modified],
+            "deleted": {
+                "taskseries": {
+                    "id": ts_deleted["id"],
+                    "task": {"id": ts_deleted["task"][0]["id"], "deleted": "x"},
+                }
+            },
+        }
+    ]
+    tasks_merged = merge_tasks(rtm_tasks=copy.deepcopy(tasks), rtm_delta=delta)
+    fp = tasks_fingerprint(store.to_records(tasks))
+    fp_merged = tasks_fingerprint(store.to_records(tasks_merged))
+    assert set(fp) - set(fp_merged) == {int(ts_deleted["id"])}
+    names = {ts["id"]: ts["name"] for ts in tasks_merged[0]["taskseries"]}
+    assert names[ts_modified["id"]] == "unit-test 1 renamed"
+
+
+def test_get_tasks_as_df_incremental() -> None:
+    lists_dict = get_lists_dict()
+    df = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=lists_dict)
+
+    # modify the store: rename one taskseries, remove another one
+    h = gen_md5_string(LIST_UNIT_TEST)
+    tasks = store.load_tasks(h)
+    tasks[0]["taskseries"][1]["name"] = "renamed"
+    tasks[0]["taskseries"][1]["modified"] = "2024-03-01T00:00:00Z"
+    task_id_removed = int(tasks[0]["taskseries"][0]["task"][0]["id"])
+    del tasks[0]["taskseries"][0]
+    store.save_tasks(h, LIST_UNIT_TEST, tasks, last_sync="", full_sync=True)
+
+    df2 = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=lists_dict)
+    assert len(df2) == len(df) - 1
+    assert task_id_removed not in df2["task_id"].to_list()
+    assert "renamed" in df2["name"].to_list()
+
+
+def test_store_roundtrip() -> None:
+    h = gen_md5_string(LIST_UNIT_TEST)
+    cache_source = Path(f"tests/test_data/tasks-{h}.json")
+    tasks = json.loads(cache_source.read_text())
+    lists_dict = get_lists_dict()
+    flat = flatten_tasks(rtm_tasks=tasks, lists_dict=lists_dict)
+    flat_store = flatten_tasks(rtm_tasks=store.load_tasks(h), lists_dict=lists_dict)
+    assert sorted(flat, key=lambda row: row["task_id"]) == sorted(
+        flat_store, key=lambda row: row["task_id"]
+    )
+    state = store.filter_state(h)
+    assert state is not None
+    assert state["last_sync"] == ""
+
+
+def test_store_delete_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    tmp_path = tmp_path / "db"
+    tmp_path.mkdir()
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    h = gen_md5_string(LIST_UNIT_TEST)
+    tasks = json.loads(Path(f"tests/test_data/tasks-{h}.json").read_text())
+    store.save_tasks(h, LIST_UNIT_TEST, tasks, last_sync="", full_sync=True)
+    store.delete_db()
+    assert not list(tmp_path.iterdir())
+    # schema created again
+    assert store.filter_state(h) is None
+
+
+def test_load_task_records_modified_by_other_filter() -> None:
+    h = gen_md5_string(LIST_UNIT_TEST)
+    records = helper.load_task_records(h)
+    assert helper.load_task_records(h) is records
+    # another filter containing one of the tasks saves a modified version
+    task = dataclasses.replace(records[0], name="modified")
+    store.save_tasks(
+        "other", "other", store.records_to_nested([task]), "", full_sync=True
+    )
+    assert helper.load_task_records(h)[0].name == "modified"
+    store.delete_filter("other")
+
+
+def test_store_single_elements() -> None:
+    # RTM returns single elements as element, not as list
+    tasks = json.loads(next(Path("tests/test_data").glob("tasks-*.json")).read_text())
+    taskseries = tasks[0]["taskseries"][0]
+    taskseries["tags"] = {"tag": "home"}
+    taskseries["task"] = taskseries["task"][0]
+    tasks = [{"id": tasks[0]["id"], "taskseries": taskseries}]
+    (record,) = store.to_records(tasks)
+    assert record.tags == "home"
+    assert record.task_id == int(taskseries["task"]["id"])
+    taskseries["tags"] = {"tag": ["home", "pc"]}
+    assert store.to_records(tasks)[0].tags == "home,pc"
+
+
+def test_convert_task_columns() -> None:
+    # test data + tasks covering other estimate formats and overdue cases
+    tasks = copy.deepcopy(get_tasks(LIST_UNIT_TEST))
+    task = tasks[0]["taskseries"][0]["task"][0]
+    extra = [
+        {"estimate": "45 minutes", "completed": "", "due": "2024-01-01T23:00:00Z"},
+        {"estimate": "PT2H", "completed": "", "due": "2099-01-01T23:00:00Z"},
+        {"priority": "1", "completed": task["due"]},  # overdue 0
+        {"priority": "3", "due": "", "completed": "2024-03-03T22:59:00Z"},
+    ]
+    for i, fields in enumerate(extra):
+        tasks[0]["taskseries"][0]["task"].append(task | fields | {"id": str(i)})
+
+    lists_dict = get_lists_dict()
+    df_rows = tasks_to_df(
+        convert_task_fields(flatten_tasks(rtm_tasks=tasks, lists_dict=lists_dict))
+    )
+    df_cols = convert_task_columns(
+        flat_tasks_to_df(flatten_tasks(rtm_tasks=tasks, lists_dict=lists_dict))
+    )
+    pd.testing.assert_frame_equal(df_rows, df_cols)
+
+
+def test_records_to_df() -> None:
+    tasks = get_tasks(LIST_UNIT_TEST)
+    lists_dict = get_lists_dict()
+    records = store.to_records(tasks)
+    assert store.records_to_nested(records) == tasks
+    df_rows = flat_tasks_to_df(flatten_tasks(rtm_tasks=tasks, lists_dict=lists_dict))
+    pd.testing.assert_frame_equal(
+        convert_task_columns(records_to_df(records, lists_dict=lists_dict)),
+        convert_task_columns(df_rows),
+    )
+    assert len(records_to_df([], lists_dict=lists_dict)) == 0
+
+
+def _expire_filter(my_filter: str, age: float) -> None:
+    h = gen_md5_string(my_filter)
+    with store.connect() as con:
+        con.execute(
+            "UPDATE filters SET fetched_at = ? WHERE filter_hash = ?",
+            (time.time() - age, h),
+        )
+
+
+def test_get_tasks_stale_if_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    def get_rtm_tasks_failing(*args, **kwargs):  # noqa: ARG001
+        msg = "API down"
+        raise ValueError(msg)
+
+    monkeypatch.setattr(helper, "get_rtm_tasks", get_rtm_tasks_failing)
+    _expire_filter(LIST_UNIT_TEST, age=4 * 3600)
+    df = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=get_lists_dict())
+    assert len(df) == 6
+    assert "API down" in df.attrs["stale"]
+
+    # too old
+    _expire_filter(LIST_UNIT_TEST, age=100 * 24 * 3600)
+    with pytest.raises(ValueError, match="API down"):
+        get_tasks(LIST_UNIT_TEST)
+
+
+def test_get_tasks_stale_while_revalidate(monkeypatch: pytest.MonkeyPatch) -> None:
+    tasks = copy.deepcopy(get_tasks(LIST_UNIT_TEST))
+    event = threading.Event()
+    calls = []
+
+    def get_rtm_tasks_slow(*args, **kwargs):  # noqa: ARG001
+        calls.append(1)
+        event.wait(timeout=5)
+        return tasks[:0]
+
+    monkeypatch.setattr(helper, "get_rtm_tasks", get_rtm_tasks_slow)
+    monkeypatch.setattr(helper, "STALE_WHILE_REVALIDATE", True)
+    _expire_filter(LIST_UNIT_TEST, age=4 * 3600)
+    # stale data served immediately, one background refresh
+    assert len(get_tasks(LIST_UNIT_TEST)) == 1
+    assert len(get_tasks(LIST_UNIT_TEST)) == 1
+    assert "refreshing" in helper.get_stale_reason(LIST_UNIT_TEST)
+
+    # refreshed in background
+    event.set()
+    for _ in range(50):
+        if not helper.get_stale_reason(LIST_UNIT_TEST):
+            break
+        time.sleep(0.1)
+    assert get_tasks(LIST_UNIT_TEST) == []
+    assert len(calls) == 1
+
+    # older than max_stale_hours: waits for RTM
+    monkeypatch.setitem(get_settings(), "max_stale_hours", 1)
+    _expire_filter(LIST_UNIT_TEST, age=4 * 3600)
+    assert get_tasks(LIST_UNIT_TEST) == []
+    assert len(calls) == 2
+
+
+def test_get_task_records_max_age(monkeypatch: pytest.MonkeyPatch) -> None:
+    def get_rtm_tasks_failing(*args, **kwargs):  # noqa: ARG001
+        msg = "API called"
+        raise ValueError(msg)
+
+    monkeypatch.setattr(helper, "get_rtm_tasks", get_rtm_tasks_failing)
+    _expire_filter(LIST_UNIT_TEST, age=60)
+    assert len(helper.get_task_records(LIST_UNIT_TEST)) == 6
+    # stored tasks older than max_age are fetched again, TTL is unchanged
+    records = helper.get_task_records(LIST_UNIT_TEST, max_age=30)
+    assert len(records) == 6
+    assert "API called" in helper.get_stale_reason(LIST_UNIT_TEST)
+    assert cache.TTL["tasks"] == 3 * 3600
+
+
+def test_compact_task_columns() -> None:
+    lists_dict = get_lists_dict()
+    df = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=lists_dict)
+    assert "url" not in df.columns
+    assert isinstance(df["list"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+    assert df["task_id"].dtype == "uint32"
+    assert df["prio"].dtype == "int8"
+    assert task_urls(df).iloc[0] == task_url(
+        df["list_id"].iloc[0], df["task_id"].iloc[0]
+    )
+
+    # concat of different categories falls back to str
+    df2 = pd.concat([df.iloc[:1], df.iloc[1:]], ignore_index=True)
+    df2 = compact_task_columns(df2)
+    pd.testing.assert_frame_equal(df2, df)
+
+    # IDs too large for uint32 are kept
+    df2["task_id"] = df2["task_id"].astype("int64") + 2**32
+    assert compact_task_columns(df2)["task_id"].dtype == "int64"
@@ -0,0 +1,91 @@
+"""
+Test history of completed tasks, partitioned by month.
+"""
+
+import datetime as dt
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import history
+import store
+from bench import gen_tasks
+from config import get_date_today
+from helper import convert_task_columns, filter_key, gen_md5_string, records_to_df
+from history import (
+    get_completed_df,
+    is_closed,
+    month_starts,
+    partition_filter,
+)
+
+
+@pytest.fixture(autouse=True)
+def _tmp_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+
+
+def test_partitions() -> None:
+    assert month_starts(dt.date(2023, 11, 15), dt.date(2024, 1, 1)) == [
+        dt.date(2023, 11, 1),
+        dt.date(2023, 12, 1),
+        dt.date(2024, 1, 1),
+    ]
+    assert (
+        partition_filter(dt.date(2024, 3, 1), "NOT list:x")
+        == "completedAfter:29/02/2024 AND completedBefore:01/04/2024 AND NOT list:x"
+    )
+    month = dt.date(2024, 3, 1)
+    fetched = dt.datetime(2024, 4, 3, 12, tzinfo=dt.UTC).timestamp()
+    assert not is_closed(month, fetched)
+    fetched = dt.datetime(2024, 4, 9, 12, tzinfo=dt.UTC).timestamp()
+    assert is_closed(month, fetched)
+
+
+def test_get_completed_df(monkeypatch: pytest.MonkeyPatch) -> None:
+    rtm_tasks, lists_dict = gen_tasks(1000)
+    records = store.to_records(rtm_tasks)
+    df_all = convert_task_columns(records_to_df(records, lists_dict))
+    df_all = df_all[df_all["completed"].notna()]
+    completed = dict(zip(df_all["task_id"], df_all["completed"], strict=True))
+
+    # store each month as fetched now, so no request is sent
+    end = get_date_today()
+    start = end - dt.timedelta(days=200)
+    for month in month_starts(start, end):
+        my_filter = partition_filter(month, "")
+        part = [
+            r
+            for r in records
+            if r.task_id in completed
+            and month <= completed[r.task_id] < history.next_month(month)
+        ]
+        h = gen_md5_string(filter_key(my_filter))
+        store.save_tasks(
+            h, my_filter, store.records_to_nested(part), "", full_sync=True
+        )
+
+    df = get_completed_df(start, end, lists_dict=lists_dict)
+    expected = {k for k, v in completed.items() if start < v <= end}
+    assert sorted(df["task_id"]) == sorted(expected)
+    assert df.attrs["stale"] == ""
+
+    # closed months are read from the store, even if expired
+    with store.connect() as con:
+        con.execute("UPDATE filters SET fetched_at = ?", (time.time() - 86400,))
+
+    def fetch(my_filter: str) -> None:
+        raise AssertionError(my_filter)
+
+    monkeypatch.setattr(history, "get_task_records", fetch)
+    df = get_completed_df(start, end - dt.timedelta(days=40), lists_dict=lists_dict)
+    assert len(df)
+    # modified tasks do not reopen closed months
+    store.expire_filters(list(completed))
+    df = get_completed_df(start, end - dt.timedelta(days=40), lists_dict=lists_dict)
+    assert len(df)
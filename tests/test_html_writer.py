@@ -0,0 +1,85 @@
+"""
+Test streaming HTML table writer.
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import html_writer
+from html_writer import escape_html, write_html
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "name": ["a & b", "<tag>", "Müller"],
+            "url": ["https://x/1", "https://x/2", "https://x/3"],
+            "estimate": pd.Series([30, None, 5], dtype="Int64"),
+        }
+    )
+
+
+def test_escape_html() -> None:
+    assert escape_html("a & <b> ü") == "a &amp; &lt;b&gt; &#252;"
+    assert escape_html('"quoted"') == '"quoted"'
+
+
+def test_write_html(df: pd.DataFrame, tmp_path: Path) -> None:
+    (path,) = write_html(df, tmp_path / "out.html", links={"name": "url"})
+    html = path.read_text()
+    assert html.startswith("<!DOCTYPE html>\n<table")
+    assert (
+        '<tr><td><a href="https://x/1" target="_blank">a &amp; b</a></td>'
+        "<td>https://x/1</td><td>30</td></tr>"
+    ) in html
+    assert "&lt;tag&gt;" in html
+    assert "M&#252;ller" in html
+    # missing values
+    assert "<td></td></tr>" in html
+    assert "NA" not in html
+
+
+def test_write_html_index(df: pd.DataFrame, tmp_path: Path) -> None:
+    df = df.set_index(["name", "url"])
+    (path,) = write_html(df, tmp_path / "out.html", index=True)
+    html = path.read_text()
+    assert "<th>name</th><th>url</th><th>estimate</th>" in html
+    assert "<tr><th>a &amp; b</th><th>https://x/1</th><td>30</td></tr>" in html
+
+
+def test_write_html_pages(
+    df: pd.DataFrame, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(html_writer, "CHUNK_ROWS", 1)
+    paths = write_html(df, tmp_path / "out.html", compress=True, page_size=2)
+    assert [p.name for p in paths] == ["out.html.gz", "out-2.html.gz"]
+    html = [gzip.decompress(p.read_bytes()).decode() for p in paths]
+    assert html[0].count("<tr>") == 2
+    assert html[1].count("<tr>") == 1
+    assert '<a href="out-2.html.gz">2</a>' in html[0]
+
+
+def test_write_html_atomic(
+    df: pd.DataFrame, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "out.html"
+    path.write_text("old")
+
+    def render_rows(*_args, **_kwargs):
+        msg = "render failed"
+        raise ValueError(msg)
+
+    monkeypatch.setattr(html_writer, "render_rows", render_rows)
+    with pytest.raises(ValueError, match="render failed"):
+        write_html(df, path)
+    # previous file kept, no temporary file left
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["out.html"]
@@ -0,0 +1,57 @@
+"""
+Test per-stage timings and counters.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@metrics.timed("unit_test")
+def _stage(n: int) -> list[int]:
+    return list(range(n))
+
+
+def test_timed() -> None:
+    _stage(3)
+    _stage(4)
+    s = metrics.STAGES["unit_test"]
+    assert (s["calls"], s["rows"]) == (2, 7)
+    assert s["seconds"] >= s["seconds_max"] >= 0
+    assert _stage.__name__ == "_stage"
+
+
+def test_timed_error() -> None:
+    _stage(3)
+    with pytest.raises(TypeError):
+        _stage(None)  # type: ignore[arg-type]
+    s = metrics.STAGES["unit_test"]
+    assert (s["calls"], s["errors"], s["rows"]) == (2, 1, 3)
+
+
+def test_export() -> None:
+    _stage(3)
+    metrics.count("http_bytes", 100)
+    report = json.loads(metrics.to_json())
+    assert report["counters"] == {"http_bytes": 100}
+    assert set(report) == {"stages", "counters", "cache", "ratelimit"}
+    prom = metrics.to_prometheus()
+    assert 'rtm_stage_calls_total{stage="unit_test"} 1' in prom
+    assert 'rtm_stage_errors_total{stage="unit_test"} 0' in prom
+    assert "rtm_http_bytes_total 100" in prom
+    assert "# TYPE rtm_ratelimit_wait_max gauge" in prom
+    assert "rtm_ratelimit_wait_total " in prom
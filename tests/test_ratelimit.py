@@ -0,0 +1,38 @@
+"""
+Test rate limiter.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import ratelimit
+from ratelimit import BURST, RATE, acquire, take_token
+
+
+def test_take_token() -> None:
+    # full bucket: no waiting
+    tokens, wait = take_token(tokens=BURST, last=0, now=0)
+    assert (tokens, wait) == (BURST - 1, 0)
+    # empty bucket: wait for one token
+    tokens, wait = take_token(tokens=0, last=0, now=0)
+    assert wait == pytest.approx(1 / RATE)
+    # reserved tokens add up
+    tokens, wait = take_token(tokens=tokens, last=0, now=0)
+    assert wait == pytest.approx(2 / RATE)
+    # refill, but not above burst
+    tokens, wait = take_token(tokens=0, last=0, now=1000)
+    assert (tokens, wait) == (BURST - 1, 0)
+
+
+def test_acquire(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(ratelimit, "STATE_FILE", tmp_path / "ratelimit.state")
+    monkeypatch.setattr(ratelimit, "RATE", 100.0)
+    waits = [acquire() for _ in range(int(BURST) + 1)]
+    assert waits[: int(BURST)] == [0] * int(BURST)
+    assert 0 < waits[-1] <= 1 / 100
+    assert ratelimit.STATS["waited"] >= 1
@@ -0,0 +1,45 @@
+"""
+Test fetching the data of all reports in one go.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import history
+import rtm_async
+import store
+from bench import gen_tasks
+from report_data import get_reports
+
+
+@pytest.fixture(autouse=True)
+def _tmp_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+
+
+def test_get_reports_lists_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    rtm_tasks, lists_dict = gen_tasks(100)
+    records = store.to_records(rtm_tasks)
+    started = threading.Event()
+
+    def get_lists_dict() -> dict[int, str]:
+        # the tasks are requested without waiting for the lists
+        assert started.wait(timeout=5)
+        return lists_dict
+
+    def get_records(*args, **kwargs) -> list:  # noqa: ARG001
+        started.set()
+        return records
+
+    monkeypatch.setattr(rtm_async, "get_lists_dict", get_lists_dict)
+    monkeypatch.setattr(rtm_async, "get_task_records", get_records)
+    monkeypatch.setattr(history, "get_partition_records", get_records)
+    reports = get_reports()
+    assert list(reports) == ["completed", "overdue"]
+    assert set(reports["overdue"]["list"]) <= set(lists_dict.values())
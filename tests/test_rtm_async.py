@@ -0,0 +1,67 @@
+"""
+Test asyncio API client.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+from test_helper import (
+    LIST_UNIT_TEST,
+    cache_prepare_lists,
+    cache_prepare_tasks,
+    use_tmp_cache,
+)
+
+import store
+from config import get_settings
+from helper import filter_key, gen_md5_string, get_lists_dict, get_tasks_as_df
+from rtm_async import get_tasks_as_df_sharded, get_tasks_as_dfs
+
+
+@pytest.fixture(autouse=True)
+def _setup_tests(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    use_tmp_cache(tmp_path, monkeypatch)
+    cache_prepare_lists()
+    cache_prepare_tasks()
+
+
+def test_get_tasks_as_dfs() -> None:
+    dfs = get_tasks_as_dfs({"a": LIST_UNIT_TEST, "b": LIST_UNIT_TEST})
+    assert list(dfs) == ["a", "b"]
+    df = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=get_lists_dict())
+    pd.testing.assert_frame_equal(dfs["a"], df)
+    pd.testing.assert_frame_equal(dfs["b"], df)
+
+
+def _prepare_list_result() -> str:
+    """Store the result of the only non-smart list, returns its hash."""
+    key = filter_key(LIST_UNIT_TEST, list_id="50346883")
+    h = gen_md5_string(key)
+    tasks = store.load_tasks(gen_md5_string(LIST_UNIT_TEST))
+    store.save_tasks(h, key, tasks, last_sync="", full_sync=True)
+    return h
+
+
+def test_get_tasks_as_df_sharded() -> None:
+    h = _prepare_list_result()
+    df = get_tasks_as_df_sharded(LIST_UNIT_TEST)
+    df_expected = get_tasks_as_df(my_filter=LIST_UNIT_TEST, lists_dict=get_lists_dict())
+    pd.testing.assert_frame_equal(
+        df.sort_values("task_id", ignore_index=True),
+        df_expected.sort_values("task_id", ignore_index=True),
+    )
+    store.delete_filter(h)
+
+
+def test_get_tasks_as_dfs_per_list(monkeypatch: pytest.MonkeyPatch) -> None:
+    h = _prepare_list_result()
+    monkeypatch.setitem(get_settings(), "fetch_per_list", True)  # noqa: FBT003
+    dfs = get_tasks_as_dfs({"a": LIST_UNIT_TEST})
+    assert len(dfs["a"]) == 6
+    store.delete_filter(h)
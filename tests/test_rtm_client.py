@@ -0,0 +1,81 @@
+"""
+Test RTM API client functions.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+from rtm_client import (
+    HTTP_BACKOFF,
+    backoff_delay,
+    dict_to_url_param,
+    # gen_api_sig,
+    gen_md5_string,
+    json_parse_response,
+)
+
+
+@pytest.mark.parametrize(
+    ("test_input", "expected"),
+    [
+        ({}, ""),  # empty
+        ({"key": "value"}, "key=value"),  # single
+        ({"key1": "value1", "key2": "value2"}, "key1=value1&key2=value2"),  # multiple
+    ],
+)
+def test_dict_to_url_param(test_input: dict[str, str], expected: str) -> None:
+    assert dict_to_url_param(test_input) == expected
+
+
+def test_gen_md5_string() -> None:
+    my_filter = """
+dueBefore:Today
+AND NOT status:completed
+AND NOT list:Taschengeld
+"""
+    assert gen_md5_string(my_filter) == "85d7cb53077789572349a3aabf8eb369"
+
+
+# def test_gen_api_sig() -> None:
+#     # problem: SHARED_SECRET is from config file and will hence fail in GitHub Actions
+#     d = {"key1": "value1", "key2": "value2"}
+#     assert gen_api_sig(d) == "ef309aa2591f0cff9491b3b0e6df8019"
+#     d = {"key2": "value2", "key1": "value1"}
+#     assert gen_api_sig(d) == "ef309aa2591f0cff9491b3b0e6df8019"
+
+
+def test_json_parse_response() -> None:
+    # Test with single key-value pair
+    assert json_parse_response(
+        '{"rsp": {"stat": "ok", "key1": "value1", "key2": "value2"}}'
+    ) == {"key1": "value1", "key2": "value2"}
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 2])
+def test_backoff_delay(attempt: int) -> None:
+    delay = backoff_delay(attempt)
+    assert HTTP_BACKOFF * 2**attempt <= delay <= 2 * HTTP_BACKOFF * 2**attempt
+    assert backoff_delay(attempt, retry_after="30") == 30
+
+
+def test_import_auth_is_lightweight() -> None:
+    # auth needs neither pandas nor requests nor the config at import time
+    code = (
+        "import sys, auth, config;"
+        "print('pandas' in sys.modules, 'requests' in sys.modules,"
+        " config.get_settings.cache_info().currsize)"
+    )
+    out = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).parent.parent / "src",
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert out.split() == ["False", "False", "0"]
@@ -0,0 +1,164 @@
+"""
+Test parser and evaluator of RTM filters.
+"""
+
+import datetime as dt
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import helper
+import metrics
+import store
+from config import get_date_today
+from helper import filter_key, gen_md5_string, get_task_records
+from rtm_filter import (
+    And,
+    Not,
+    Or,
+    Term,
+    canonical,
+    compile_filter,
+    covers,
+    is_relative,
+    parse,
+)
+
+LISTS_DICT = {50346883: "unit-tests", 1: "Taschengeld"}
+TASKS = json.loads(next(Path("tests/test_data").glob("tasks-*.json")).read_text())
+
+
+@pytest.mark.parametrize(
+    ("my_filter", "expected"),
+    [
+        ("list:unit-tests", "list:unit-tests"),
+        ("", ""),
+        (
+            "dueBefore:Today\nAND NOT status:completed AND NOT list:Taschengeld",
+            "NOT list:Taschengeld AND dueBefore:today AND status:incomplete",
+        ),
+        (
+            "NOT list:Taschengeld and duebefore:today AND NOT status:Completed",
+            "NOT list:Taschengeld AND dueBefore:today AND status:incomplete",
+        ),
+        ("tag:a OR (tag:b OR tag:a)", "tag:a OR tag:b"),
+        ("NOT NOT tag:a tag:b", "tag:a AND tag:b"),
+        ('list:"My List" OR priority:1', 'list:"My List" OR priority:1'),
+        ("(tag:a OR tag:b) AND priority:1", "priority:1 AND (tag:a OR tag:b)"),
+    ],
+)
+def test_canonical(my_filter: str, expected: str) -> None:
+    assert canonical(parse(my_filter)) == expected
+    # canonical of canonical is unchanged
+    assert canonical(parse(expected)) == expected
+
+
+@pytest.mark.parametrize(
+    "my_filter",
+    ["name:x", "some text", "tag:a AND", "(tag:a", "tag:a)", "OR tag:a", "()"],
+)
+def test_parse_unsupported(my_filter: str) -> None:
+    with pytest.raises(ValueError):  # noqa: PT011
+        parse(my_filter)
+
+
+def test_parse() -> None:
+    assert parse("tag:a OR NOT (tag:b AND tag:c)") == Or(
+        (Not(And((Term("tag", "b"), Term("tag", "c")))), Term("tag", "a"))
+    )
+
+
+def test_covers() -> None:
+    overdue = parse("dueBefore:Today AND NOT status:completed AND NOT list:x")
+    assert covers(parse("status:incomplete"), overdue)
+    assert covers(parse(""), overdue)
+    assert not covers(parse("status:completed"), overdue)
+    assert not covers(parse("status:incomplete OR tag:a"), overdue)
+
+
+def test_is_relative() -> None:
+    assert is_relative(parse("dueBefore:Today AND NOT status:completed"))
+    assert is_relative(parse("tag:a OR NOT completed:yesterday"))
+    assert not is_relative(parse("completedAfter:31/01/2024 AND tag:today"))
+
+
+@pytest.mark.parametrize(
+    ("my_filter", "task_ids"),
+    [
+        ("status:completed", {1029525734}),
+        ("NOT status:completed AND priority:none", {1029525753}),
+        ("tag:doc", {1029525734, 1029525662}),
+        ("list:Unit-Tests AND dueBefore:29/02/2024", {1029525734, 1029525662}),
+        ("completedAfter:2024-02-23 AND completedBefore:2024-02-25", {1029525734}),
+        ("list:Taschengeld", set()),
+    ],
+)
+def test_compile_filter(my_filter: str, task_ids: set[int]) -> None:
+    records = store.to_records(TASKS)
+    match = compile_filter(parse(my_filter), lambda: LISTS_DICT)
+    assert {t.task_id for t in records if match(t)} & {
+        1029525734,
+        1029525662,
+        1029525753,
+    } == task_ids
+
+
+def test_relative_dates() -> None:
+    today = get_date_today()
+    due = dt.datetime.combine(today, dt.time(12)).astimezone(dt.UTC)
+    task = store.to_records(TASKS)[0]
+    task = store.Task(*(due.isoformat() if f == "due" else v for f, v in _fields(task)))
+    assert compile_filter(parse("due:today"), dict)(task)
+    assert compile_filter(parse("dueBefore:tomorrow"), dict)(task)
+    assert not compile_filter(parse("dueBefore:today"), dict)(task)
+    assert compile_filter(parse("dueAfter:yesterday"), dict)(task)
+
+
+def _fields(task: store.Task) -> list[tuple[str, object]]:
+    return [(f, getattr(task, f)) for f in store.Task.__slots__]
+
+
+def test_answer_locally(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    monkeypatch.setattr(helper, "get_lists_dict", lambda: LISTS_DICT)
+    superset = "NOT status:completed"
+    key = filter_key(superset)
+    store.save_tasks(gen_md5_string(key), key, TASKS, "", full_sync=True)
+
+    def fetch(*_args: object, **_kwargs: object) -> None:
+        raise AssertionError
+
+    monkeypatch.setattr(helper, "fetch_tasks", fetch)
+    metrics.reset()
+    records = get_task_records(
+        "list:unit-tests AND dueBefore:29/02/2024 AND status:incomplete"
+    )
+    assert [t.task_id for t in records] == [1029525662]
+    assert metrics.COUNTERS["filter_local"] == 1
+    metrics.reset()
+
+
+def test_answer_locally_relative_other_day(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    monkeypatch.setattr(helper, "get_lists_dict", lambda: LISTS_DICT)
+    superset = "dueBefore:today AND status:incomplete"
+    key = filter_key(superset)
+    store.save_tasks(gen_md5_string(key), key, TASKS, "", full_sync=True)
+    narrow = "list:unit-tests AND dueBefore:today AND status:incomplete"
+    assert helper.get_local_records(narrow) is not None
+
+    # fetched yesterday: "today" of the superset is another day
+    tomorrow = get_date_today() + dt.timedelta(days=1)
+    monkeypatch.setattr(helper, "get_date_today", lambda: tomorrow)
+    assert helper.get_local_records(narrow) is None
+    # not relative: still used
+    key = filter_key("status:incomplete")
+    store.save_tasks(gen_md5_string(key), key, TASKS, "", full_sync=True)
+    assert helper.get_local_records(narrow) is not None
@@ -0,0 +1,128 @@
+"""
+Test the client end to end against the local RTM stand-in.
+"""
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import store
+from auth import rtm_auth_get_token, rtm_get_frob
+from config import get_settings
+from helper import fetch_tasks, get_rmt_lists, get_rtm_tasks, get_task_records
+from rtm_client import perform_rest_call, rtm_call_method
+from rtm_server import RTMServer
+
+LISTS = json.loads(Path("tests/test_data/lists.json").read_text())
+TASKS = json.loads(next(Path("tests/test_data").glob("tasks-*.json")).read_text())
+
+
+def test_get_lists_and_tasks(server: RTMServer) -> None:
+    lists = get_rmt_lists()
+    assert {el["id"] for el in lists} == {el["id"] for el in LISTS}
+    assert get_rtm_tasks("list:unit-tests") == TASKS
+    assert get_rtm_tasks("list:unit-tests", list_id="1") == []
+    assert get_rtm_tasks("list:unit-tests", last_sync="2099-01-01T00:00:00Z") == []
+    assert server.stats["requests"] == 4
+
+
+def test_invalid_signature(
+    server: RTMServer,  # noqa: ARG001
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setitem(get_settings(), "shared_secret", "wrong")
+    with pytest.raises(ValueError, match="Invalid signature"):
+        rtm_call_method("rtm.lists.getList", {})
+
+
+def test_auth(server: RTMServer) -> None:
+    frob = rtm_get_frob()
+    assert rtm_auth_get_token(frob) == server.token
+    with pytest.raises(ValueError, match="Invalid frob"):
+        rtm_auth_get_token("unknown")
+
+
+def test_retry_on_errors(server: RTMServer) -> None:
+    server.errors.extend([503, 500])
+    assert rtm_call_method("rtm.lists.getList", {})["lists"]["list"] == LISTS
+    assert server.stats["errors_injected"] == 2
+    server.errors.extend([500] * 3)
+    with pytest.raises(ValueError, match="status code:500"):
+        rtm_call_method("rtm.lists.getList", {})
+
+
+def test_rate_limit(server: RTMServer) -> None:
+    server.rate = 0.001
+    server.burst = 1
+    server._bucket = (1, server._bucket[1])  # noqa: SLF001
+    perform_rest_call(server.url)
+    with pytest.raises(ValueError, match="status code:503"):
+        perform_rest_call(server.url)
+    assert server.stats["rate_limited"] == 3
+
+
+def test_record_replay(server: RTMServer, tmp_path: Path) -> None:
+    recorder = RTMServer(port=0, upstream=server.url, record_dir=tmp_path / "rec")
+    recorder.start()
+    replayer = RTMServer(port=0, replay_dir=tmp_path / "rec")
+    replayer.start()
+    try:
+        get_settings()["api_url"] = recorder.url
+        assert get_rtm_tasks("list:unit-tests") == TASKS
+        assert recorder.stats["recorded"] == 1
+        get_settings()["api_url"] = replayer.url
+        assert get_rtm_tasks("list:unit-tests") == TASKS
+        assert replayer.stats["replayed"] == 1
+    finally:
+        for srv in (recorder, replayer):
+            srv.shutdown()
+            srv.server_close()
+
+
+def test_concurrent_fetch_coalesced(
+    server: RTMServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    server.latency = 0.3
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(get_task_records, ["list:unit-tests"] * 4))
+    assert server.stats["requests"] == 1
+    assert all(r is results[0] for r in results)
+    assert {t.task_id for t in results[0]} == {
+        int(task["id"])
+        for tasks_per_list in TASKS
+        for ts in tasks_per_list["taskseries"]
+        for task in ts["task"]
+    }
+
+
+def test_delta_sync_drops_tasks_no_longer_matching(
+    server: RTMServer,  # noqa: ARG001
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(store, "DB_PATH", tmp_path / "tasks.sqlite")
+    # the stand-in does not evaluate filters, the full sync returns all tasks
+    fetch_tasks("status:incomplete")
+    timeline = rtm_call_method("rtm.timelines.create", {})["timeline"]
+    rtm_call_method(
+        "rtm.tasks.complete",
+        {
+            "timeline": timeline,
+            "list_id": "50346883",
+            "taskseries_id": "531861379",
+            "task_id": "1029525662",
+        },
+    )
+    tasks = fetch_tasks("status:incomplete")
+    # delta sync: completed task dropped, as well as the stored completed ones
+    assert [int(task["id"]) for task in tasks[0]["taskseries"][0]["task"]] == [
+        1029525753
+    ]
+    assert len(tasks[0]["taskseries"]) == 1
@@ -0,0 +1,70 @@
+"""
+Test coalescing of concurrent calls.
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import metrics
+import singleflight
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+release = threading.Event()
+
+
+def _run_concurrently(func, n: int) -> list:
+    """Call singleflight.do("k", func) from n threads."""
+    with ThreadPoolExecutor(n) as executor:
+        futures = [executor.submit(singleflight.do, "k", func) for _ in range(n)]
+        # let all callers arrive while the first one is running
+        time.sleep(0.2)
+        release.set()
+        return [f.exception() or f.result() for f in futures]
+
+
+def test_do() -> None:
+    release.clear()
+    calls = []
+
+    def fetch() -> list[int]:
+        calls.append(1)
+        release.wait(5)
+        return [1, 2]
+
+    results = _run_concurrently(fetch, 4)
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert metrics.COUNTERS["singleflight_coalesced"] == 3
+    assert metrics.STAGES["singleflight_wait"]["calls"] == 3
+
+    # not running any more: called again
+    assert singleflight.do("k", fetch) == [1, 2]
+    assert len(calls) == 2
+
+
+def test_do_error() -> None:
+    release.clear()
+
+    def fetch() -> None:
+        release.wait(5)
+        msg = "API down"
+        raise OSError(msg)
+
+    results = _run_concurrently(fetch, 3)
+    assert all(isinstance(r, OSError) for r in results)
+    assert not singleflight._CALLS  # noqa: SLF001
@@ -0,0 +1,46 @@
+"""
+Test the watch daemon regenerating reports on change.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add src directory to the Python path, so we can run this file directly
+sys.path.insert(0, (Path(__file__).parent.parent / "src").as_posix())
+
+import watch
+from watch import frame_hash, poll
+
+
+def test_frame_hash() -> None:
+    df = pd.DataFrame({"name": ["a", "b"], "prio": [1, 2]})
+    assert frame_hash(df) == frame_hash(df.copy())
+    assert frame_hash(df) != frame_hash(df.assign(prio=[1, 3]))
+    assert frame_hash(df) != frame_hash(df.iloc[::-1])
+    assert frame_hash(df) != frame_hash(df.set_index("name"))
+
+
+def test_poll(tmp_path: Path, monkeypatch) -> None:
+    written = []
+
+    def write(df: pd.DataFrame) -> None:
+        written.append(len(df))
+        (tmp_path / "out.html").write_text("x")
+
+    monkeypatch.setattr(watch, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setitem(watch.OUTPUTS, "r", ("out.html",))
+    monkeypatch.setitem(watch.WRITERS, "r", write)
+    reports = {"r": pd.DataFrame({"name": ["a"]})}
+    hashes: dict[str, str] = {}
+
+    assert poll(hashes, load=lambda: reports) == ["r"]
+    # unchanged tasks: not written again
+    assert poll(hashes, load=lambda: reports) == []
+    # deleted output: written again
+    (tmp_path / "out.html").unlink()
+    assert poll(hashes, load=lambda: reports) == ["r"]
+    reports["r"] = pd.DataFrame({"name": ["a", "b"]})
+    assert poll(hashes, load=lambda: reports) == ["r"]
+    assert written == [1, 1, 2]